@@ -0,0 +1,92 @@
+"""
+Token chunking: decoding every chunk vs. slicing chunks by character offsets
+
+The decode variant is chunking_by_token_size as it was before chunks were sliced from the
+content. Both run with a tiktoken encoding built in memory, so no BPE file is downloaded; pass
+--encoding to use a real one instead.
+
+Usage: python -m benchmarks.chunking [--size-mb 12] [--encoding cl100k_base]
+"""
+
+import argparse
+import itertools
+import random
+import string
+import time
+import tracemalloc
+
+import tiktoken
+
+from lightrag.operate import chunking_by_token_size
+from lightrag.utils import Tokenizer
+
+
+def chunking_by_decode(tokenizer, content, overlap_token_size=128, max_token_size=1024):
+    tokens = tokenizer.encode(content)
+    results = []
+    for index, start in enumerate(range(0, len(tokens), max_token_size - overlap_token_size)):
+        chunk_content = tokenizer.decode(tokens[start : start + max_token_size])
+        results.append(
+            {
+                "tokens": min(max_token_size, len(tokens) - start),
+                "content": chunk_content.strip(),
+                "chunk_order_index": index,
+            }
+        )
+    return results
+
+
+def build_tokenizer(encoding: str | None) -> Tokenizer:
+    if encoding:
+        return Tokenizer(encoding, tiktoken.get_encoding(encoding))
+    ranks = {bytes([i]): i for i in range(256)}
+    for pair in itertools.product(string.ascii_lowercase, repeat=2):
+        ranks["".join(pair).encode()] = len(ranks)
+    return Tokenizer(
+        "bench",
+        tiktoken.Encoding("bench", pat_str=r"\s?\w+|\s+|[^\w\s]+", mergeable_ranks=ranks, special_tokens={}),
+    )
+
+
+def build_text(size: int) -> str:
+    rng = random.Random(0)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(5000)]
+    parts, length = [], 0
+    while length < size:
+        sentence = " ".join(rng.choices(words, k=rng.randint(5, 20))) + ". "
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)[:size]
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    # Tracing slows allocations down, measure the peak in a separate run
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(size_mb: float, encoding: str | None) -> None:
+    tokenizer = build_tokenizer(encoding)
+    text = build_text(int(size_mb * (1 << 20)))
+
+    old, old_time, old_peak = timed(chunking_by_decode, tokenizer, text)
+    new, new_time, new_peak = timed(chunking_by_token_size, tokenizer, text)
+
+    assert old == new, "chunks differ"
+    print(f"{len(text) / (1 << 20):.1f} MB of text, {len(new)} chunks")
+    print(f"  decode per chunk:  {old_time:7.2f} s, peak {old_peak / (1 << 20):7.1f} MB")
+    print(f"  offset slicing:    {new_time:7.2f} s, peak {new_peak / (1 << 20):7.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=12)
+    parser.add_argument("--encoding", default=None, help="tiktoken encoding name, downloads its BPE file")
+    args = parser.parse_args()
+    main(args.size_mb, args.encoding)
@@ -0,0 +1,77 @@
+"""
+Global config handed to storages and queries: asdict(self) vs. the cached read-only snapshot
+
+Every query and insert used to call asdict(self), which deep-copies all fields of LightRAG,
+including addon_params, the storage kwargs and the tokenizer.
+
+Usage: python -m benchmarks.config_snapshot [--calls 200]
+"""
+
+import argparse
+import itertools
+import logging
+import string
+import tempfile
+import timeit
+from dataclasses import asdict
+
+import numpy as np
+import tiktoken
+
+from lightrag import LightRAG
+from lightrag.utils import EmbeddingFunc, Tokenizer, logger
+
+
+async def llm_model_func(prompt, **kwargs) -> str:
+    return ""
+
+
+async def embed(texts: list[str], **kwargs) -> np.ndarray:
+    return np.zeros((len(texts), 8))
+
+
+def build_tokenizer() -> Tokenizer:
+    # A real tiktoken encoding, built in memory so no BPE file is downloaded
+    ranks = {bytes([i]): i for i in range(256)}
+    for pair in itertools.product(string.ascii_lowercase, repeat=2):
+        ranks["".join(pair).encode()] = len(ranks)
+    return Tokenizer(
+        "bench",
+        tiktoken.Encoding("bench", pat_str=r"\s?\w+|\s+|[^\w\s]+", mergeable_ranks=ranks, special_tokens={}),
+    )
+
+
+def main(calls: int) -> None:
+    logger.setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as working_dir:
+        rag = LightRAG(
+            working_dir=working_dir,
+            llm_model_func=llm_model_func,
+            embedding_func=EmbeddingFunc(embedding_dim=8, max_token_size=8192, func=embed),
+            tokenizer=build_tokenizer(),
+            auto_manage_storages_states=False,
+            addon_params={"language": "English", "entity_types": ["organization", "person", "geo", "event"] * 5},
+        )
+        assert set(rag._get_global_config()) == set(asdict(rag))
+
+        copied = timeit.timeit(lambda: asdict(rag), number=calls) / calls
+        snapshot = timeit.timeit(rag._get_global_config, number=calls) / calls
+
+        # A reassigned field invalidates the snapshot
+        def rebuild():
+            rag.chunk_token_size = rag.chunk_token_size
+            return rag._get_global_config()
+
+        rebuilt = timeit.timeit(rebuild, number=calls) / calls
+
+    print(f"{calls} calls")
+    print(f"  asdict(self):         {copied * 1e6:9.1f} us/call")
+    print(f"  cached snapshot:      {snapshot * 1e6:9.2f} us/call")
+    print(f"  rebuilt snapshot:     {rebuilt * 1e6:9.1f} us/call (after a field is set)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    main(args.calls)
@@ -0,0 +1,99 @@
+"""
+NetworkXStorage.get_knowledge_graph: sorted lists and list-queue BFS vs. heaps and a cached top-degree list
+
+The "before" functions are the node selection get_knowledge_graph did before: a full sort of all
+degrees for "*", and a BFS that pops from the front of a list and re-sorts every depth.
+
+Usage: python -m benchmarks.knowledge_graph [--nodes 150000] [--max-nodes 1000]
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+
+import networkx as nx
+
+from lightrag.kg.networkx_impl import NetworkXStorage
+from lightrag.kg.shared_storage import finalize_share_data, initialize_share_data
+from lightrag.utils import logger
+
+
+def top_degree_before(graph, max_nodes):
+    sorted_nodes = sorted(dict(graph.degree()).items(), key=lambda x: x[1], reverse=True)
+    return [node for node, _ in sorted_nodes[:max_nodes]], len(sorted_nodes) > max_nodes
+
+
+def bfs_before(graph, node_label, max_depth, max_nodes):
+    bfs_nodes, visited = [], set()
+    queue = [(node_label, 0, graph.degree(node_label))]
+    while queue and len(bfs_nodes) < max_nodes:
+        current_depth = queue[0][1]
+        current_level_nodes = []
+        while queue and queue[0][1] == current_depth:
+            current_level_nodes.append(queue.pop(0))
+        current_level_nodes.sort(key=lambda x: x[2], reverse=True)
+        for current_node, depth, _ in current_level_nodes:
+            if current_node not in visited:
+                visited.add(current_node)
+                bfs_nodes.append(current_node)
+                if depth < max_depth:
+                    for neighbor in graph.neighbors(current_node):
+                        if neighbor not in visited:
+                            queue.append((neighbor, depth + 1, graph.degree(neighbor)))
+            if len(bfs_nodes) >= max_nodes:
+                break
+    return bfs_nodes, bool(queue and len(bfs_nodes) >= max_nodes)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+async def main(nodes: int, max_nodes: int) -> None:
+    logger.setLevel(logging.WARNING)
+    graph = nx.barabasi_albert_graph(nodes, 3, seed=7)
+    graph = nx.relabel_nodes(graph, {i: f"n{i}" for i in graph})
+
+    initialize_share_data(1)
+    with tempfile.TemporaryDirectory() as working_dir:
+        storage = NetworkXStorage(namespace="bench", global_config={"working_dir": working_dir}, embedding_func=None)
+        NetworkXStorage.write_nx_graph(graph, storage._graph_file)
+        await storage.initialize()
+        graph = await storage._get_graph()
+        print(f"Barabasi-Albert graph, {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+
+        expected, before = timed(top_degree_before, graph, max_nodes)
+        result, after = timed(storage._top_degree_nodes, graph, max_nodes)
+        _, cached = timed(storage._top_degree_nodes, graph, max_nodes)
+        assert result == expected
+        label = f"top {max_nodes} by degree:"
+        print(f"  {label:40} {before:8.1f} ms before, {after:8.1f} ms now, {cached:.3f} ms cached")
+
+        # The hub n0 and a peripheral node, shallow with the default limit and deep with a large one
+        for start in ("n0", f"n{nodes - 1}"):
+            for depth, limit in ((3, max_nodes), (6, 20 * max_nodes)):
+                expected, before = timed(bfs_before, graph, start, depth, limit)
+                result, after = timed(NetworkXStorage._bfs_by_degree, graph, start, depth, limit)
+                assert result == expected
+                label = f"BFS from {start}, depth {depth}, max {limit}:"
+                print(f"  {label:40} {before:8.1f} ms before, {after:8.1f} ms now")
+
+        start = time.perf_counter()
+        knowledge_graph = await storage.get_knowledge_graph("*", max_nodes=max_nodes)
+        elapsed = (time.perf_counter() - start) * 1000
+        label = "get_knowledge_graph('*'):"
+        print(f"  {label:40} {elapsed:8.1f} ms, {len(knowledge_graph.nodes)} nodes")
+        await storage.finalize()
+    finalize_share_data()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=150000)
+    parser.add_argument("--max-nodes", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.nodes, args.max_nodes))
@@ -0,0 +1,102 @@
+"""
+PGVectorStorage upsert throughput: one INSERT round trip per row vs. binary COPY upsert
+
+Needs a PostgreSQL server with pgvector, configured through the same POSTGRES_* environment
+variables (or config.ini) as the storage. Rows are written to a separate workspace, which is
+emptied before and after the run.
+
+The per-row variant is the loop PGVectorStorage.upsert ran before bulk loading: the upsert_chunk
+statement executed once per row with the embedding as JSON text.
+
+Usage: python -m benchmarks.postgres_upsert [--rows 10000] [--dim 1024] [--workspace bench_upsert]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import time
+from datetime import timezone
+
+import numpy as np
+
+from lightrag.kg.postgres_impl import SQL_TEMPLATES, ClientManager, PGVectorStorage, PostgreSQLDB
+from lightrag.utils import EmbeddingFunc, logger
+
+
+def build_data(rows: int, offset: int = 0) -> dict[str, dict]:
+    return {
+        f"chunk-{offset + i}": {
+            "content": f"chunk {offset + i} " + "lorem ipsum " * 40,
+            "tokens": 100,
+            "chunk_order_index": i,
+            "full_doc_id": f"doc-{(offset + i) // 50}",
+            "file_path": "bench.txt",
+        }
+        for i in range(rows)
+    }
+
+
+async def upsert_per_row(storage: PGVectorStorage, data: dict[str, dict], embeddings: np.ndarray) -> None:
+    current_time = datetime.datetime.now(timezone.utc)
+    for (chunk_id, chunk), embedding in zip(data.items(), embeddings):
+        _, row = storage._upsert_chunks({"__id__": chunk_id, "__vector__": embedding, **chunk}, current_time)
+        row["content_vector"] = json.dumps(embedding.tolist())
+        await storage.db.execute(SQL_TEMPLATES["upsert_chunk"], row)
+
+
+async def main(rows: int, dim: int, workspace: str) -> None:
+    logger.setLevel(logging.WARNING)
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(rows, dim)).astype(np.float32)
+
+    async def embed(texts: list[str], **kwargs) -> np.ndarray:
+        # Precomputed, so only the database write is timed
+        return embeddings[[int(text.split(" ", 2)[1]) % rows for text in texts]]
+
+    db = PostgreSQLDB({**ClientManager.get_config(), "workspace": workspace})
+    await db.initdb()
+    await db.check_tables()
+    storage = PGVectorStorage(
+        namespace="chunks",
+        global_config={
+            "embedding_batch_num": 256,
+            "vector_db_storage_cls_kwargs": {"cosine_better_than_threshold": 0.2},
+        },
+        embedding_func=EmbeddingFunc(embedding_dim=dim, max_token_size=8192, func=embed),
+        db=db,
+    )
+    await db.check_vector_index("LIGHTRAG_DOC_CHUNKS", dim)
+    try:
+        await storage.drop()
+        start = time.perf_counter()
+        await upsert_per_row(storage, build_data(rows), embeddings)
+        per_row = time.perf_counter() - start
+
+        await storage.drop()
+        start = time.perf_counter()
+        await storage.upsert(build_data(rows))
+        bulk = time.perf_counter() - start
+
+        # Same rows again, every one of them hits ON CONFLICT
+        start = time.perf_counter()
+        await storage.upsert(build_data(rows))
+        bulk_update = time.perf_counter() - start
+    finally:
+        await storage.drop()
+        await db.pool.close()
+
+    print(f"{rows} rows, dim {dim}, pgvector binary codec: {db.vector_binary}")
+    print(f"  row per round trip:   {rows / per_row:10.0f} rows/s")
+    print(f"  COPY upsert, insert:  {rows / bulk:10.0f} rows/s ({per_row / bulk:.1f}x)")
+    print(f"  COPY upsert, update:  {rows / bulk_update:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--workspace", default="bench_upsert")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.dim, args.workspace))
@@ -0,0 +1,112 @@
+"""
+Semantic LLM-cache lookup: linear scan over the mode bucket vs. CacheEmbeddingIndex
+
+The scan is the lookup get_best_cached_response did before the embedding index: every entry is
+hex-decoded, dequantized and compared on each probe.
+
+Usage: python -m benchmarks.semantic_cache [--entries 10000] [--dim 1024] [--probes 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from lightrag.utils import (
+    CacheData,
+    cosine_similarity,
+    dequantize_embedding,
+    get_best_cached_response,
+    logger,
+    quantize_embedding,
+    save_to_cache,
+)
+
+
+class InMemoryKV:
+    """Minimal stand-in for the LLM response cache storage"""
+
+    namespace = "llm_response_cache"
+
+    def __init__(self, working_dir: str):
+        self.global_config = {"working_dir": working_dir}
+        self._data = {}
+
+    async def get_by_id(self, id):
+        return self._data.get(id)
+
+    async def upsert(self, data):
+        self._data.update(data)
+
+
+def linear_scan(mode_cache, current_embedding, similarity_threshold=0.95, cache_type=None):
+    best_similarity, best_response = -1, None
+    for cache_data in mode_cache.values():
+        if cache_type and cache_data.get("cache_type") != cache_type:
+            continue
+        if cache_data["embedding"] is None:
+            continue
+        cached_quantized = np.frombuffer(bytes.fromhex(cache_data["embedding"]), dtype=np.uint8).reshape(
+            cache_data["embedding_shape"]
+        )
+        cached_embedding = dequantize_embedding(
+            cached_quantized, cache_data["embedding_min"], cache_data["embedding_max"]
+        )
+        similarity = cosine_similarity(current_embedding, cached_embedding)
+        if similarity > best_similarity:
+            best_similarity, best_response = similarity, cache_data["return"]
+    return best_response if best_similarity > similarity_threshold else None
+
+
+async def main(entries: int, dim: int, probes: int) -> None:
+    logger.setLevel(logging.WARNING)
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(entries, dim)).astype(np.float32)
+
+    kv = InMemoryKV(f"bench-semantic-cache-{entries}-{dim}")
+    for i, embedding in enumerate(embeddings):
+        quantized, min_val, max_val = quantize_embedding(embedding)
+        await save_to_cache(
+            kv,
+            CacheData(
+                args_hash=f"hash-{i}",
+                content=f"response {i}",
+                prompt=f"prompt {i}",
+                quantized=quantized,
+                min_val=min_val,
+                max_val=max_val,
+                mode="local",
+            ),
+        )
+    mode_cache = await kv.get_by_id("local")
+    targets = rng.integers(0, entries, size=probes)
+
+    start = time.perf_counter()
+    expected = [linear_scan(mode_cache, embeddings[i], cache_type="query") for i in targets]
+    scan = (time.perf_counter() - start) / probes
+
+    # The first lookup builds the index, time it separately
+    start = time.perf_counter()
+    await get_best_cached_response(kv, embeddings[targets[0]], mode="local", cache_type="query")
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = [await get_best_cached_response(kv, embeddings[i], mode="local", cache_type="query") for i in targets]
+    indexed = (time.perf_counter() - start) / probes
+
+    assert found == expected, "index and linear scan disagree"
+    print(f"{entries} entries, dim {dim}, {probes} probes")
+    print(f"  linear scan:     {scan * 1000:8.2f} ms/lookup")
+    print(f"  index build:     {build * 1000:8.2f} ms (first lookup)")
+    print(f"  indexed lookup:  {indexed * 1000:8.2f} ms/lookup ({scan / indexed:.0f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--probes", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.entries, args.dim, args.probes))
@@ -0,0 +1,244 @@
+"""
+Qdrant and Milvus backends: blocking client calls on the event loop vs. async / executor calls
+
+Runs the storages against in-process stand-ins of qdrant_client and pymilvus that simulate a
+server with a fixed request latency and a per-point indexing cost, so the numbers show how
+the event loop is used, not how fast a given deployment is. The "before" variants call the
+synchronous clients directly from coroutines, as the backends did before.
+
+Usage: python -m benchmarks.vector_db_clients [--latency-ms 20] [--queries 50] [--points 1000]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+import types
+
+import numpy as np
+import pipmaster as pm
+
+from lightrag.utils import EmbeddingFunc, logger
+
+LATENCY = 0.02
+# Server time to index one point
+POINT_COST = 0.00005
+
+
+class _Record(types.SimpleNamespace):
+    pass
+
+
+def _record_factory(*args, **kwargs) -> _Record:
+    return _Record(args=args, **kwargs)
+
+
+class StandInQdrantServer:
+    """Applies upserts in arrival order on one update worker, like a single Qdrant shard"""
+
+    def __init__(self):
+        self.points = {}
+        self._updates: asyncio.Task | None = None
+
+    async def update(self, points, wait: bool) -> None:
+        previous = self._updates
+
+        async def apply():
+            if previous is not None:
+                await previous
+            await asyncio.sleep(POINT_COST * len(points))
+            self.points.update((point.id, point) for point in points)
+
+        self._updates = asyncio.ensure_future(apply())
+        await asyncio.sleep(LATENCY)
+        if wait:
+            await self._updates
+
+
+QDRANT_SERVER = StandInQdrantServer()
+
+
+class AsyncQdrantClient:
+    def __init__(self, url=None, api_key=None):
+        pass
+
+    async def collection_exists(self, collection_name):
+        await asyncio.sleep(LATENCY)
+        return True
+
+    async def upsert(self, collection_name, points, wait=True):
+        await QDRANT_SERVER.update(points, wait)
+
+    async def delete(self, collection_name, points_selector, wait=True):
+        await QDRANT_SERVER.update([], wait)
+
+    async def search(self, **kwargs):
+        await asyncio.sleep(LATENCY)
+        return []
+
+    async def close(self):
+        pass
+
+
+class QdrantClient:
+    """The synchronous client the backend used before"""
+
+    def __init__(self, url=None, api_key=None):
+        pass
+
+    def upsert(self, collection_name, points, wait=True):
+        time.sleep(LATENCY + POINT_COST * len(points))
+
+    def search(self, **kwargs):
+        time.sleep(LATENCY)
+        return []
+
+
+class MilvusClient:
+    def __init__(self, **kwargs):
+        pass
+
+    def has_collection(self, collection_name):
+        time.sleep(LATENCY)
+        return True
+
+    def upsert(self, collection_name, data):
+        time.sleep(LATENCY + POINT_COST * len(data))
+
+    def search(self, **kwargs):
+        time.sleep(LATENCY)
+        return [[]]
+
+
+def install_stand_ins() -> None:
+    qdrant_client = types.ModuleType("qdrant_client")
+    qdrant_client.AsyncQdrantClient = AsyncQdrantClient
+    qdrant_client.QdrantClient = QdrantClient
+    model_names = ["VectorParams", "PointStruct", "PointIdsList", "FilterSelector", "Filter", "HasIdCondition"]
+    qdrant_client.models = types.SimpleNamespace(
+        **{name: _record_factory for name in model_names + ["FieldCondition", "MatchValue"]},
+        Distance=types.SimpleNamespace(COSINE="Cosine"),
+    )
+    pymilvus = types.ModuleType("pymilvus")
+    pymilvus.MilvusClient = MilvusClient
+    sys.modules["qdrant_client"] = qdrant_client
+    sys.modules["pymilvus"] = pymilvus
+    # The backends install missing client packages on import, the stand-ins make that unnecessary
+    is_installed = pm.is_installed
+    pm.is_installed = lambda name: name in ("qdrant-client", "pymilvus") or is_installed(name)
+
+
+async def embed(texts: list[str], **kwargs) -> np.ndarray:
+    return np.ones((len(texts), 8))
+
+
+async def elapsed(*awaitables) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*awaitables)
+    return time.perf_counter() - start
+
+
+async def max_loop_lag(*awaitables) -> float:
+    """Run the awaitables and report the longest time a 1 ms timer fired late meanwhile"""
+    done = asyncio.Event()
+    lags = [0.0]
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    async def run():
+        await asyncio.gather(*awaitables)
+        done.set()
+
+    await asyncio.gather(ticker(), run())
+    return max(lags)
+
+
+async def main(queries: int, points: int) -> None:
+    logger.setLevel(logging.WARNING)
+    install_stand_ins()
+    from lightrag.kg.milvus_impl import MilvusVectorDBStorage
+    from lightrag.kg.qdrant_impl import QdrantVectorDBStorage, compute_mdhash_id_for_qdrant, models
+
+    embedding_func = EmbeddingFunc(embedding_dim=8, max_token_size=8192, func=embed)
+    data = {f"chunk-{i}": {"content": f"chunk {i}"} for i in range(points)}
+    print(f"Stand-in servers, {LATENCY * 1000:.0f} ms per request, {POINT_COST * 1e6:.0f} us per indexed point")
+
+    with tempfile.TemporaryDirectory() as working_dir:
+        global_config = {
+            "working_dir": working_dir,
+            "embedding_batch_num": 32,
+            "vector_db_storage_cls_kwargs": {"cosine_better_than_threshold": 0.2},
+        }
+        qdrant = QdrantVectorDBStorage(
+            namespace="chunks", global_config=global_config, embedding_func=embedding_func, meta_fields={"content"}
+        )
+        milvus = MilvusVectorDBStorage(
+            namespace="chunks", global_config=global_config, embedding_func=embedding_func, meta_fields={"content"}
+        )
+        await qdrant.initialize()
+        await milvus.initialize()
+
+        sync_qdrant = QdrantClient()
+
+        async def qdrant_query_before():
+            await embed(["query"])
+            sync_qdrant.search()
+
+        async def milvus_query_before():
+            await embed(["query"])
+            milvus._client.search()
+
+        print(f"{queries} concurrent queries:")
+        for name, before, storage in (
+            ("qdrant", qdrant_query_before, qdrant),
+            ("milvus", milvus_query_before, milvus),
+        ):
+            old = await elapsed(*[before() for _ in range(queries)])
+            new = await elapsed(*[storage.query("query", 5) for _ in range(queries)])
+            print(f"  {name}: {old * 1000:7.0f} ms before, {new * 1000:7.0f} ms now")
+
+        old = await max_loop_lag(*[milvus_query_before() for _ in range(queries)])
+        new = await max_loop_lag(*[milvus.query("query", 5) for _ in range(queries)])
+        print(f"  longest event loop stall during milvus queries: {old * 1000:.0f} ms before, {new * 1000:.1f} ms now")
+
+        print(f"Upsert of {points} points:")
+        points_before = [
+            models.PointStruct(id=compute_mdhash_id_for_qdrant(key), vector=None, payload=value)
+            for key, value in data.items()
+        ]
+        start = time.perf_counter()
+        sync_qdrant.upsert("chunks", points_before, wait=True)
+        old = time.perf_counter() - start
+        start = time.perf_counter()
+        await qdrant.upsert(data)
+        returned = time.perf_counter() - start
+        await qdrant.index_done_callback()
+        applied = time.perf_counter() - start
+        assert len(QDRANT_SERVER.points) == points
+        print(
+            f"  qdrant: {old * 1000:7.0f} ms before (one request, wait=True), "
+            f"now returns after {returned * 1000:.0f} ms and is applied after {applied * 1000:.0f} ms"
+        )
+        start = time.perf_counter()
+        milvus._client.upsert("chunks", list(data.values()))
+        old = time.perf_counter() - start
+        new = await elapsed(milvus.upsert(data))
+        print(f"  milvus: {old * 1000:7.0f} ms before (one request), {new * 1000:7.0f} ms now (concurrent batches)")
+
+        await qdrant.finalize()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--points", type=int, default=1000)
+    args = parser.parse_args()
+    LATENCY = args.latency_ms / 1000
+    asyncio.run(main(args.queries, args.points))
@@ -30,7 +30,13 @@ from lightrag.api.routers.ollama_api import OllamaAPI
 from lightrag.api.routers.query_routes import create_query_routes
 from lightrag.api.utils_api import check_env_file, display_splash_screen, get_combined_auth_dependency
 from lightrag.constants import DEFAULT_LOG_BACKUP_COUNT, DEFAULT_LOG_FILENAME, DEFAULT_LOG_MAX_BYTES
-from lightrag.kg.shared_storage import get_namespace_data, get_pipeline_status_lock, initialize_pipeline_status
+from lightrag.kg.shared_storage import (
+    get_lock_wait_stats,
+    get_namespace_data,
+    get_pipeline_status_lock,
+    initialize_pipeline_status,
+)
+from lightrag.llm.client_pool import client_registry
 from lightrag.types import GPTKeywordExtractionFormat
 from lightrag.utils import EmbeddingFunc, get_env_value, logger, set_verbose_debug
 
@@ -431,6 +437,8 @@ def create_app(args):
                 },
                 "auth_mode": auth_mode,
                 "pipeline_busy": pipeline_status.get("busy", False),
+                "llm_client_pools": client_registry.metrics(),
+                "lock_wait": get_lock_wait_stats(),
                 "core_version": core_version,
                 "api_version": __api_version__,
                 "webui_title": webui_title,
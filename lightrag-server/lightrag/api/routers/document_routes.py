@@ -307,6 +307,7 @@ class PipelineStatusResponse(BaseModel):
         latest_message: Latest message from pipeline processing
         history_messages: List of history messages
         update_status: Status of update flags for all namespaces
+        stages: Worker count, queue depth, counters and throughput of each ingestion stage
     """
 
     autoscanned: bool = False
@@ -320,6 +321,7 @@ class PipelineStatusResponse(BaseModel):
     latest_message: str = ""
     history_messages: Optional[List[str]] = None
     update_status: Optional[dict] = None
+    stages: Optional[dict] = None
 
     @field_validator("job_start", mode="before")
     @classmethod
@@ -982,6 +984,7 @@ def create_document_routes(rag: LightRAG, doc_manager: DocumentManager, api_key:
             storages = [
                 rag.text_chunks,
                 rag.full_docs,
+                rag.doc_index,
                 rag.entities_vdb,
                 rag.relationships_vdb,
                 rag.chunks_vdb,
@@ -2,17 +2,24 @@
 This module contains all graph-related routes for the LightRAG API.
 """
 
+import base64
+import json
 import traceback
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from lightrag.utils import logger
+from fastapi.responses import StreamingResponse
+from lightrag.types import KnowledgeGraphMeta, KnowledgeGraphNode
+from lightrag.utils import compute_args_hash, logger
 from pydantic import BaseModel
 
 from ..utils_api import get_combined_auth_dependency
 
 router = APIRouter(tags=["graph"])
 
+# Stream items serialized into one chunk of the response body
+STREAM_BATCH_SIZE = 200
+
 
 class EntityUpdateRequest(BaseModel):
     entity_name: str
@@ -26,6 +33,68 @@ class RelationUpdateRequest(BaseModel):
     updated_data: Dict[str, Any]
 
 
+def encode_graph_cursor(query_hash: str, version: Optional[str], offset: int) -> str:
+    """Opaque cursor pointing after the first offset items of a graph stream at a graph version"""
+    raw = json.dumps({"q": query_hash, "v": version, "o": offset}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_graph_cursor(cursor: str, query_hash: str, version: Optional[str]) -> int:
+    """Return the offset of a cursor
+
+    Raises ValueError if the cursor is malformed, belongs to another query or was issued
+    for another version of the graph, whose stream may have shifted since.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(payload["o"])
+    except Exception as e:
+        raise ValueError("Malformed cursor") from e
+    if payload.get("q") != query_hash or offset < 0:
+        raise ValueError("Cursor does not belong to this query")
+    if payload.get("v") != version:
+        raise ValueError("Graph changed since the cursor was issued, restart from the first page")
+    return offset
+
+
+async def stream_graph_ndjson(
+    meta: KnowledgeGraphMeta, items: AsyncIterator[Any], query_hash: str, offset: int, limit: Optional[int]
+) -> AsyncIterator[str]:
+    """Serialize a knowledge graph stream as JSON lines
+
+    meta is the first item of the stream, already taken from items. Lines are {"type": "meta",
+    "is_truncated": ...} first, then {"type": "node" | "edge", "data": ...} for at most limit
+    items after offset, then {"type": "end", "count": ..., "next_cursor": ...} where next_cursor
+    is null once the stream is exhausted.
+    """
+    lines = [json.dumps({"type": "meta", "is_truncated": meta.is_truncated})]
+    position = 0
+    count = 0
+    next_cursor = None
+    try:
+        async for item in items:
+            if position < offset:
+                position += 1
+                continue
+            if limit is not None and count >= limit:
+                next_cursor = encode_graph_cursor(query_hash, meta.version, position)
+                break
+            item_type = "node" if isinstance(item, KnowledgeGraphNode) else "edge"
+            lines.append(json.dumps({"type": item_type, "data": item.model_dump()}, ensure_ascii=False))
+            position += 1
+            count += 1
+            if len(lines) >= STREAM_BATCH_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines = []
+    except Exception as e:
+        logger.error(f"Error streaming knowledge graph: {str(e)}")
+        logger.error(traceback.format_exc())
+        lines.append(json.dumps({"type": "error", "error": str(e)}))
+    else:
+        lines.append(json.dumps({"type": "end", "count": count, "next_cursor": next_cursor}))
+    yield "\n".join(lines) + "\n"
+
+
 def create_graph_routes(rag, api_key: Optional[str] = None):
     combined_auth = get_combined_auth_dependency(api_key)
 
@@ -49,6 +118,9 @@ def create_graph_routes(rag, api_key: Optional[str] = None):
         label: str = Query(..., description="Label to get knowledge graph for"),
         max_depth: int = Query(3, description="Maximum depth of graph", ge=1),
         max_nodes: int = Query(1000, description="Maximum nodes to return", ge=1),
+        stream: bool = Query(False, description="Stream nodes and edges as JSON lines"),
+        cursor: Optional[str] = Query(None, description="Resume a stream from the next_cursor of a previous page"),
+        limit: Optional[int] = Query(None, description="Maximum nodes and edges per streamed page", ge=1),
     ):
         """
         Retrieve a connected subgraph of nodes where the label includes the specified label.
@@ -60,10 +132,40 @@ def create_graph_routes(rag, api_key: Optional[str] = None):
             label (str): Label of the starting node
             max_depth (int, optional): Maximum depth of the subgraph,Defaults to 3
             max_nodes: Maxiumu nodes to return
+            stream: Return application/x-ndjson with one line per node or edge, nodes first,
+                so clients can render while the graph is still being produced
+            cursor: Streaming only, continue after the items of the previous page. Every page
+                re-runs the query and skips the items of the pages before it, a cursor is
+                rejected with 400 once the graph changed in between
+            limit: Streaming only, maximum number of nodes and edges in this page
 
         Returns:
             Dict[str, List[str]]: Knowledge graph for label
         """
+        if stream:
+            query_hash = compute_args_hash(json.dumps([label, max_depth, max_nodes]))
+            items = rag.stream_knowledge_graph(node_label=label, max_depth=max_depth, max_nodes=max_nodes)
+            try:
+                # The meta item carries the graph version the cursor is checked against
+                meta = await items.__anext__()
+            except Exception as e:
+                logger.error(f"Error getting knowledge graph for label '{label}': {str(e)}")
+                logger.error(traceback.format_exc())
+                raise HTTPException(status_code=500, detail=f"Error getting knowledge graph: {str(e)}")
+            try:
+                offset = decode_graph_cursor(cursor, query_hash, meta.version) if cursor else 0
+            except ValueError as ve:
+                await items.aclose()
+                raise HTTPException(status_code=400, detail=str(ve))
+            return StreamingResponse(
+                stream_graph_ndjson(meta, items, query_hash, offset, limit),
+                media_type="application/x-ndjson",
+                headers={
+                    "Cache-Control": "no-cache",
+                    "X-Accel-Buffering": "no",  # Ensure proper handling of streaming response when proxied by Nginx
+                },
+            )
+
         try:
             return await rag.get_knowledge_graph(
                 node_label=label,
@@ -115,6 +115,10 @@ class QueryResponse(BaseModel):
     response: str = Field(
         description="The generated response",
     )
+    metadata: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Query execution metadata, e.g. per-leg retrieval timings in seconds.",
+    )
 
 
 def create_query_routes(rag, api_key: Optional[str] = None, top_k: int = 60):
@@ -139,16 +143,17 @@ def create_query_routes(rag, api_key: Optional[str] = None, top_k: int = 60):
         try:
             param = request.to_query_params(False)
             response = await rag.aquery(request.query, param=param)
+            metadata = {"timings": param.timings} if param.timings else None
 
             # If response is a string (e.g. cache hit), return directly
             if isinstance(response, str):
-                return QueryResponse(response=response)
+                return QueryResponse(response=response, metadata=metadata)
 
             if isinstance(response, dict):
                 result = json.dumps(response, indent=2)
-                return QueryResponse(response=result)
+                return QueryResponse(response=result, metadata=metadata)
             else:
-                return QueryResponse(response=str(response))
+                return QueryResponse(response=str(response), metadata=metadata)
         except Exception as e:
             trace_exception(e)
             raise HTTPException(status_code=500, detail=str(e))
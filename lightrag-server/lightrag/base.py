@@ -4,12 +4,12 @@ import os
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Callable, Literal, TypedDict, TypeVar
+from typing import Any, AsyncIterator, Callable, Literal, TypedDict, TypeVar
 
 from dotenv import load_dotenv
 
-from .types import KnowledgeGraph
-from .utils import EmbeddingFunc
+from .types import KnowledgeGraph, KnowledgeGraphEdge, KnowledgeGraphMeta, KnowledgeGraphNode
+from .utils import EmbeddingFunc, compute_args_hash, get_env_value
 
 # use the .env that is inside the current folder
 # allows to use different .env file for each lightrag instance
@@ -92,6 +92,17 @@ class QueryParam:
     If proivded, this will be use instead of the default vaulue from prompt template.
     """
 
+    retrieval_timeout: float | None = get_env_value("RETRIEVAL_TIMEOUT", None, float)
+    """Per-leg timeout in seconds for the concurrent retrieval legs (entities, relations, vector chunks).
+    A leg that exceeds the timeout is dropped and the context is built from the remaining legs.
+    None disables the timeout.
+    """
+
+    timings: dict[str, float] = field(default_factory=dict)
+    """Filled during query execution with elapsed seconds per retrieval stage, e.g. {"local": 0.12}.
+    "tokenize" holds the total time spent counting tokens to truncate the context.
+    """
+
 
 @dataclass
 class StorageNameSpace(ABC):
@@ -227,6 +238,24 @@ class BaseKVStorage(StorageNameSpace, ABC):
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         """Get values by ids"""
 
+    async def get_fields_by_ids(self, ids: list[str], fields: list[str] | None = None) -> dict[str, dict[str, Any]]:
+        """Get the values of several ids in one round trip, keyed by id
+
+        Ids without a value are left out. When fields is given only those fields are
+        returned, backends that can project on the server side do so to transfer less data.
+
+        The default implementation expects get_by_ids() to return one entry per id in the
+        same order, with None for missing ids; backends returning only the rows found
+        must override it.
+        """
+        if not ids:
+            return {}
+        results = {}
+        for id, value in zip(ids, await self.get_by_ids(ids)):
+            if value is not None:
+                results[id] = value if fields is None else {k: value[k] for k in fields if k in value}
+        return results
+
     @abstractmethod
     async def filter_keys(self, keys: set[str]) -> set[str]:
         """Return un-exist keys"""
@@ -454,6 +483,33 @@ class BaseGraphStorage(StorageNameSpace, ABC):
             edge_data: A dictionary of edge properties
         """
 
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """Insert or update multiple nodes as a batch
+
+        Default implementation upserts nodes one by one.
+        Override this method for better performance in storage backends
+        that support batch operations.
+
+        Args:
+            nodes: Mapping of node ID to node properties
+        """
+        for node_id, node_data in nodes.items():
+            await self.upsert_node(node_id, node_data)
+
+    async def upsert_edges_batch(self, edges: dict[tuple[str, str], dict[str, str]]) -> None:
+        """Insert or update multiple edges as a batch
+
+        Default implementation upserts edges one by one.
+        Override this method for better performance in storage backends
+        that support batch operations. Both endpoints of every edge must
+        already exist, callers upsert missing nodes first.
+
+        Args:
+            edges: Mapping of (source_node_id, target_node_id) to edge properties
+        """
+        for (src_id, tgt_id), edge_data in edges.items():
+            await self.upsert_edge(src_id, tgt_id, edge_data)
+
     @abstractmethod
     async def delete_node(self, node_id: str) -> None:
         """Delete a node from the graph.
@@ -516,6 +572,27 @@ class BaseGraphStorage(StorageNameSpace, ABC):
             indicating whether the graph was truncated due to max_nodes limit
         """
 
+    async def stream_knowledge_graph(
+        self, node_label: str, max_depth: int = 3, max_nodes: int = 1000
+    ) -> AsyncIterator[KnowledgeGraphMeta | KnowledgeGraphNode | KnowledgeGraphEdge]:
+        """Yield the subgraph of get_knowledge_graph() item by item
+
+        Default implementation builds the whole graph first. Override this method in
+        storage backends that can produce nodes and edges incrementally.
+
+        Yields:
+            A KnowledgeGraphMeta with the is_truncated flag and the graph version, then all
+            nodes, then all edges, in the same order on every call for an unchanged graph
+        """
+        graph = await self.get_knowledge_graph(node_label, max_depth, max_nodes)
+        # Backends do not expose a write generation, the order of the ids is what a cursor depends on
+        version = compute_args_hash("\n".join([node.id for node in graph.nodes] + [edge.id for edge in graph.edges]))
+        yield KnowledgeGraphMeta(is_truncated=graph.is_truncated, version=version)
+        for node in graph.nodes:
+            yield node
+        for edge in graph.edges:
+            yield edge
+
 
 class DocStatus(str, Enum):
     """Document processing status"""
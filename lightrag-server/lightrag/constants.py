@@ -11,6 +11,11 @@ DEFAULT_MAX_TOKEN_SUMMARY = 500
 DEFAULT_FORCE_LLM_SUMMARY_ON_MERGE = 6
 DEFAULT_WOKERS = 2
 DEFAULT_TIMEOUT = 150
+DEFAULT_GRAPH_DB_LOCK_STRIPES = 64
+DEFAULT_STORAGE_LOCK_STRIPES = 32
+DEFAULT_MAX_SHARED_NAMESPACES = 256
+DEFAULT_KV_PLANE_COMPACT_BYTES = 64 * 1024 * 1024
+DEFAULT_TOKEN_COUNT_CACHE_SIZE = 200000
 
 # Logging configuration defaults
 DEFAULT_LOG_MAX_BYTES = 10485760  # Default 10MB
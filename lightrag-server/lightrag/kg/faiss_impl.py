@@ -2,6 +2,7 @@ import asyncio
 import json
 import os
 import time
+from collections import defaultdict
 from dataclasses import dataclass
 from typing import Any, final
 
@@ -44,14 +45,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
         # Embedding dimension (e.g. 768) must match your embedding function
         self._dim = self.embedding_func.embedding_dim
 
-        # Create an empty Faiss index for inner product (useful for normalized vectors = cosine similarity).
-        # If you have a large number of vectors, you might want IVF or other indexes.
-        # For demonstration, we use a simple IndexFlatIP.
-        self._index = faiss.IndexFlatIP(self._dim)
-        # Keep a local store for metadata, IDs, etc.
-        # Maps <int faiss_id> → metadata (including your original ID).
-        self._id_to_meta = {}
-
+        self._reset_index()
         self._load_faiss_index()
 
     async def initialize(self):
@@ -59,7 +53,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
         # Get the update flag for cross-process update notification
         self.storage_updated = await get_update_flag(self.namespace)
         # Get the storage lock for use in other methods
-        self._storage_lock = get_storage_lock()
+        self._storage_lock = get_storage_lock(namespace=self.namespace)
 
     async def _get_index(self):
         """Check if the shtorage should be reloaded"""
@@ -69,8 +63,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
             if self.storage_updated.value:
                 logger.info(f"Process {os.getpid()} FAISS reloading {self.namespace} due to update by another process")
                 # Reload data
-                self._index = faiss.IndexFlatIP(self._dim)
-                self._id_to_meta = {}
+                self._reset_index()
                 self._load_faiss_index()
                 self.storage_updated.value = False
             return self._index
@@ -128,26 +121,21 @@ class FaissVectorDBStorage(BaseVectorStorage):
         # 1. Identify which vectors to remove if they exist
         # 2. Remove them
         # 3. Add the new vectors
-        existing_ids_to_remove = []
-        for meta, emb in zip(list_data, embeddings):
-            faiss_internal_id = self._find_faiss_id_by_custom_id(meta["__id__"])
-            if faiss_internal_id is not None:
-                existing_ids_to_remove.append(faiss_internal_id)
-
+        existing_ids_to_remove = [
+            self._custom_id_to_fid[meta["__id__"]] for meta in list_data if meta["__id__"] in self._custom_id_to_fid
+        ]
         if existing_ids_to_remove:
             await self._remove_faiss_ids(existing_ids_to_remove)
 
-        # Step 2: Add new vectors
+        # Step 2: Add new vectors under fresh Faiss ids
         index = await self._get_index()
-        start_idx = index.ntotal
-        index.add(embeddings)
+        fids = np.arange(self._next_fid, self._next_fid + len(list_data), dtype=np.int64)
+        self._next_fid += len(list_data)
+        index.add_with_ids(embeddings, fids)
 
-        # Step 3: Store metadata + vector for each new ID
-        for i, meta in enumerate(list_data):
-            fid = start_idx + i
-            # Store the raw vector so we can rebuild if something is removed
-            meta["__vector__"] = embeddings[i].tolist()
-            self._id_to_meta.update({fid: meta})
+        # Step 3: Store metadata for each new ID, the vector itself lives only in the Faiss index
+        for fid, meta in zip(fids.tolist(), list_data):
+            self._add_meta(fid, meta)
 
         logger.info(f"Upserted {len(list_data)} vectors into Faiss index.")
         return [m["__id__"] for m in list_data]
@@ -207,11 +195,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
            KG-storage-log should be used to avoid data corruption
         """
         logger.info(f"Deleting {len(ids)} vectors from {self.namespace}")
-        to_remove = []
-        for cid in ids:
-            fid = self._find_faiss_id_by_custom_id(cid)
-            if fid is not None:
-                to_remove.append(fid)
+        to_remove = [self._custom_id_to_fid[cid] for cid in ids if cid in self._custom_id_to_fid]
 
         if to_remove:
             await self._remove_faiss_ids(to_remove)
@@ -236,10 +220,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
            KG-storage-log should be used to avoid data corruption
         """
         logger.debug(f"Searching relations for entity {entity_name}")
-        relations = []
-        for fid, meta in self._id_to_meta.items():
-            if meta.get("src_id") == entity_name or meta.get("tgt_id") == entity_name:
-                relations.append(fid)
+        relations = list(self._entity_to_relation_fids.get(entity_name, ()))
 
         logger.debug(f"Found {len(relations)} relations for {entity_name}")
         if relations:
@@ -250,39 +231,55 @@ class FaissVectorDBStorage(BaseVectorStorage):
     # Internal helper methods
     # --------------------------------------------------------------------------------
 
+    def _reset_index(self):
+        """
+        Start from an empty index and empty lookup tables.
+        """
+        # Inner product on normalized vectors = cosine similarity. IndexIDMap2 lets us assign our own
+        # stable ids and remove vectors in place instead of rebuilding the index on every delete.
+        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(self._dim))
+        # Maps <int faiss_id> → metadata (including your original ID).
+        self._id_to_meta: dict[int, dict[str, Any]] = {}
+        # Maps <custom id> → <int faiss_id>
+        self._custom_id_to_fid: dict[str, int] = {}
+        # Maps <entity name> → faiss ids of relations having it as src_id or tgt_id
+        self._entity_to_relation_fids: defaultdict[str, set[int]] = defaultdict(set)
+        self._next_fid = 0
+
+    def _add_meta(self, fid: int, meta: dict[str, Any]):
+        self._id_to_meta[fid] = meta
+        self._custom_id_to_fid[meta["__id__"]] = fid
+        for key in ("src_id", "tgt_id"):
+            if meta.get(key) is not None:
+                self._entity_to_relation_fids[meta[key]].add(fid)
+
+    def _drop_meta(self, fid: int):
+        meta = self._id_to_meta.pop(fid, None)
+        if meta is None:
+            return
+        if self._custom_id_to_fid.get(meta["__id__"]) == fid:
+            del self._custom_id_to_fid[meta["__id__"]]
+        for key in ("src_id", "tgt_id"):
+            fids = self._entity_to_relation_fids.get(meta.get(key))
+            if fids is not None:
+                fids.discard(fid)
+                if not fids:
+                    del self._entity_to_relation_fids[meta[key]]
+
     def _find_faiss_id_by_custom_id(self, custom_id: str):
         """
         Return the Faiss internal ID for a given custom ID, or None if not found.
         """
-        for fid, meta in self._id_to_meta.items():
-            if meta.get("__id__") == custom_id:
-                return fid
-        return None
+        return self._custom_id_to_fid.get(custom_id)
 
     async def _remove_faiss_ids(self, fid_list):
         """
-        Remove a list of internal Faiss IDs from the index.
-        Because IndexFlatIP doesn't support 'removals',
-        we rebuild the index excluding those vectors.
+        Remove a list of internal Faiss IDs from the index with a single batched removal.
         """
-        keep_fids = [fid for fid in self._id_to_meta if fid not in fid_list]
-
-        # Rebuild the index
-        vectors_to_keep = []
-        new_id_to_meta = {}
-        for new_fid, old_fid in enumerate(keep_fids):
-            vec_meta = self._id_to_meta[old_fid]
-            vectors_to_keep.append(vec_meta["__vector__"])  # stored as list
-            new_id_to_meta[new_fid] = vec_meta
-
         async with self._storage_lock:
-            # Re-init index
-            self._index = faiss.IndexFlatIP(self._dim)
-            if vectors_to_keep:
-                arr = np.array(vectors_to_keep, dtype=np.float32)
-                self._index.add(arr)
-
-            self._id_to_meta = new_id_to_meta
+            self._index.remove_ids(np.asarray(list(fid_list), dtype=np.int64))
+            for fid in fid_list:
+                self._drop_meta(fid)
 
     def _save_faiss_index(self):
         """
@@ -291,7 +288,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
         faiss.write_index(self._index, self._faiss_index_file)
 
         # Save metadata dict to JSON. Convert all keys to strings for JSON storage.
-        # _id_to_meta is { int: { '__id__': doc_id, '__vector__': [float,...], ... } }
+        # _id_to_meta is { int: { '__id__': doc_id, ... } }, vectors are persisted by the Faiss index only.
         # We'll keep the int -> dict, but JSON requires string keys.
         serializable_dict = {}
         for fid, meta in self._id_to_meta.items():
@@ -311,23 +308,33 @@ class FaissVectorDBStorage(BaseVectorStorage):
 
         try:
             # Load the Faiss index
-            self._index = faiss.read_index(self._faiss_index_file)
+            index = faiss.read_index(self._faiss_index_file)
+            if not isinstance(index, faiss.IndexIDMap2):
+                # Index written before custom ids were used: positions are the ids
+                flat_index = index
+                index = faiss.IndexIDMap2(faiss.IndexFlatIP(self._dim))
+                if flat_index.ntotal:
+                    index.add_with_ids(
+                        flat_index.reconstruct_n(0, flat_index.ntotal),
+                        np.arange(flat_index.ntotal, dtype=np.int64),
+                    )
+            self._index = index
             # Load metadata
             with open(self._meta_file, "r", encoding="utf-8") as f:
                 stored_dict = json.load(f)
 
             # Convert string keys back to int
-            self._id_to_meta = {}
             for fid_str, meta in stored_dict.items():
-                fid = int(fid_str)
-                self._id_to_meta[fid] = meta
+                # Older metadata files kept a copy of every vector
+                meta.pop("__vector__", None)
+                self._add_meta(int(fid_str), meta)
+            self._next_fid = max(self._id_to_meta, default=-1) + 1
 
             logger.info(f"Faiss index loaded with {self._index.ntotal} vectors from {self._faiss_index_file}")
         except Exception as e:
             logger.error(f"Failed to load Faiss index or metadata: {e}")
             logger.warning("Starting with an empty Faiss index.")
-            self._index = faiss.IndexFlatIP(self._dim)
-            self._id_to_meta = {}
+            self._reset_index()
 
     async def index_done_callback(self) -> None:
         async with self._storage_lock:
@@ -335,8 +342,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
             if self.storage_updated.value:
                 # Storage was updated by another process, reload data instead of saving
                 logger.warning(f"Storage for FAISS {self.namespace} was updated by another process, reloading...")
-                self._index = faiss.IndexFlatIP(self._dim)
-                self._id_to_meta = {}
+                self._reset_index()
                 self._load_faiss_index()
                 self.storage_updated.value = False
                 return False  # Return error
@@ -428,8 +434,7 @@ class FaissVectorDBStorage(BaseVectorStorage):
         try:
             async with self._storage_lock:
                 # Reset the index
-                self._index = faiss.IndexFlatIP(self._dim)
-                self._id_to_meta = {}
+                self._reset_index()
 
                 # Remove storage files if they exist
                 if os.path.exists(self._faiss_index_file):
@@ -437,7 +442,6 @@ class FaissVectorDBStorage(BaseVectorStorage):
                 if os.path.exists(self._meta_file):
                     os.remove(self._meta_file)
 
-                self._id_to_meta = {}
                 self._load_faiss_index()
 
                 # Notify other processes
@@ -0,0 +1,220 @@
+"""
+Compact binary serialization of NetworkX graphs.
+
+GraphML is a verbose XML format and parsing it dominated the reload time of large
+graphs. This format stores a table of interned strings followed by typed arrays:
+
+    header    magic, byte order, flags and the length of every section
+    strings   code point lengths (uint32) and the UTF-8 encoded concatenation
+    nodes     node id string index and attribute count per node (uint32)
+    edges     source, target string index and attribute count per edge (uint32)
+    attrs     key string index (uint32) and type tag (uint8) per attribute, values in
+              an int64 array (ints, bools, string indexes) and a float64 array
+
+Attribute values that are not str, int, float or bool are stored as strings, the same
+as GraphML does.
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import sys
+from array import array
+from typing import Any
+
+import networkx as nx
+
+MAGIC = b"LRGRAPH"
+VERSION = 1
+
+_HEADER = struct.Struct("<7sBBBQQQQQQQ")
+_FLAG_DIRECTED = 1
+_BYTE_ORDERS = {"little": 0, "big": 1}
+
+_TAG_STR = 0
+_TAG_INT = 1
+_TAG_FLOAT = 2
+_TAG_BOOL = 3
+_TAG_NONE = 4
+
+_INT64_MIN = -(2**63)
+_INT64_MAX = 2**63 - 1
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings: dict[str, int] = {}
+        self.attr_keys = array("I")
+        self.attr_tags = array("B")
+        self.int_values = array("q")
+        self.float_values = array("d")
+
+    def intern(self, value: str) -> int:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def add_attrs(self, data: dict[str, Any]) -> int:
+        for key, value in data.items():
+            self.attr_keys.append(self.intern(str(key)))
+            if isinstance(value, bool):
+                self.attr_tags.append(_TAG_BOOL)
+                self.int_values.append(int(value))
+            elif isinstance(value, int) and _INT64_MIN <= value <= _INT64_MAX:
+                self.attr_tags.append(_TAG_INT)
+                self.int_values.append(value)
+            elif isinstance(value, float):
+                self.attr_tags.append(_TAG_FLOAT)
+                self.float_values.append(value)
+            elif value is None:
+                self.attr_tags.append(_TAG_NONE)
+            else:
+                self.attr_tags.append(_TAG_STR)
+                self.int_values.append(self.intern(value if isinstance(value, str) else str(value)))
+        return len(data)
+
+
+def encode_graph(graph: nx.Graph) -> bytes:
+    """Serialize a graph to the binary format"""
+    encoder = _Encoder()
+    node_ids = array("I")
+    node_attr_counts = array("I")
+    for node, data in graph.nodes(data=True):
+        node_ids.append(encoder.intern(str(node)))
+        node_attr_counts.append(encoder.add_attrs(data))
+
+    edge_sources = array("I")
+    edge_targets = array("I")
+    edge_attr_counts = array("I")
+    for source, target, data in graph.edges(data=True):
+        edge_sources.append(encoder.intern(str(source)))
+        edge_targets.append(encoder.intern(str(target)))
+        edge_attr_counts.append(encoder.add_attrs(data))
+
+    string_lengths = array("I", (len(value) for value in encoder.strings))
+    string_blob = "".join(encoder.strings).encode("utf-8", "surrogatepass")
+
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        _BYTE_ORDERS[sys.byteorder],
+        _FLAG_DIRECTED if graph.is_directed() else 0,
+        len(string_lengths),
+        len(string_blob),
+        len(node_ids),
+        len(edge_sources),
+        len(encoder.attr_tags),
+        len(encoder.int_values),
+        len(encoder.float_values),
+    )
+    return b"".join(
+        [
+            header,
+            string_lengths.tobytes(),
+            string_blob,
+            node_ids.tobytes(),
+            node_attr_counts.tobytes(),
+            edge_sources.tobytes(),
+            edge_targets.tobytes(),
+            edge_attr_counts.tobytes(),
+            encoder.attr_keys.tobytes(),
+            encoder.attr_tags.tobytes(),
+            encoder.int_values.tobytes(),
+            encoder.float_values.tobytes(),
+        ]
+    )
+
+
+def decode_graph(buffer: bytes) -> nx.Graph:
+    """Deserialize a graph written by encode_graph()"""
+    (
+        magic,
+        version,
+        byte_order,
+        flags,
+        string_count,
+        blob_size,
+        node_count,
+        edge_count,
+        attr_count,
+        int_count,
+        float_count,
+    ) = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a binary graph file (magic={magic!r}, version={version})")
+    swap = byte_order != _BYTE_ORDERS[sys.byteorder]
+    view = memoryview(buffer)
+    position = _HEADER.size
+
+    def read_array(typecode: str, count: int) -> array:
+        nonlocal position
+        values = array(typecode)
+        size = count * values.itemsize
+        values.frombytes(view[position : position + size])
+        position += size
+        if swap:
+            values.byteswap()
+        return values
+
+    string_lengths = read_array("I", string_count)
+    blob = bytes(view[position : position + blob_size]).decode("utf-8", "surrogatepass")
+    position += blob_size
+    strings = []
+    start = 0
+    for length in string_lengths:
+        strings.append(blob[start : start + length])
+        start += length
+
+    node_ids = read_array("I", node_count)
+    node_attr_counts = read_array("I", node_count)
+    edge_sources = read_array("I", edge_count)
+    edge_targets = read_array("I", edge_count)
+    edge_attr_counts = read_array("I", edge_count)
+    attr_keys = read_array("I", attr_count)
+    attr_tags = read_array("B", attr_count)
+    int_values = iter(read_array("q", int_count))
+    float_values = iter(read_array("d", float_count))
+
+    attr_position = 0
+
+    def read_attrs(count: int) -> dict[str, Any]:
+        nonlocal attr_position
+        data = {}
+        for index in range(attr_position, attr_position + count):
+            tag = attr_tags[index]
+            if tag == _TAG_STR:
+                value = strings[next(int_values)]
+            elif tag == _TAG_INT:
+                value = next(int_values)
+            elif tag == _TAG_FLOAT:
+                value = next(float_values)
+            elif tag == _TAG_BOOL:
+                value = bool(next(int_values))
+            else:
+                value = None
+            data[strings[attr_keys[index]]] = value
+        attr_position += count
+        return data
+
+    graph = nx.DiGraph() if flags & _FLAG_DIRECTED else nx.Graph()
+    graph.add_nodes_from((strings[node_ids[i]], read_attrs(node_attr_counts[i])) for i in range(node_count))
+    graph.add_edges_from(
+        (strings[edge_sources[i]], strings[edge_targets[i]], read_attrs(edge_attr_counts[i]))
+        for i in range(edge_count)
+    )
+    return graph
+
+
+def read_graph(file_name: str) -> nx.Graph:
+    with open(file_name, "rb") as f:
+        return decode_graph(f.read())
+
+
+def write_graph(graph: nx.Graph, file_name: str) -> None:
+    """Atomically replace file_name with the binary encoding of graph"""
+    tmp_file = f"{file_name}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(encode_graph(graph))
+    os.replace(tmp_file, file_name)
@@ -5,13 +5,12 @@ from typing import Any, Union, final
 from lightrag.base import DocProcessingStatus, DocStatus, DocStatusStorage
 from lightrag.utils import load_json, logger, write_json
 
+from .shared_data_plane import get_kv_plane
 from .shared_storage import (
     clear_all_update_flags,
     get_data_init_lock,
-    get_namespace_data,
     get_storage_lock,
     get_update_flag,
-    set_all_update_flags,
     try_initialize_namespace,
 )
 
@@ -25,72 +24,87 @@ class JsonDocStatusStorage(DocStatusStorage):
         working_dir = self.global_config["working_dir"]
         self._file_name = os.path.join(working_dir, f"kv_store_{self.namespace}.json")
         self._data = None
+        self._plane = None
         self._storage_lock = None
         self.storage_updated = None
 
     async def initialize(self):
         """Initialize storage data"""
-        self._storage_lock = get_storage_lock()
+        self._storage_lock = get_storage_lock(namespace=self.namespace)
         self.storage_updated = await get_update_flag(self.namespace)
         async with get_data_init_lock():
-            # check need_init must before get_namespace_data
+            # check need_init must before get_kv_plane
             need_init = await try_initialize_namespace(self.namespace)
-            self._data = await get_namespace_data(self.namespace)
+            self._plane = await get_kv_plane(self.namespace)
+            self._data = self._plane.data
             if need_init:
                 loaded_data = load_json(self._file_name) or {}
                 async with self._storage_lock:
                     self._data.update(loaded_data)
+                    self._plane.reset()
+                    # Loaded data is already on disk
+                    await clear_all_update_flags(self.namespace)
                     logger.info(
                         f"Process {os.getpid()} doc status load {self.namespace} with {len(loaded_data)} records"
                     )
+            else:
+                async with self._storage_lock:
+                    self._plane.sync()
+
+    async def _refresh(self) -> None:
+        """Catch up with the writes of other workers, free when there are none"""
+        if not self._plane.is_current():
+            async with self._storage_lock:
+                self._plane.sync()
 
     async def filter_keys(self, keys: set[str]) -> set[str]:
         """Return keys that should be processed (not in storage or not successfully processed)"""
-        async with self._storage_lock:
-            return set(keys) - set(self._data.keys())
+        await self._refresh()
+        return set(keys) - self._data.keys()
 
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
+        await self._refresh()
         result: list[dict[str, Any]] = []
-        async with self._storage_lock:
-            for id in ids:
-                data = self._data.get(id, None)
-                if data:
-                    result.append(data)
+        for id in ids:
+            data = self._data.get(id, None)
+            if data:
+                result.append(data)
         return result
 
     async def get_status_counts(self) -> dict[str, int]:
         """Get counts of documents in each status"""
+        await self._refresh()
         counts = {status.value: 0 for status in DocStatus}
-        async with self._storage_lock:
-            for doc in self._data.values():
-                counts[doc["status"]] += 1
+        for doc in self._data.values():
+            counts[doc["status"]] += 1
         return counts
 
     async def get_docs_by_status(self, status: DocStatus) -> dict[str, DocProcessingStatus]:
         """Get all documents with a specific status"""
+        await self._refresh()
         result = {}
-        async with self._storage_lock:
-            for k, v in self._data.items():
-                if v["status"] == status.value:
-                    try:
-                        # Make a copy of the data to avoid modifying the original
-                        data = v.copy()
-                        # If content is missing, use content_summary as content
-                        if "content" not in data and "content_summary" in data:
-                            data["content"] = data["content_summary"]
-                        # If file_path is not in data, use document id as file path
-                        if "file_path" not in data:
-                            data["file_path"] = "no-file-path"
-                        result[k] = DocProcessingStatus(**data)
-                    except KeyError as e:
-                        logger.error(f"Missing required field for document {k}: {e}")
-                        continue
+        for k, v in self._data.items():
+            if v["status"] == status.value:
+                try:
+                    # Make a copy of the data to avoid modifying the original
+                    data = v.copy()
+                    # If content is missing, use content_summary as content
+                    if "content" not in data and "content_summary" in data:
+                        data["content"] = data["content_summary"]
+                    # If file_path is not in data, use document id as file path
+                    if "file_path" not in data:
+                        data["file_path"] = "no-file-path"
+                    result[k] = DocProcessingStatus(**data)
+                except KeyError as e:
+                    logger.error(f"Missing required field for document {k}: {e}")
+                    continue
         return result
 
     async def index_done_callback(self) -> None:
         async with self._storage_lock:
             if self.storage_updated.value:
-                data_dict = dict(self._data) if hasattr(self._data, "_getvalue") else self._data
+                self._plane.sync()
+                data_dict = self._data
                 logger.debug(f"Process {os.getpid()} doc status writting {len(data_dict)} records to {self.namespace}")
                 write_json(data_dict, self._file_name)
                 await clear_all_update_flags(self.namespace)
@@ -105,14 +119,15 @@ class JsonDocStatusStorage(DocStatusStorage):
             return
         logger.debug(f"Inserting {len(data)} records to {self.namespace}")
         async with self._storage_lock:
+            self._plane.sync()
             self._data.update(data)
-            await set_all_update_flags(self.namespace)
+            self._plane.commit(upserts=data)
 
         await self.index_done_callback()
 
     async def get_by_id(self, id: str) -> Union[dict[str, Any], None]:
-        async with self._storage_lock:
-            return self._data.get(id)
+        await self._refresh()
+        return self._data.get(id)
 
     async def delete(self, doc_ids: list[str]) -> None:
         """Delete specific records from storage by their IDs
@@ -128,14 +143,10 @@ class JsonDocStatusStorage(DocStatusStorage):
             None
         """
         async with self._storage_lock:
-            any_deleted = False
-            for doc_id in doc_ids:
-                result = self._data.pop(doc_id, None)
-                if result is not None:
-                    any_deleted = True
-
-            if any_deleted:
-                await set_all_update_flags(self.namespace)
+            self._plane.sync()
+            deleted = [doc_id for doc_id in doc_ids if self._data.pop(doc_id, None) is not None]
+            if deleted:
+                self._plane.commit(deletes=deleted)
 
     async def drop(self) -> dict[str, str]:
         """Drop all document status data from storage and clean up resources
@@ -153,7 +164,7 @@ class JsonDocStatusStorage(DocStatusStorage):
         try:
             async with self._storage_lock:
                 self._data.clear()
-                await set_all_update_flags(self.namespace)
+                self._plane.reset()
 
             await self.index_done_callback()
             logger.info(f"Process {os.getpid()} drop {self.namespace}")
@@ -1,20 +1,96 @@
+import asyncio
+import json
 import os
 from dataclasses import dataclass
 from typing import Any, final
 
 from lightrag.base import BaseKVStorage
-from lightrag.utils import load_json, logger, write_json
+from lightrag.utils import load_json, logger
 
+from .shared_data_plane import get_kv_plane
 from .shared_storage import (
     clear_all_update_flags,
     get_data_init_lock,
     get_namespace_data,
     get_storage_lock,
     get_update_flag,
-    set_all_update_flags,
     try_initialize_namespace,
 )
 
+# Append changed keys to a write-ahead log instead of rewriting the whole file on every flush
+APPEND_ONLY = os.getenv("JSON_KV_APPEND_ONLY", "false").lower() == "true"
+# The log is compacted into the snapshot once it is larger than both this size and the snapshot
+WAL_COMPACT_MIN_BYTES = int(os.getenv("JSON_KV_WAL_COMPACT_BYTES", 64 * 1024 * 1024))
+
+_WAL_UPSERT = "u"
+_WAL_DELETE = "d"
+# One entry of an LLM cache mode, logged instead of the whole mode
+_WAL_CACHE_ENTRY = "e"
+
+
+def _replay_wal(wal_file: str, data: dict[str, Any]) -> int:
+    """Apply the operations recorded in a write-ahead log to data, returns the number of operations
+
+    A torn last record left by a crash is cut off the log, so that the next append starts
+    on a line of its own instead of being glued to the partial record.
+    """
+    if not os.path.exists(wal_file):
+        return 0
+    with open(wal_file, "rb") as f:
+        content = f.read()
+    end = content.rfind(b"\n") + 1
+    if end < len(content):
+        logger.warning(f"Truncating torn WAL record at {wal_file}:{end}")
+        with open(wal_file, "r+b") as f:
+            f.truncate(end)
+
+    applied = 0
+    for line_no, line in enumerate(content[:end].splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"Skipping corrupted WAL record {wal_file}:{line_no}")
+            continue
+        if record["op"] == _WAL_UPSERT:
+            data[record["k"]] = record["v"]
+        elif record["op"] == _WAL_CACHE_ENTRY:
+            data.setdefault(record["k"], {})[record["h"]] = record["v"]
+        else:
+            data.pop(record["k"], None)
+        applied += 1
+    return applied
+
+
+def _append_wal(wal_file: str, lines: list[str]) -> int:
+    """Append serialized records to the write-ahead log, returns the log size afterwards"""
+    with open(wal_file, "a", encoding="utf-8") as f:
+        f.writelines(lines)
+        f.flush()
+        return f.tell()
+
+
+def _copy_records(data: dict[str, Any]) -> dict[str, Any]:
+    """Copy data and its dict records, so that it can be serialized in another thread
+
+    Records are replaced or updated in place, the values inside them are only ever
+    replaced, e.g. an LLM cache entry within its mode record.
+    """
+    return {key: dict(value) if isinstance(value, dict) else value for key, value in data.items()}
+
+
+def _write_snapshot(data: dict[str, Any], file_name: str, wal_file: str) -> None:
+    """Atomically replace the snapshot, then drop the write-ahead log it now contains"""
+    json_str = json.dumps(data, indent=2, ensure_ascii=False)
+    tmp_file = f"{file_name}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write(json_str)
+    os.replace(tmp_file, file_name)
+    # Replaying a stale log over the new snapshot is idempotent, so a crash here is harmless
+    if os.path.exists(wal_file):
+        os.remove(wal_file)
+
 
 @final
 @dataclass
@@ -22,22 +98,36 @@ class JsonKVStorage(BaseKVStorage):
     def __post_init__(self):
         working_dir = self.global_config["working_dir"]
         self._file_name = os.path.join(working_dir, f"kv_store_{self.namespace}.json")
+        self._wal_file = f"{self._file_name}.wal"
         self._data = None
+        self._plane = None
         self._storage_lock = None
         self.storage_updated = None
+        # key -> last operation since the previous flush, shared by all workers in append-only mode.
+        # Entries written by upsert_cache_entries() are tracked as (mode, args_hash) keys.
+        self._dirty_keys = None
 
     async def initialize(self):
         """Initialize storage data"""
-        self._storage_lock = get_storage_lock()
+        self._storage_lock = get_storage_lock(namespace=self.namespace)
         self.storage_updated = await get_update_flag(self.namespace)
         async with get_data_init_lock():
             # check need_init must before get_namespace_data
             need_init = await try_initialize_namespace(self.namespace)
-            self._data = await get_namespace_data(self.namespace)
+            self._plane = await get_kv_plane(self.namespace)
+            self._data = self._plane.data
+            if APPEND_ONLY:
+                self._dirty_keys = await get_namespace_data(f"{self.namespace}_wal_dirty_keys")
             if need_init:
                 loaded_data = load_json(self._file_name) or {}
+                replayed = _replay_wal(self._wal_file, loaded_data)
+                if replayed:
+                    logger.info(f"Process {os.getpid()} KV replayed {replayed} WAL records for {self.namespace}")
                 async with self._storage_lock:
                     self._data.update(loaded_data)
+                    self._plane.reset()
+                    # Loaded data is already on disk
+                    await clear_all_update_flags(self.namespace)
 
                     # Calculate data count based on namespace
                     if self.namespace.endswith("cache"):
@@ -52,11 +142,21 @@ class JsonKVStorage(BaseKVStorage):
                         data_count = len(loaded_data)
 
                     logger.info(f"Process {os.getpid()} KV load {self.namespace} with {data_count} records")
+            else:
+                async with self._storage_lock:
+                    self._plane.sync()
+
+    async def _refresh(self) -> None:
+        """Catch up with the writes of other workers, free when there are none"""
+        if not self._plane.is_current():
+            async with self._storage_lock:
+                self._plane.sync()
 
     async def index_done_callback(self) -> None:
         async with self._storage_lock:
             if self.storage_updated.value:
-                data_dict = dict(self._data) if hasattr(self._data, "_getvalue") else self._data
+                self._plane.sync()
+                data_dict = self._data
 
                 # Calculate data count based on namespace
                 if self.namespace.endswith("cache"):
@@ -70,30 +170,90 @@ class JsonKVStorage(BaseKVStorage):
                     # For non-cache namespaces, use the original count method
                     data_count = len(data_dict)
 
-                logger.debug(f"Process {os.getpid()} KV writting {data_count} records to {self.namespace}")
-                write_json(data_dict, self._file_name)
+                if APPEND_ONLY and os.path.exists(self._file_name):
+                    await self._flush_wal()
+                else:
+                    logger.debug(f"Process {os.getpid()} KV writting {data_count} records to {self.namespace}")
+                    # Serialized and written in a thread so queries keep running, from a copy taken
+                    # under the lock because callers may update the records they read in place
+                    await asyncio.to_thread(
+                        _write_snapshot, _copy_records(data_dict), self._file_name, self._wal_file
+                    )
+                    if APPEND_ONLY:
+                        # The full snapshot supersedes any pending log records
+                        self._dirty_keys.clear()
+                        if os.path.exists(self._wal_file):
+                            os.remove(self._wal_file)
                 await clear_all_update_flags(self.namespace)
 
+    async def _flush_wal(self) -> None:
+        """Append the keys changed since the last flush to the write-ahead log
+
+        Must be called with the storage lock held. Compacts the log into the snapshot
+        once the log outgrows both WAL_COMPACT_MIN_BYTES and the snapshot itself.
+        """
+        dirty = dict(self._dirty_keys)
+        if not dirty:
+            return
+
+        lines = []
+        for key, op in dirty.items():
+            if op == _WAL_CACHE_ENTRY:
+                mode, args_hash = key
+                value = self._data.get(mode, {}).get(args_hash)
+                if value is None:
+                    # Dropped along with its mode, the delete of the mode is logged on its own
+                    continue
+                record = {"op": _WAL_CACHE_ENTRY, "k": mode, "h": args_hash, "v": value}
+            else:
+                value = self._data.get(key) if op == _WAL_UPSERT else None
+                if value is None:
+                    record = {"op": _WAL_DELETE, "k": key}
+                else:
+                    record = {"op": _WAL_UPSERT, "k": key, "v": value}
+            lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+
+        # File I/O runs in a thread so the event loop keeps serving other storages meanwhile
+        wal_size = await asyncio.to_thread(_append_wal, self._wal_file, lines)
+        # Only cleared once logged, keys of a failed append are written by the next flush
+        self._dirty_keys.clear()
+        logger.debug(f"Process {os.getpid()} KV appended {len(lines)} WAL records to {self.namespace}")
+
+        snapshot_size = os.path.getsize(self._file_name)
+        if wal_size > max(WAL_COMPACT_MIN_BYTES, snapshot_size):
+            await asyncio.to_thread(_write_snapshot, _copy_records(self._data), self._file_name, self._wal_file)
+            logger.info(f"Process {os.getpid()} KV compacted WAL of {self.namespace} ({wal_size} bytes)")
+
+    def _mark_dirty(self, keys, op: str) -> None:
+        if self._dirty_keys is None:
+            return
+        if op != _WAL_CACHE_ENTRY and self.namespace.endswith("cache"):
+            # A record of the whole mode supersedes the entries of that mode logged before it
+            modes = set(keys)
+            for key in [key for key in self._dirty_keys.keys() if isinstance(key, tuple) and key[0] in modes]:
+                self._dirty_keys.pop(key, None)
+        self._dirty_keys.update({key: op for key in keys})
+
     async def get_all(self) -> dict[str, Any]:
         """Get all data from storage
 
         Returns:
             Dictionary containing all stored data
         """
-        async with self._storage_lock:
-            return dict(self._data)
+        await self._refresh()
+        return dict(self._data)
 
     async def get_by_id(self, id: str) -> dict[str, Any] | None:
-        async with self._storage_lock:
-            return self._data.get(id)
+        await self._refresh()
+        return self._data.get(id)
 
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
-        async with self._storage_lock:
-            return [({k: v for k, v in self._data[id].items()} if self._data.get(id, None) else None) for id in ids]
+        await self._refresh()
+        return [({k: v for k, v in self._data[id].items()} if self._data.get(id, None) else None) for id in ids]
 
     async def filter_keys(self, keys: set[str]) -> set[str]:
-        async with self._storage_lock:
-            return set(keys) - set(self._data.keys())
+        await self._refresh()
+        return set(keys) - self._data.keys()
 
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
         """
@@ -105,8 +265,28 @@ class JsonKVStorage(BaseKVStorage):
             return
         logger.debug(f"Inserting {len(data)} records to {self.namespace}")
         async with self._storage_lock:
+            self._plane.sync()
             self._data.update(data)
-            await set_all_update_flags(self.namespace)
+            self._plane.commit(upserts=data)
+            self._mark_dirty(data.keys(), _WAL_UPSERT)
+
+    async def upsert_cache_entries(self, mode: str, entries: dict[str, dict[str, Any]]) -> None:
+        """Add or replace entries of one LLM cache mode
+
+        The cache is stored as one record per mode holding all its entries. upsert() of the
+        mode would log and replicate the whole mode on every cached response, here only the
+        given entries are.
+        """
+        if not entries:
+            return
+        async with self._storage_lock:
+            self._plane.sync()
+            mode_cache = self._data.get(mode)
+            if mode_cache is None:
+                mode_cache = self._data[mode] = {}
+            mode_cache.update(entries)
+            self._plane.commit(entries={mode: entries})
+            self._mark_dirty([(mode, args_hash) for args_hash in entries], _WAL_CACHE_ENTRY)
 
     async def delete(self, ids: list[str]) -> None:
         """Delete specific records from storage by their IDs
@@ -122,14 +302,11 @@ class JsonKVStorage(BaseKVStorage):
             None
         """
         async with self._storage_lock:
-            any_deleted = False
-            for doc_id in ids:
-                result = self._data.pop(doc_id, None)
-                if result is not None:
-                    any_deleted = True
-
-            if any_deleted:
-                await set_all_update_flags(self.namespace)
+            self._plane.sync()
+            deleted = [doc_id for doc_id in ids if self._data.pop(doc_id, None) is not None]
+            if deleted:
+                self._plane.commit(deletes=deleted)
+                self._mark_dirty(deleted, _WAL_DELETE)
 
     async def drop_cache_by_modes(self, modes: list[str] | None = None) -> bool:
         """Delete specific records from storage by by cache mode
@@ -171,7 +348,11 @@ class JsonKVStorage(BaseKVStorage):
         try:
             async with self._storage_lock:
                 self._data.clear()
-                await set_all_update_flags(self.namespace)
+                self._plane.reset()
+                if APPEND_ONLY:
+                    # Write an empty snapshot rather than logging a delete for every key
+                    self._dirty_keys.clear()
+                    await asyncio.to_thread(_write_snapshot, {}, self._file_name, self._wal_file)
 
             await self.index_done_callback()
             logger.info(f"Process {os.getpid()} drop {self.namespace}")
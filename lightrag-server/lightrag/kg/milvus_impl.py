@@ -1,7 +1,9 @@
 import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, final
+from functools import partial
+from typing import Any, Callable, TypeVar, final
 
 import numpy as np
 import pipmaster as pm
@@ -22,6 +24,24 @@ from pymilvus import MilvusClient  # type: ignore
 config = configparser.ConfigParser()
 config.read("config.ini", "utf-8")
 
+# Rows sent per upsert request
+UPSERT_BATCH_SIZE = int(os.getenv("MILVUS_UPSERT_BATCH_SIZE", 256))
+
+T = TypeVar("T")
+
+# MilvusClient is synchronous, its calls run in a pool of their own so that they neither
+# block the event loop nor compete with the default executor used for file I/O
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("MILVUS_EXECUTOR_WORKERS", 8)), thread_name_prefix="milvus"
+        )
+    return _executor
+
 
 @final
 @dataclass
@@ -32,6 +52,10 @@ class MilvusVectorDBStorage(BaseVectorStorage):
             return
         client.create_collection(collection_name, max_length=64, id_type="string", **kwargs)
 
+    async def _run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Run a blocking client call in the Milvus executor"""
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
     def __post_init__(self):
         kwargs = self.global_config.get("vector_db_storage_cls_kwargs", {})
         cosine_threshold = kwargs.get("cosine_better_than_threshold")
@@ -54,7 +78,10 @@ class MilvusVectorDBStorage(BaseVectorStorage):
             db_name=os.environ.get("MILVUS_DB_NAME", config.get("milvus", "db_name", fallback=None)),
         )
         self._max_batch_size = self.global_config["embedding_batch_num"]
-        MilvusVectorDBStorage.create_collection_if_not_exist(
+
+    async def initialize(self):
+        await self._run(
+            MilvusVectorDBStorage.create_collection_if_not_exist,
             self._client,
             self.namespace,
             dimension=self.embedding_func.embedding_dim,
@@ -86,12 +113,21 @@ class MilvusVectorDBStorage(BaseVectorStorage):
         embeddings = np.concatenate(embeddings_list)
         for i, d in enumerate(list_data):
             d["vector"] = embeddings[i]
-        results = self._client.upsert(collection_name=self.namespace, data=list_data)
-        return results
+        await asyncio.gather(
+            *[
+                self._run(
+                    self._client.upsert,
+                    collection_name=self.namespace,
+                    data=list_data[i : i + UPSERT_BATCH_SIZE],
+                )
+                for i in range(0, len(list_data), UPSERT_BATCH_SIZE)
+            ]
+        )
 
     async def query(self, query: str, top_k: int, ids: list[str] | None = None) -> list[dict[str, Any]]:
         embedding = await self.embedding_func([query], _priority=5)  # higher priority for query
-        results = self._client.search(
+        results = await self._run(
+            self._client.search,
             collection_name=self.namespace,
             data=embedding,
             limit=top_k,
@@ -101,7 +137,7 @@ class MilvusVectorDBStorage(BaseVectorStorage):
                 "params": {"radius": self.cosine_better_than_threshold},
             },
         )
-        print(results)
+        logger.debug(f"query result: {results}")
         return [
             {
                 **dp["entity"],
@@ -129,7 +165,7 @@ class MilvusVectorDBStorage(BaseVectorStorage):
             logger.debug(f"Attempting to delete entity {entity_name} with ID {entity_id}")
 
             # Delete the entity from Milvus collection
-            result = self._client.delete(collection_name=self.namespace, pks=[entity_id])
+            result = await self._run(self._client.delete, collection_name=self.namespace, pks=[entity_id])
 
             if result and result.get("delete_count", 0) > 0:
                 logger.debug(f"Successfully deleted entity {entity_name}")
@@ -150,7 +186,9 @@ class MilvusVectorDBStorage(BaseVectorStorage):
             expr = f'src_id == "{entity_name}" or tgt_id == "{entity_name}"'
 
             # Find all relations involving this entity
-            results = self._client.query(collection_name=self.namespace, filter=expr, output_fields=["id"])
+            results = await self._run(
+                self._client.query, collection_name=self.namespace, filter=expr, output_fields=["id"]
+            )
 
             if not results or len(results) == 0:
                 logger.debug(f"No relations found for entity {entity_name}")
@@ -162,7 +200,7 @@ class MilvusVectorDBStorage(BaseVectorStorage):
 
             # Delete the relations
             if relation_ids:
-                delete_result = self._client.delete(collection_name=self.namespace, pks=relation_ids)
+                delete_result = await self._run(self._client.delete, collection_name=self.namespace, pks=relation_ids)
 
                 logger.debug(f"Deleted {delete_result.get('delete_count', 0)} relations for {entity_name}")
 
@@ -177,7 +215,7 @@ class MilvusVectorDBStorage(BaseVectorStorage):
         """
         try:
             # Delete vectors by IDs
-            result = self._client.delete(collection_name=self.namespace, pks=ids)
+            result = await self._run(self._client.delete, collection_name=self.namespace, pks=ids)
 
             if result and result.get("delete_count", 0) > 0:
                 logger.debug(f"Successfully deleted {result.get('delete_count', 0)} vectors from {self.namespace}")
@@ -198,7 +236,8 @@ class MilvusVectorDBStorage(BaseVectorStorage):
         """
         try:
             # Query Milvus for a specific ID
-            result = self._client.query(
+            result = await self._run(
+                self._client.query,
                 collection_name=self.namespace,
                 filter=f'id == "{id}"',
                 output_fields=list(self.meta_fields) + ["id", "created_at"],
@@ -234,7 +273,8 @@ class MilvusVectorDBStorage(BaseVectorStorage):
             filter_expr = f'id in ["{id_list}"]'
 
             # Query Milvus with the filter
-            result = self._client.query(
+            result = await self._run(
+                self._client.query,
                 collection_name=self.namespace,
                 filter=filter_expr,
                 output_fields=list(self.meta_fields) + ["id", "created_at"],
@@ -262,11 +302,12 @@ class MilvusVectorDBStorage(BaseVectorStorage):
         """
         try:
             # Drop the collection and recreate it
-            if self._client.has_collection(self.namespace):
-                self._client.drop_collection(self.namespace)
+            if await self._run(self._client.has_collection, self.namespace):
+                await self._run(self._client.drop_collection, self.namespace)
 
             # Recreate the collection
-            MilvusVectorDBStorage.create_collection_if_not_exist(
+            await self._run(
+                MilvusVectorDBStorage.create_collection_if_not_exist,
                 self._client,
                 self.namespace,
                 dimension=self.embedding_func.embedding_dim,
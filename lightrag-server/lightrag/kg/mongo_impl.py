@@ -20,7 +20,7 @@ if not pm.is_installed("motor"):
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase  # type: ignore
 from pymongo.errors import PyMongoError  # type: ignore
-from pymongo.operations import SearchIndexModel  # type: ignore
+from pymongo.operations import SearchIndexModel, UpdateOne  # type: ignore
 
 config = configparser.ConfigParser()
 config.read("config.ini", "utf-8")
@@ -91,6 +91,17 @@ class MongoKVStorage(BaseKVStorage):
         cursor = self._data.find({"_id": {"$in": ids}})
         return await cursor.to_list()
 
+    async def get_fields_by_ids(self, ids: list[str], fields: list[str] | None = None) -> dict[str, dict[str, Any]]:
+        if not ids:
+            return {}
+        projection = {field: 1 for field in fields} if fields is not None else None
+        cursor = self._data.find({"_id": {"$in": ids}}, projection)
+        results = {}
+        async for doc in cursor:
+            id = doc.pop("_id")
+            results[str(id)] = doc
+        return results
+
     async def filter_keys(self, keys: set[str]) -> set[str]:
         cursor = self._data.find({"_id": {"$in": list(keys)}}, {"_id": 1})
         existing_ids = {str(x["_id"]) async for x in cursor}
@@ -607,6 +618,38 @@ class MongoGraphStorage(BaseGraphStorage):
         new_edge.update(edge_data)
         await self.collection.update_one({"_id": source_node_id}, {"$push": {"edges": new_edge}})
 
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """
+        Insert or update many node documents with a single bulk write.
+        """
+        if not nodes:
+            return
+        operations = [
+            UpdateOne({"_id": node_id}, {"$set": {**node_data}, "$setOnInsert": {"edges": []}}, upsert=True)
+            for node_id, node_data in nodes.items()
+        ]
+        await self.collection.bulk_write(operations, ordered=False)
+
+    async def upsert_edges_batch(self, edges: dict[tuple[str, str], dict[str, str]]) -> None:
+        """
+        Upsert many edges with a single ordered bulk write.
+        Each edge expands to the same ensure-source / pull / push sequence as upsert_edge.
+        """
+        if not edges:
+            return
+        operations = []
+        for (source_node_id, target_node_id), edge_data in edges.items():
+            new_edge = {"target": target_node_id}
+            new_edge.update(edge_data)
+            operations.extend(
+                [
+                    UpdateOne({"_id": source_node_id}, {"$setOnInsert": {"edges": []}}, upsert=True),
+                    UpdateOne({"_id": source_node_id}, {"$pull": {"edges": {"target": target_node_id}}}),
+                    UpdateOne({"_id": source_node_id}, {"$push": {"edges": new_edge}}),
+                ]
+            )
+        await self.collection.bulk_write(operations, ordered=True)
+
     #
     # -------------------------------------------------------------------------
     # DELETION
@@ -1,20 +1,305 @@
 import asyncio
+import base64
+import json
 import os
 import time
 from dataclasses import dataclass
 from typing import Any, final
 
 import numpy as np
-import pipmaster as pm
 from lightrag.base import BaseVectorStorage
-from lightrag.utils import compute_mdhash_id, logger
+from lightrag.utils import compute_mdhash_id, get_env_value, logger
 
-if not pm.is_installed("nano-vectordb"):
-    pm.install("nano-vectordb")
+from .shared_storage import get_storage_lock, get_update_flag, set_all_update_flags
 
-from nano_vectordb import NanoVectorDB
+# Number of delta segments kept before they are merged into a new base file
+MAX_SEGMENTS = get_env_value("NANO_VDB_MAX_SEGMENTS", 16, int)
+
+
+def _write_json_atomic(file_name: str, data: Any) -> None:
+    tmp_file = f"{file_name}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_file, file_name)
+
+
+def _remove_quietly(file_name: str) -> None:
+    try:
+        os.remove(file_name)
+    except OSError:
+        # Missing, or still mapped by a process on platforms that forbid removing mapped files
+        pass
+
+
+class SegmentedVectorDB:
+    """
+    Cosine-similarity vector store persisted as a memory-mapped base matrix plus append-only delta segments.
+
+    On disk, for a storage prefix ``vdb_<namespace>``:
+
+    - ``.manifest.json``: embedding dim, current generation and the list of segment numbers, replaced atomically
+    - ``.g<gen>.npy`` / ``.g<gen>.meta.json``: normalized float32 base matrix and the metadata of each row
+    - ``.g<gen>.s<seq>.npy`` / ``.g<gen>.s<seq>.json``: vectors and metadata upserted by one save, plus deleted ids
+
+    The base matrix is opened with ``mmap_mode="r"``, so every worker shares its pages through the OS page cache.
+    Rows added after the base was written live in a private in-memory tail. A reload after another worker saved
+    only applies the segments written since, unless the other worker compacted to a new generation.
+    """
+
+    def __init__(self, embedding_dim: int, storage_prefix: str):
+        self.embedding_dim = embedding_dim
+        self.storage_prefix = storage_prefix
+        self._manifest_file = f"{storage_prefix}.manifest.json"
+        self._legacy_file = f"{storage_prefix}.json"
+        self._reset()
+        self.load()
+
+    def _reset(self) -> None:
+        self._generation = 0
+        self._segments: list[int] = []
+        self._base = np.empty((0, self.embedding_dim), dtype=np.float32)
+        self._tail = np.empty((16, self.embedding_dim), dtype=np.float32)
+        self._tail_len = 0
+        self._alive = np.zeros(16, dtype=bool)
+        # Metadata of every row (base rows first, then tail rows), None once deleted or replaced
+        self._rows: list[dict[str, Any] | None] = []
+        self._id_to_row: dict[str, int] = {}
+        self._dead_rows = 0
+        # Changes not yet written to a segment
+        self._pending_rows: list[int] = []
+        self._pending_deletes: set[str] = set()
+
+    def _file(self, suffix: str, generation: int | None = None) -> str:
+        generation = self._generation if generation is None else generation
+        return f"{self.storage_prefix}.g{generation}{suffix}"
+
+    def _read_manifest(self) -> dict[str, Any] | None:
+        if not os.path.exists(self._manifest_file):
+            return None
+        with open(self._manifest_file, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self) -> None:
+        _write_json_atomic(
+            self._manifest_file,
+            {"embedding_dim": self.embedding_dim, "generation": self._generation, "segments": self._segments},
+        )
 
-from .shared_storage import get_storage_lock, get_update_flag, set_all_update_flags
+    # ------------------------------------------------------------------
+    # In-memory row management
+    # ------------------------------------------------------------------
+
+    def _append_row(self, meta: dict[str, Any], vector: np.ndarray) -> int:
+        if meta["__id__"] in self._id_to_row:
+            self._kill_row(self._id_to_row[meta["__id__"]])
+        if self._tail_len == len(self._tail):
+            self._tail = np.concatenate([self._tail, np.empty_like(self._tail)])
+        self._tail[self._tail_len] = vector
+        self._tail_len += 1
+        row = len(self._rows)
+        if row == len(self._alive):
+            self._alive = np.concatenate([self._alive, np.zeros_like(self._alive)])
+        self._alive[row] = True
+        self._rows.append(meta)
+        self._id_to_row[meta["__id__"]] = row
+        return row
+
+    def _kill_row(self, row: int) -> None:
+        meta = self._rows[row]
+        if meta is None:
+            return
+        self._rows[row] = None
+        self._alive[row] = False
+        self._dead_rows += 1
+        if self._id_to_row.get(meta["__id__"]) == row:
+            del self._id_to_row[meta["__id__"]]
+
+    def _vector(self, row: int) -> np.ndarray:
+        base_len = len(self._base)
+        return self._base[row] if row < base_len else self._tail[row - base_len]
+
+    def _apply_segment(self, seq: int) -> None:
+        with open(self._file(f".s{seq}.json"), encoding="utf-8") as f:
+            segment = json.load(f)
+        for id in segment["deleted"]:
+            if id in self._id_to_row:
+                self._kill_row(self._id_to_row[id])
+        if segment["data"]:
+            vectors = np.load(self._file(f".s{seq}.npy"))
+            for meta, vector in zip(segment["data"], vectors):
+                self._append_row(meta, vector)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def load(self) -> None:
+        """Load the whole store from disk, discarding unsaved changes"""
+        self._reset()
+        manifest = self._read_manifest()
+        if manifest is None:
+            if os.path.exists(self._legacy_file):
+                self._load_legacy()
+            return
+        if manifest["embedding_dim"] != self.embedding_dim:
+            raise ValueError(
+                f"Embedding dim mismatch, expected: {self.embedding_dim}, but loaded: {manifest['embedding_dim']}"
+            )
+
+        self._generation = manifest["generation"]
+        if os.path.exists(self._file(".npy")):
+            self._base = np.load(self._file(".npy"), mmap_mode="r")
+            with open(self._file(".meta.json"), encoding="utf-8") as f:
+                base_rows = json.load(f)
+            self._rows = list(base_rows)
+            self._alive = np.ones(max(16, len(base_rows)), dtype=bool)
+            self._id_to_row = {meta["__id__"]: row for row, meta in enumerate(base_rows)}
+        for seq in manifest["segments"]:
+            self._apply_segment(seq)
+        self._segments = list(manifest["segments"])
+
+    def reload(self) -> None:
+        """Catch up with changes saved by another process, discarding unsaved changes"""
+        manifest = self._read_manifest()
+        if (
+            manifest is None
+            or manifest["generation"] != self._generation
+            or manifest["segments"][: len(self._segments)] != self._segments
+            or self._pending_rows
+            or self._pending_deletes
+        ):
+            self.load()
+            return
+        for seq in manifest["segments"][len(self._segments) :]:
+            self._apply_segment(seq)
+            self._segments.append(seq)
+
+    def _load_legacy(self) -> None:
+        """Import a vdb_<namespace>.json file written by nano-vectordb, it is replaced on the next save"""
+        with open(self._legacy_file, encoding="utf-8") as f:
+            storage = json.load(f)
+        matrix = np.frombuffer(base64.b64decode(storage["matrix"]), dtype=np.float32).reshape(
+            -1, storage["embedding_dim"]
+        )
+        if storage["embedding_dim"] != self.embedding_dim:
+            raise ValueError(
+                f"Embedding dim mismatch, expected: {self.embedding_dim}, but loaded: {storage['embedding_dim']}"
+            )
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        for meta, vector in zip(storage["data"], matrix):
+            self._pending_rows.append(self._append_row(meta, vector))
+        logger.info(f"Imported {len(storage['data'])} vectors from {self._legacy_file}")
+
+    def save(self) -> None:
+        """Persist unsaved changes as a new segment, compacting when too many segments accumulated"""
+        manifest = self._read_manifest()
+        if manifest is not None:
+            self._generation = manifest["generation"]
+            self._segments = list(manifest["segments"])
+
+        rows = [row for row in self._pending_rows if self._rows[row] is not None]
+        if rows or self._pending_deletes:
+            seq = self._segments[-1] + 1 if self._segments else 0
+            if rows:
+                np.save(self._file(f".s{seq}.npy"), np.stack([self._vector(row) for row in rows]))
+            _write_json_atomic(
+                self._file(f".s{seq}.json"),
+                {"deleted": sorted(self._pending_deletes), "data": [self._rows[row] for row in rows]},
+            )
+            self._segments.append(seq)
+        self._pending_rows = []
+        self._pending_deletes = set()
+
+        if len(self._segments) > MAX_SEGMENTS or self._dead_rows > max(1024, len(self._id_to_row)):
+            self.compact()
+        else:
+            self._write_manifest()
+        if os.path.exists(self._legacy_file):
+            _remove_quietly(self._legacy_file)
+
+    def compact(self) -> None:
+        """Write all live rows into a new base generation and drop the segments"""
+        old_generation, old_segments = self._generation, self._segments
+        live_rows = [row for row, meta in enumerate(self._rows) if meta is not None]
+        self._generation = old_generation + 1
+        self._segments = []
+        if live_rows:
+            matrix = np.stack([self._vector(row) for row in live_rows])
+        else:
+            matrix = np.empty((0, self.embedding_dim), dtype=np.float32)
+        np.save(self._file(".npy"), matrix)
+        _write_json_atomic(self._file(".meta.json"), [self._rows[row] for row in live_rows])
+        self._write_manifest()
+
+        for seq in old_segments:
+            _remove_quietly(self._file(f".s{seq}.npy", old_generation))
+            _remove_quietly(self._file(f".s{seq}.json", old_generation))
+        _remove_quietly(self._file(".npy", old_generation))
+        _remove_quietly(self._file(".meta.json", old_generation))
+        # Re-open from disk so the rows are served from the shared memory map
+        self.load()
+
+    def drop(self) -> None:
+        """Remove all data and files of the store"""
+        manifest = self._read_manifest()
+        if manifest is not None:
+            generation = manifest["generation"]
+            for seq in manifest["segments"]:
+                _remove_quietly(self._file(f".s{seq}.npy", generation))
+                _remove_quietly(self._file(f".s{seq}.json", generation))
+            _remove_quietly(self._file(".npy", generation))
+            _remove_quietly(self._file(".meta.json", generation))
+            _remove_quietly(self._manifest_file)
+        _remove_quietly(self._legacy_file)
+        self._reset()
+
+    # ------------------------------------------------------------------
+    # Data access
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    def upsert(self, datas: list[dict[str, Any]]) -> None:
+        for data in datas:
+            vector = np.asarray(data.pop("__vector__"), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            self._pending_rows.append(self._append_row(data, vector / norm if norm else vector))
+
+    def delete(self, ids: list[str]) -> None:
+        for id in ids:
+            if id in self._id_to_row:
+                self._kill_row(self._id_to_row[id])
+                self._pending_deletes.add(id)
+
+    def get(self, ids: list[str]) -> list[dict[str, Any]]:
+        return [self._rows[self._id_to_row[id]] for id in ids if id in self._id_to_row]
+
+    def all_data(self) -> list[dict[str, Any]]:
+        return [meta for meta in self._rows if meta is not None]
+
+    def matrix(self) -> np.ndarray:
+        if not len(self):
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+        return np.stack([self._vector(row) for row, meta in enumerate(self._rows) if meta is not None])
+
+    def query(self, query: np.ndarray, top_k: int, better_than_threshold: float | None = None) -> list[dict]:
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        scores = np.concatenate([self._base @ query, self._tail[: self._tail_len] @ query])
+        scores[~self._alive[: len(scores)]] = -np.inf
+        top_k = min(top_k, len(self))
+        if top_k <= 0:
+            return []
+        top_rows = np.argpartition(scores, -top_k)[-top_k:]
+        top_rows = top_rows[np.argsort(scores[top_rows])[::-1]]
+        results = []
+        for row in top_rows:
+            if better_than_threshold is not None and scores[row] < better_than_threshold:
+                break
+            results.append({**self._rows[row], "__metrics__": float(scores[row])})
+        return results
 
 
 @final
@@ -33,20 +318,17 @@ class NanoVectorDBStorage(BaseVectorStorage):
             raise ValueError("cosine_better_than_threshold must be specified in vector_db_storage_cls_kwargs")
         self.cosine_better_than_threshold = cosine_threshold
 
-        self._client_file_name = os.path.join(self.global_config["working_dir"], f"vdb_{self.namespace}.json")
+        self._storage_prefix = os.path.join(self.global_config["working_dir"], f"vdb_{self.namespace}")
         self._max_batch_size = self.global_config["embedding_batch_num"]
 
-        self._client = NanoVectorDB(
-            self.embedding_func.embedding_dim,
-            storage_file=self._client_file_name,
-        )
+        self._client = SegmentedVectorDB(self.embedding_func.embedding_dim, self._storage_prefix)
 
     async def initialize(self):
         """Initialize storage data"""
         # Get the update flag for cross-process update notification
         self.storage_updated = await get_update_flag(self.namespace)
         # Get the storage lock for use in other methods
-        self._storage_lock = get_storage_lock(enable_logging=False)
+        self._storage_lock = get_storage_lock(enable_logging=False, namespace=self.namespace)
 
     async def _get_client(self):
         """Check if the storage should be reloaded"""
@@ -55,11 +337,8 @@ class NanoVectorDBStorage(BaseVectorStorage):
             # Check if data needs to be reloaded
             if self.storage_updated.value:
                 logger.info(f"Process {os.getpid()} reloading {self.namespace} due to update by another process")
-                # Reload data
-                self._client = NanoVectorDB(
-                    self.embedding_func.embedding_dim,
-                    storage_file=self._client_file_name,
-                )
+                # Only segments saved since our last load are read
+                self._client.reload()
                 # Reset update flag
                 self.storage_updated.value = False
 
@@ -98,8 +377,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
             for i, d in enumerate(list_data):
                 d["__vector__"] = embeddings[i]
             client = await self._get_client()
-            results = client.upsert(datas=list_data)
-            return results
+            client.upsert(list_data)
         else:
             # sometimes the embedding is not returned correctly. just log it.
             logger.error(f"embedding is not 1-1 with data, {len(embeddings)} != {len(list_data)}")
@@ -115,7 +393,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
             top_k=top_k,
             better_than_threshold=self.cosine_better_than_threshold,
         )
-        results = [
+        return [
             {
                 **dp,
                 "id": dp["__id__"],
@@ -124,12 +402,11 @@ class NanoVectorDBStorage(BaseVectorStorage):
             }
             for dp in results
         ]
-        return results
 
     @property
     async def client_storage(self):
         client = await self._get_client()
-        return getattr(client, "_NanoVectorDB__storage")
+        return {"embedding_dim": client.embedding_dim, "data": client.all_data(), "matrix": client.matrix()}
 
     async def delete(self, ids: list[str]):
         """Delete vectors with specified IDs
@@ -181,8 +458,9 @@ class NanoVectorDBStorage(BaseVectorStorage):
 
         try:
             client = await self._get_client()
-            storage = getattr(client, "_NanoVectorDB__storage")
-            relations = [dp for dp in storage["data"] if dp["src_id"] == entity_name or dp["tgt_id"] == entity_name]
+            relations = [
+                dp for dp in client.all_data() if dp["src_id"] == entity_name or dp["tgt_id"] == entity_name
+            ]
             logger.debug(f"Found {len(relations)} relations for entity {entity_name}")
             ids_to_delete = [relation["__id__"] for relation in relations]
 
@@ -202,10 +480,7 @@ class NanoVectorDBStorage(BaseVectorStorage):
             if self.storage_updated.value:
                 # Storage was updated by another process, reload data instead of saving
                 logger.warning(f"Storage for {self.namespace} was updated by another process, reloading...")
-                self._client = NanoVectorDB(
-                    self.embedding_func.embedding_dim,
-                    storage_file=self._client_file_name,
-                )
+                self._client.reload()
                 # Reset update flag
                 self.storage_updated.value = False
                 return False  # Return error
@@ -287,21 +562,15 @@ class NanoVectorDBStorage(BaseVectorStorage):
         """
         try:
             async with self._storage_lock:
-                # delete _client_file_name
-                if os.path.exists(self._client_file_name):
-                    os.remove(self._client_file_name)
-
-                self._client = NanoVectorDB(
-                    self.embedding_func.embedding_dim,
-                    storage_file=self._client_file_name,
-                )
+                # Remove the manifest, base and segment files
+                self._client.drop()
 
                 # Notify other processes that data has been updated
                 await set_all_update_flags(self.namespace)
                 # Reset own update flag to avoid self-reloading
                 self.storage_updated.value = False
 
-                logger.info(f"Process {os.getpid()} drop {self.namespace}(file:{self._client_file_name})")
+                logger.info(f"Process {os.getpid()} drop {self.namespace}(files:{self._storage_prefix}.*)")
             return {"status": "success", "message": "data dropped"}
         except Exception as e:
             logger.error(f"Error dropping {self.namespace}: {e}")
@@ -1,10 +1,13 @@
+import heapq
 import os
+import pickle
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import final
+from typing import Any, AsyncIterator, Iterator, final
 
 import pipmaster as pm
 from lightrag.base import BaseGraphStorage
-from lightrag.types import KnowledgeGraph, KnowledgeGraphEdge, KnowledgeGraphNode
+from lightrag.types import KnowledgeGraph, KnowledgeGraphEdge, KnowledgeGraphMeta, KnowledgeGraphNode
 from lightrag.utils import logger
 
 if not pm.is_installed("networkx"):
@@ -16,7 +19,16 @@ if not pm.is_installed("graspologic"):
 import networkx as nx
 from dotenv import load_dotenv
 
-from .shared_storage import get_storage_lock, get_update_flag, set_all_update_flags
+from .graph_binary import decode_graph, encode_graph, read_graph, write_graph
+from .shared_data_plane import SharedChangeLog, get_plane
+from .shared_storage import (
+    NamespaceGeneration,
+    clear_all_update_flags,
+    get_data_init_lock,
+    get_storage_lock,
+    get_update_flag,
+    try_initialize_namespace,
+)
 
 # use the .env that is inside the current folder
 # allows to use different .env file for each lightrag instance
@@ -24,6 +36,46 @@ from .shared_storage import get_storage_lock, get_update_flag, set_all_update_fl
 load_dotenv(dotenv_path=".env", override=False)
 
 MAX_GRAPH_NODES = int(os.getenv("MAX_GRAPH_NODES", 1000))
+# Top-degree node lists of get_knowledge_graph("*") cached per graph generation
+_TOP_DEGREE_CACHE_SIZE = 8
+# Also write graph_<namespace>.graphml on every save, for tools that read GraphML
+EXPORT_GRAPHML = os.getenv("NETWORKX_EXPORT_GRAPHML", "false").lower() == "true"
+
+
+def _apply_graph_op(graph: nx.Graph, op: str, args: Any) -> None:
+    if op == "add_nodes":
+        graph.add_nodes_from(args)
+    elif op == "add_edges":
+        graph.add_edges_from(args)
+    elif op == "remove_nodes":
+        graph.remove_nodes_from(args)
+    elif op == "remove_edges":
+        graph.remove_edges_from(args)
+    else:
+        raise ValueError(f"Unknown graph operation {op}")
+
+
+class SharedGraphPlane(SharedChangeLog):
+    """Replica of a graph namespace, log frames are graph operations applied in order"""
+
+    def __init__(self, namespace: str, generation: NamespaceGeneration, log_file: str | None, graph: nx.Graph):
+        super().__init__(namespace, generation, log_file)
+        self.graph = graph
+
+    def _apply_payload(self, payload: bytes, snapshot: bool) -> None:
+        if snapshot:
+            self.graph = decode_graph(payload)
+        else:
+            op, args = pickle.loads(payload)
+            _apply_graph_op(self.graph, op, args)
+
+    def _snapshot_payload(self) -> bytes:
+        return encode_graph(self.graph)
+
+    def apply(self, op: str, args: list) -> None:
+        """Apply an operation to the replica and publish it to the other workers, after sync()"""
+        _apply_graph_op(self.graph, op, args)
+        self._publish(lambda: pickle.dumps((op, args), protocol=pickle.HIGHEST_PROTOCOL))
 
 
 @final
@@ -31,51 +83,76 @@ MAX_GRAPH_NODES = int(os.getenv("MAX_GRAPH_NODES", 1000))
 class NetworkXStorage(BaseGraphStorage):
     @staticmethod
     def load_nx_graph(file_name) -> nx.Graph:
+        """Load a graph saved in the binary format, or in GraphML for a .graphml file"""
         if os.path.exists(file_name):
-            return nx.read_graphml(file_name)
+            if file_name.endswith(".graphml"):
+                return nx.read_graphml(file_name)
+            return read_graph(file_name)
         return None
 
     @staticmethod
     def write_nx_graph(graph: nx.Graph, file_name):
         logger.info(f"Writing graph with {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
-        nx.write_graphml(graph, file_name)
+        write_graph(graph, file_name)
 
     def __post_init__(self):
-        self._graphml_xml_file = os.path.join(self.global_config["working_dir"], f"graph_{self.namespace}.graphml")
+        working_dir = self.global_config["working_dir"]
+        self._graph_file = os.path.join(working_dir, f"graph_{self.namespace}.nxbin")
+        self._graphml_xml_file = os.path.join(working_dir, f"graph_{self.namespace}.graphml")
         self._storage_lock = None
         self.storage_updated = None
-        self._graph = None
-
-        # Load initial graph
-        preloaded_graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
-        if preloaded_graph is not None:
-            logger.info(
-                f"Loaded graph from {self._graphml_xml_file} with {preloaded_graph.number_of_nodes()} nodes, {preloaded_graph.number_of_edges()} edges"
-            )
-        else:
+        self._plane = None
+        # (graph version, max_nodes) -> (top degree nodes, is_truncated)
+        self._top_degree_cache: OrderedDict[tuple[int, int], tuple[list[str], bool]] = OrderedDict()
+
+    def _load_graph(self) -> nx.Graph:
+        graph = NetworkXStorage.load_nx_graph(self._graph_file)
+        if graph is None:
+            graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
+            if graph is not None:
+                logger.info(
+                    f"Loaded graph from {self._graphml_xml_file}, it will be saved to {self._graph_file} "
+                    "from now on and the GraphML file is no longer updated"
+                )
+        if graph is None:
             logger.info("Created new empty graph")
-        self._graph = preloaded_graph or nx.Graph()
+            return nx.Graph()
+        logger.info(f"Loaded graph {self.namespace} with {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+        return graph
 
     async def initialize(self):
         """Initialize storage data"""
-        # Get the update flag for cross-process update notification
+        # Set for every worker while the graph has changes that are not saved yet
         self.storage_updated = await get_update_flag(self.namespace)
         # Get the storage lock for use in other methods
-        self._storage_lock = get_storage_lock()
+        self._storage_lock = get_storage_lock(namespace=self.namespace)
 
-    async def _get_graph(self):
-        """Check if the storage should be reloaded"""
-        # Acquire lock to prevent concurrent read and write
-        async with self._storage_lock:
-            # Check if data needs to be reloaded
-            if self.storage_updated.value:
-                logger.info(f"Process {os.getpid()} reloading graph {self.namespace} due to update by another process")
-                # Reload data
-                self._graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file) or nx.Graph()
-                # Reset update flag
-                self.storage_updated.value = False
+        async def create_plane(generation: NamespaceGeneration, log_file: str | None) -> SharedGraphPlane:
+            return SharedGraphPlane(self.namespace, generation, log_file, nx.Graph())
 
-            return self._graph
+        async with get_data_init_lock():
+            need_init = await try_initialize_namespace(self.namespace)
+            self._plane = await get_plane(self.namespace, create_plane)
+            async with self._storage_lock:
+                if need_init:
+                    self._plane.graph = self._load_graph()
+                    self._plane.reset()
+                    # The loaded graph is already on disk
+                    await clear_all_update_flags(self.namespace)
+                else:
+                    self._plane.sync()
+
+    async def _get_graph(self) -> nx.Graph:
+        """Return the graph after applying the changes other workers made since the last call"""
+        if not self._plane.is_current():
+            async with self._storage_lock:
+                self._plane.sync()
+        return self._plane.graph
+
+    async def _apply(self, op: str, args: list) -> None:
+        async with self._storage_lock:
+            self._plane.sync()
+            self._plane.apply(op, args)
 
     async def has_node(self, node_id: str) -> bool:
         graph = await self._get_graph()
@@ -114,8 +191,7 @@ class NetworkXStorage(BaseGraphStorage):
         2. Only one process should updating the storage at a time before index_done_callback,
            KG-storage-log should be used to avoid data corruption
         """
-        graph = await self._get_graph()
-        graph.add_node(node_id, **node_data)
+        await self._apply("add_nodes", [(node_id, node_data)])
 
     async def upsert_edge(self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]) -> None:
         """
@@ -124,8 +200,25 @@ class NetworkXStorage(BaseGraphStorage):
         2. Only one process should updating the storage at a time before index_done_callback,
            KG-storage-log should be used to avoid data corruption
         """
-        graph = await self._get_graph()
-        graph.add_edge(source_node_id, target_node_id, **edge_data)
+        await self._apply("add_edges", [(source_node_id, target_node_id, edge_data)])
+
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """
+        Importance notes:
+        1. Changes will be persisted to disk during the next index_done_callback
+        2. Only one process should updating the storage at a time before index_done_callback,
+           KG-storage-log should be used to avoid data corruption
+        """
+        await self._apply("add_nodes", list(nodes.items()))
+
+    async def upsert_edges_batch(self, edges: dict[tuple[str, str], dict[str, str]]) -> None:
+        """
+        Importance notes:
+        1. Changes will be persisted to disk during the next index_done_callback
+        2. Only one process should updating the storage at a time before index_done_callback,
+           KG-storage-log should be used to avoid data corruption
+        """
+        await self._apply("add_edges", [(src_id, tgt_id, edge_data) for (src_id, tgt_id), edge_data in edges.items()])
 
     async def delete_node(self, node_id: str) -> None:
         """
@@ -136,7 +229,7 @@ class NetworkXStorage(BaseGraphStorage):
         """
         graph = await self._get_graph()
         if graph.has_node(node_id):
-            graph.remove_node(node_id)
+            await self._apply("remove_nodes", [node_id])
             logger.debug(f"Node {node_id} deleted from the graph.")
         else:
             logger.warning(f"Node {node_id} not found in the graph for deletion.")
@@ -152,10 +245,7 @@ class NetworkXStorage(BaseGraphStorage):
         Args:
             nodes: List of node IDs to be deleted
         """
-        graph = await self._get_graph()
-        for node in nodes:
-            if graph.has_node(node):
-                graph.remove_node(node)
+        await self._apply("remove_nodes", list(nodes))
 
     async def remove_edges(self, edges: list[tuple[str, str]]):
         """Delete multiple edges
@@ -168,10 +258,7 @@ class NetworkXStorage(BaseGraphStorage):
         Args:
             edges: List of edges to be deleted, each edge is a (source, target) tuple
         """
-        graph = await self._get_graph()
-        for source, target in edges:
-            if graph.has_edge(source, target):
-                graph.remove_edge(source, target)
+        await self._apply("remove_edges", list(edges))
 
     async def get_all_labels(self) -> list[str]:
         """
@@ -206,155 +293,165 @@ class NetworkXStorage(BaseGraphStorage):
             indicating whether the graph was truncated due to max_nodes limit
         """
         graph = await self._get_graph()
+        subgraph, is_truncated = self._select_subgraph(graph, node_label, max_depth, max_nodes)
+        if subgraph is None:
+            return KnowledgeGraph()  # Return empty graph
 
-        result = KnowledgeGraph()
+        result = KnowledgeGraph(is_truncated=is_truncated)
+        for item in self._subgraph_items(subgraph):
+            if isinstance(item, KnowledgeGraphNode):
+                result.nodes.append(item)
+            else:
+                result.edges.append(item)
 
+        logger.info(f"Subgraph query successful | Node count: {len(result.nodes)} | Edge count: {len(result.edges)}")
+        return result
+
+    async def stream_knowledge_graph(
+        self, node_label: str, max_depth: int = 3, max_nodes: int = MAX_GRAPH_NODES
+    ) -> AsyncIterator[KnowledgeGraphMeta | KnowledgeGraphNode | KnowledgeGraphEdge]:
+        """Yield the subgraph of get_knowledge_graph() item by item, without building it as a whole"""
+        graph = await self._get_graph()
+        subgraph, is_truncated = self._select_subgraph(graph, node_label, max_depth, max_nodes)
+        yield KnowledgeGraphMeta(is_truncated=is_truncated, version=str(self._plane.version))
+        if subgraph is not None:
+            for item in self._subgraph_items(subgraph):
+                yield item
+
+    def _select_subgraph(
+        self, graph: nx.Graph, node_label: str, max_depth: int, max_nodes: int
+    ) -> tuple[nx.Graph | None, bool]:
+        """Return the subgraph view for a label and whether it was truncated, None if the label is unknown"""
         # Handle special case for "*" label
         if node_label == "*":
-            # Get degrees of all nodes
-            degrees = dict(graph.degree())
-            # Sort nodes by degree in descending order and take top max_nodes
-            sorted_nodes = sorted(degrees.items(), key=lambda x: x[1], reverse=True)
+            limited_nodes, is_truncated = self._top_degree_nodes(graph, max_nodes)
+            if is_truncated:
+                logger.info(f"Graph truncated: {graph.number_of_nodes()} nodes found, limited to {max_nodes}")
+            # Create subgraph with the highest degree nodes
+            return graph.subgraph(limited_nodes), is_truncated
 
-            # Check if graph is truncated
-            if len(sorted_nodes) > max_nodes:
-                result.is_truncated = True
-                logger.info(f"Graph truncated: {len(sorted_nodes)} nodes found, limited to {max_nodes}")
+        # Check if node exists
+        if node_label not in graph:
+            logger.warning(f"Node {node_label} not found in the graph")
+            return None, False
 
-            limited_nodes = [node for node, _ in sorted_nodes[:max_nodes]]
-            # Create subgraph with the highest degree nodes
-            subgraph = graph.subgraph(limited_nodes)
-        else:
-            # Check if node exists
-            if node_label not in graph:
-                logger.warning(f"Node {node_label} not found in the graph")
-                return KnowledgeGraph()  # Return empty graph
-
-            # Use modified BFS to get nodes, prioritizing high-degree nodes at the same depth
-            bfs_nodes = []
-            visited = set()
-            # Store (node, depth, degree) in the queue
-            queue = [(node_label, 0, graph.degree(node_label))]
-
-            # Modified breadth-first search with degree-based prioritization
-            while queue and len(bfs_nodes) < max_nodes:
-                # Get the current depth from the first node in queue
-                current_depth = queue[0][1]
-
-                # Collect all nodes at the current depth
-                current_level_nodes = []
-                while queue and queue[0][1] == current_depth:
-                    current_level_nodes.append(queue.pop(0))
-
-                # Sort nodes at current depth by degree (highest first)
-                current_level_nodes.sort(key=lambda x: x[2], reverse=True)
-
-                # Process all nodes at current depth in order of degree
-                for current_node, depth, degree in current_level_nodes:
-                    if current_node not in visited:
-                        visited.add(current_node)
-                        bfs_nodes.append(current_node)
-
-                        # Only explore neighbors if we haven't reached max_depth
-                        if depth < max_depth:
-                            # Add neighbor nodes to queue with incremented depth
-                            neighbors = list(graph.neighbors(current_node))
-                            # Filter out already visited neighbors
-                            unvisited_neighbors = [n for n in neighbors if n not in visited]
-                            # Add neighbors to the queue with their degrees
-                            for neighbor in unvisited_neighbors:
-                                neighbor_degree = graph.degree(neighbor)
-                                queue.append((neighbor, depth + 1, neighbor_degree))
-
-                    # Check if we've reached max_nodes
-                    if len(bfs_nodes) >= max_nodes:
-                        break
-
-            # Check if graph is truncated - if we still have nodes in the queue
-            # and we've reached max_nodes, then the graph is truncated
-            if queue and len(bfs_nodes) >= max_nodes:
-                result.is_truncated = True
-                logger.info(f"Graph truncated: breadth-first search limited to {max_nodes} nodes")
-
-            # Create subgraph with BFS discovered nodes
-            subgraph = graph.subgraph(bfs_nodes)
-
-        # Add nodes to result
-        seen_nodes = set()
-        seen_edges = set()
-        for node in subgraph.nodes():
-            if str(node) in seen_nodes:
-                continue
+        bfs_nodes, is_truncated = self._bfs_by_degree(graph, node_label, max_depth, max_nodes)
+        if is_truncated:
+            logger.info(f"Graph truncated: breadth-first search limited to {max_nodes} nodes")
 
-            node_data = dict(subgraph.nodes[node])
-            # Get entity_type as labels
-            labels = []
-            if "entity_type" in node_data:
-                if isinstance(node_data["entity_type"], list):
-                    labels.extend(node_data["entity_type"])
-                else:
-                    labels.append(node_data["entity_type"])
+        # Create subgraph with BFS discovered nodes
+        return graph.subgraph(bfs_nodes), is_truncated
 
-            # Create node with properties
-            node_properties = {k: v for k, v in node_data.items()}
+    @staticmethod
+    def _subgraph_items(subgraph: nx.Graph) -> Iterator[KnowledgeGraphNode | KnowledgeGraphEdge]:
+        """Convert the nodes, then the edges of a subgraph view"""
+        # Snapshot the view, the graph may change while a stream is consumed
+        nodes = list(subgraph.nodes(data=True))
+        edges = list(subgraph.edges(data=True))
 
-            result.nodes.append(KnowledgeGraphNode(id=str(node), labels=[str(node)], properties=node_properties))
+        seen_nodes = set()
+        for node, node_data in nodes:
+            if str(node) in seen_nodes:
+                continue
             seen_nodes.add(str(node))
+            yield KnowledgeGraphNode(id=str(node), labels=[str(node)], properties=dict(node_data))
 
-        # Add edges to result
-        for edge in subgraph.edges():
-            source, target = edge
+        seen_edges = set()
+        for source, target, edge_data in edges:
             # Esure unique edge_id for undirect graph
             if str(source) > str(target):
                 source, target = target, source
             edge_id = f"{source}-{target}"
             if edge_id in seen_edges:
                 continue
+            seen_edges.add(edge_id)
+            yield KnowledgeGraphEdge(
+                id=edge_id,
+                type="DIRECTED",
+                source=str(source),
+                target=str(target),
+                properties=dict(edge_data),
+            )
 
-            edge_data = dict(subgraph.edges[edge])
+    def _top_degree_nodes(self, graph: nx.Graph, max_nodes: int) -> tuple[list[str], bool]:
+        """Return the max_nodes nodes of highest degree and whether the graph has more nodes
 
-            # Create edge with complete information
-            result.edges.append(
-                KnowledgeGraphEdge(
-                    id=edge_id,
-                    type="DIRECTED",
-                    source=str(source),
-                    target=str(target),
-                    properties=edge_data,
-                )
-            )
-            seen_edges.add(edge_id)
+        Ties keep graph order, as a stable sort by descending degree would.
+        """
+        key = (self._plane.version, max_nodes)
+        cached = self._top_degree_cache.get(key)
+        if cached is not None:
+            self._top_degree_cache.move_to_end(key)
+            return cached
+
+        degree = graph.degree
+        nodes = heapq.nlargest(max_nodes, graph, key=degree.__getitem__)
+        cached = self._top_degree_cache[key] = (nodes, graph.number_of_nodes() > max_nodes)
+        while len(self._top_degree_cache) > _TOP_DEGREE_CACHE_SIZE:
+            self._top_degree_cache.popitem(last=False)
+        return cached
 
-        logger.info(f"Subgraph query successful | Node count: {len(result.nodes)} | Edge count: {len(result.edges)}")
-        return result
+    @staticmethod
+    def _bfs_by_degree(graph: nx.Graph, start: str, max_depth: int, max_nodes: int) -> tuple[list[str], bool]:
+        """Breadth-first search visiting the nodes of each depth from highest to lowest degree
+
+        Returns the visited nodes and whether the search stopped at max_nodes while nodes
+        of the next depth were still waiting.
+        """
+        degree = graph.degree
+        visited: set[str] = set()
+        bfs_nodes: list[str] = []
+        level = [start]
+        depth = 0
+        while level and len(bfs_nodes) < max_nodes:
+            # Pop by descending degree, ties in discovery order
+            heap = [(-degree[node], order, node) for order, node in enumerate(level)]
+            heapq.heapify(heap)
+            next_level: list[str] = []
+            discovered: set[str] = set()
+            while heap and len(bfs_nodes) < max_nodes:
+                node = heapq.heappop(heap)[2]
+                if node in visited:
+                    continue
+                visited.add(node)
+                bfs_nodes.append(node)
+                if depth < max_depth:
+                    for neighbor in graph.neighbors(node):
+                        if neighbor not in visited and neighbor not in discovered:
+                            discovered.add(neighbor)
+                            next_level.append(neighbor)
+            level = next_level
+            depth += 1
+        return bfs_nodes, bool(level) and len(bfs_nodes) >= max_nodes
 
     async def index_done_callback(self) -> bool:
         """Save data to disk"""
         async with self._storage_lock:
-            # Check if storage was updated by another process
-            if self.storage_updated.value:
-                # Storage was updated by another process, reload data instead of saving
-                logger.info(f"Graph for {self.namespace} was updated by another process, reloading...")
-                self._graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file) or nx.Graph()
-                # Reset update flag
-                self.storage_updated.value = False
-                return False  # Return error
-
-        # Acquire lock and perform persistence
-        async with self._storage_lock:
+            # Every change of any worker is already in the replica, save only if some are unsaved
+            if not self.storage_updated.value:
+                return True
             try:
-                # Save data to disk
-                NetworkXStorage.write_nx_graph(self._graph, self._graphml_xml_file)
-                # Notify other processes that data has been updated
-                await set_all_update_flags(self.namespace)
-                # Reset own update flag to avoid self-reloading
-                self.storage_updated.value = False
+                self._plane.sync()
+                NetworkXStorage.write_nx_graph(self._plane.graph, self._graph_file)
+                if EXPORT_GRAPHML:
+                    nx.write_graphml(self._plane.graph, self._graphml_xml_file)
+                await clear_all_update_flags(self.namespace)
                 return True  # Return success
             except Exception as e:
                 logger.error(f"Error saving graph for {self.namespace}: {e}")
                 return False  # Return error
 
-        return True
+    async def export_graphml(self, file_name: str | None = None) -> str:
+        """Write the graph in GraphML format, to graph_<namespace>.graphml by default
+
+        Returns:
+            The path of the written file
+        """
+        file_name = file_name or self._graphml_xml_file
+        graph = await self._get_graph()
+        nx.write_graphml(graph, file_name)
+        logger.info(f"Exported graph {self.namespace} to {file_name}")
+        return file_name
 
     async def drop(self) -> dict[str, str]:
         """Drop all graph data from storage and clean up resources
@@ -372,15 +469,15 @@ class NetworkXStorage(BaseGraphStorage):
         """
         try:
             async with self._storage_lock:
-                # delete _client_file_name
-                if os.path.exists(self._graphml_xml_file):
-                    os.remove(self._graphml_xml_file)
-                self._graph = nx.Graph()
-                # Notify other processes that data has been updated
-                await set_all_update_flags(self.namespace)
-                # Reset own update flag to avoid self-reloading
-                self.storage_updated.value = False
-                logger.info(f"Process {os.getpid()} drop graph {self.namespace} (file:{self._graphml_xml_file})")
+                for file_name in (self._graph_file, self._graphml_xml_file):
+                    if os.path.exists(file_name):
+                        os.remove(file_name)
+                self._plane.graph = nx.Graph()
+                # Other workers replace their replica with the empty graph
+                self._plane.reset()
+                # The empty graph needs no saving
+                await clear_all_update_flags(self.namespace)
+                logger.info(f"Process {os.getpid()} drop graph {self.namespace} (file:{self._graph_file})")
             return {"status": "success", "message": "data dropped"}
         except Exception as e:
             logger.error(f"Error dropping graph {self.namespace}: {e}")
@@ -3,6 +3,7 @@ import configparser
 import datetime
 import json
 import os
+import struct
 from dataclasses import dataclass, field
 from datetime import timezone
 from typing import Any, Union, final
@@ -32,6 +33,20 @@ load_dotenv(dotenv_path=".env", override=False)
 MAX_GRAPH_NODES = int(os.getenv("MAX_GRAPH_NODES", 1000))
 
 
+def _encode_vector(value: Any) -> bytes:
+    """pgvector binary format: dimension (int16), unused (int16), float32 values, big-endian"""
+    if isinstance(value, str):
+        # Text representation, e.g. "[0.1,0.2]"
+        value = json.loads(value)
+    vector = np.asarray(value, dtype=">f4").ravel()
+    return struct.pack(">HH", vector.shape[0], 0) + vector.tobytes()
+
+
+def _decode_vector(data: bytes) -> np.ndarray:
+    dim, _ = struct.unpack_from(">HH", data)
+    return np.frombuffer(data, dtype=">f4", count=dim, offset=4).astype(np.float32)
+
+
 class PostgreSQLDB:
     def __init__(self, config: dict[str, Any], **kwargs: Any):
         self.host = config.get("host", "localhost")
@@ -41,14 +56,39 @@ class PostgreSQLDB:
         self.database = config.get("database", "postgres")
         self.workspace = config.get("workspace", "default")
         self.max = int(config.get("max_connections", 12))
+        self.vector_index_type = str(config.get("vector_index_type", "hnsw")).lower()
+        self.hnsw_m = int(config.get("hnsw_m", 16))
+        self.hnsw_ef_construction = int(config.get("hnsw_ef_construction", 64))
+        self.hnsw_ef_search = int(config.get("hnsw_ef_search", 100))
+        self.ivfflat_lists = int(config.get("ivfflat_lists", 100))
+        self.ivfflat_probes = int(config.get("ivfflat_probes", 10))
         self.increment = 1
         self.pool: Pool | None = None
+        # Whether every pooled connection has the binary pgvector codec, decided once in initdb().
+        # Without pgvector embeddings are sent as SQL text.
+        self.vector_binary = True
+        # Whether HNSW searches scan on until enough rows pass their filters (pgvector >= 0.8),
+        # decided in initdb()
+        self.vector_iterative_scan = False
 
         if self.user is None or self.password is None or self.database is None:
             raise ValueError("Missing database user, password, or database")
 
     async def initdb(self):
         try:
+            # Decided before the pool exists, so that all its connections encode vectors the same way
+            self.vector_binary, pgvector_version = await self._check_pgvector()
+            if not self.vector_binary:
+                logger.warning("PostgreSQL, pgvector type not found, embeddings are sent as text")
+            server_settings = {
+                "hnsw.ef_search": str(self.hnsw_ef_search),
+                "ivfflat.probes": str(self.ivfflat_probes),
+            }
+            # An HNSW search returns ef_search candidates before the workspace, threshold and document
+            # filters apply. Iterative scans fetch more candidates until LIMIT rows pass, in exact order.
+            self.vector_iterative_scan = self.vector_index_type == "hnsw" and pgvector_version >= (0, 8)
+            if self.vector_iterative_scan:
+                server_settings["hnsw.iterative_scan"] = "strict_order"
             self.pool = await asyncpg.create_pool(  # type: ignore
                 user=self.user,
                 password=self.password,
@@ -57,6 +97,10 @@ class PostgreSQLDB:
                 port=self.port,
                 min_size=1,
                 max_size=self.max,
+                init=self._init_connection,
+                # Search breadth of the ANN indexes. Startup settings are the session defaults,
+                # so they survive the RESET ALL asyncpg runs when a connection returns to the pool.
+                server_settings=server_settings,
             )
 
             logger.info(f"PostgreSQL, Connected to database at {self.host}:{self.port}/{self.database}")
@@ -64,6 +108,50 @@ class PostgreSQLDB:
             logger.error(f"PostgreSQL, Failed to connect database at {self.host}:{self.port}/{self.database}, Got:{e}")
             raise
 
+    async def _check_pgvector(self) -> tuple[bool, tuple[int, ...]]:
+        """Return whether the pgvector type is in the public schema and the installed pgvector version"""
+        connection = await asyncpg.connect(
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            host=self.host,
+            port=self.port,
+        )
+        try:
+            has_type = await connection.fetchval(
+                """SELECT EXISTS (SELECT 1 FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace
+                   WHERE t.typname = 'vector' AND n.nspname = 'public')"""
+            )
+            version = await connection.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        finally:
+            await connection.close()
+        try:
+            parsed_version = tuple(int(part) for part in version.split("."))
+        except (AttributeError, ValueError):
+            parsed_version = ()
+        return bool(has_type), parsed_version
+
+    async def _init_connection(self, connection: asyncpg.Connection) -> None:
+        """Register the binary pgvector codec, so embeddings travel as float32 arrays instead of text
+
+        A connection that cannot register it fails, rather than silently encoding vectors
+        differently from the other connections of the pool.
+        """
+        if self.vector_binary:
+            await connection.set_type_codec(
+                "vector",
+                schema="public",
+                encoder=_encode_vector,
+                decoder=_decode_vector,
+                format="binary",
+            )
+
+    def vector_param(self, vector: np.ndarray) -> Any:
+        """Represent an embedding as a query parameter for a vector column"""
+        if self.vector_binary:
+            return vector
+        return json.dumps(vector.tolist())
+
     @staticmethod
     async def configure_age(connection: asyncpg.Connection, graph_name: str) -> None:
         """Set the Apache AGE environment and creates a graph if it does not exist.
@@ -168,6 +256,58 @@ class PostgreSQLDB:
             logger.error(f"PostgreSQL, Failed to migrate timestamp columns: {e}")
             # Don't throw an exception, allow the initialization process to continue
 
+    async def check_vector_index(self, table_name: str, embedding_dim: int) -> None:
+        """Create or rebuild the ANN index of a vector table as configured by vector_index_type
+
+        HNSW and IVFFlat indexes need a fixed dimension, so an untyped content_vector column is
+        converted to VECTOR(embedding_dim) first. An existing index of another type is replaced.
+        """
+        if self.vector_index_type not in ("hnsw", "ivfflat"):
+            return
+
+        try:
+            column = await self.query(
+                """SELECT a.atttypmod AS dim FROM pg_attribute a
+                   WHERE a.attrelid = $1::regclass AND a.attname = 'content_vector'""",
+                {"table_name": table_name.lower()},
+            )
+            current_dim = column["dim"] if column else -1
+            if current_dim == -1:
+                logger.info(f"PostgreSQL, Setting {table_name}.content_vector dimension to {embedding_dim}")
+                await self.execute(f"ALTER TABLE {table_name} ALTER COLUMN content_vector TYPE VECTOR({embedding_dim})")
+            elif current_dim != embedding_dim:
+                logger.warning(
+                    f"PostgreSQL, {table_name}.content_vector has dimension {current_dim}, "
+                    f"embedding dimension is {embedding_dim}, skipping vector index"
+                )
+                return
+
+            index_name = f"idx_{table_name.lower()}_vector_{self.vector_index_type}"
+            existing = await self.query(
+                "SELECT indexname FROM pg_indexes WHERE tablename = $1 AND indexname LIKE $2",
+                {"table_name": table_name.lower(), "pattern": f"idx_{table_name.lower()}_vector_%"},
+                multirows=True,
+            )
+            existing_names = {row["indexname"] for row in existing}
+            for stale_index in existing_names - {index_name}:
+                logger.info(f"PostgreSQL, Dropping vector index {stale_index}")
+                await self.execute(f"DROP INDEX IF EXISTS {stale_index}")
+            if index_name in existing_names:
+                return
+
+            if self.vector_index_type == "hnsw":
+                options = f"m = {self.hnsw_m}, ef_construction = {self.hnsw_ef_construction}"
+            else:
+                # IVFFlat clusters are trained on the rows present when the index is built
+                options = f"lists = {self.ivfflat_lists}"
+            logger.info(f"PostgreSQL, Creating vector index {index_name} on {table_name}")
+            await self.execute(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} "
+                f"USING {self.vector_index_type} (content_vector vector_cosine_ops) WITH ({options})"
+            )
+        except Exception as e:
+            logger.error(f"PostgreSQL, Failed to create vector index on {table_name}, Got: {e}")
+
     async def query(
         self,
         sql: str,
@@ -175,7 +315,9 @@ class PostgreSQLDB:
         multirows: bool = False,
         with_age: bool = False,
         graph_name: str | None = None,
+        settings: dict[str, str] | None = None,
     ) -> dict[str, Any] | None | list[dict[str, Any]]:
+        """Run a query, settings are applied to this query only as with SET LOCAL"""
         # start_time = time.time()
         # logger.info(f"PostgreSQL, Querying:\n{sql}")
 
@@ -186,10 +328,14 @@ class PostgreSQLDB:
                 raise ValueError("Graph name is required when with_age is True")
 
             try:
-                if params:
-                    rows = await connection.fetch(sql, *params.values())
+                args = params.values() if params else ()
+                if settings:
+                    async with connection.transaction():
+                        for name, value in settings.items():
+                            await connection.execute("SELECT set_config($1, $2, true)", name, value)
+                        rows = await connection.fetch(sql, *args)
                 else:
-                    rows = await connection.fetch(sql)
+                    rows = await connection.fetch(sql, *args)
 
                 if multirows:
                     if rows:
@@ -244,6 +390,62 @@ class PostgreSQLDB:
             logger.error(f"PostgreSQL database,\nsql:{sql},\ndata:{data},\nerror:{e}")
             raise
 
+    async def executemany(self, sql: str, rows: list[dict[str, Any]]) -> None:
+        """Run one statement for many rows, pipelined over a single connection in one transaction"""
+        if not rows:
+            return
+        try:
+            async with self.pool.acquire() as connection:  # type: ignore
+                async with connection.transaction():
+                    await connection.executemany(sql, [tuple(row.values()) for row in rows])  # type: ignore
+        except Exception as e:
+            logger.error(f"PostgreSQL database,\nsql:{sql},\nrows:{len(rows)},\nerror:{e}")
+            raise
+
+    async def copy_upsert(
+        self,
+        table_name: str,
+        rows: list[dict[str, Any]],
+        conflict_columns: tuple[str, ...] = ("workspace", "id"),
+        insert_only_columns: tuple[str, ...] = ("create_time",),
+    ) -> None:
+        """Bulk upsert rows: binary COPY into a staging table, then a single INSERT ... ON CONFLICT
+
+        Args:
+            table_name: Target table
+            rows: Rows with identical keys in column order, keys must be unique over conflict_columns
+            conflict_columns: Columns of the primary key
+            insert_only_columns: Columns kept from the existing row on conflict
+        """
+        if not rows:
+            return
+        columns = list(rows[0].keys())
+        column_list = ", ".join(columns)
+        update_list = ", ".join(
+            f"{column}=EXCLUDED.{column}"
+            for column in columns
+            if column not in conflict_columns and column not in insert_only_columns
+        )
+        stage_table = f"stage_{table_name.lower()}"
+        insert_sql = f"""INSERT INTO {table_name} ({column_list})
+                         SELECT {column_list} FROM {stage_table}
+                         ON CONFLICT ({", ".join(conflict_columns)}) DO UPDATE SET {update_list}"""
+        try:
+            async with self.pool.acquire() as connection:  # type: ignore
+                async with connection.transaction():
+                    await connection.execute(  # type: ignore
+                        f"CREATE TEMP TABLE {stage_table} (LIKE {table_name}) ON COMMIT DROP"
+                    )
+                    await connection.copy_records_to_table(  # type: ignore
+                        stage_table,
+                        records=[tuple(row.values()) for row in rows],
+                        columns=columns,
+                    )
+                    await connection.execute(insert_sql)  # type: ignore
+        except Exception as e:
+            logger.error(f"PostgreSQL database, bulk upsert of {len(rows)} rows into {table_name} failed: {e}")
+            raise
+
 
 class ClientManager:
     _instances: dict[str, Any] = {"db": None, "ref_count": 0}
@@ -277,6 +479,27 @@ class ClientManager:
                 "POSTGRES_MAX_CONNECTIONS",
                 config.get("postgres", "max_connections", fallback=12),
             ),
+            "vector_index_type": os.environ.get(
+                "POSTGRES_VECTOR_INDEX_TYPE",
+                config.get("postgres", "vector_index_type", fallback="hnsw"),
+            ),
+            "hnsw_m": os.environ.get("POSTGRES_HNSW_M", config.get("postgres", "hnsw_m", fallback=16)),
+            "hnsw_ef_construction": os.environ.get(
+                "POSTGRES_HNSW_EF_CONSTRUCTION",
+                config.get("postgres", "hnsw_ef_construction", fallback=64),
+            ),
+            "hnsw_ef_search": os.environ.get(
+                "POSTGRES_HNSW_EF_SEARCH",
+                config.get("postgres", "hnsw_ef_search", fallback=100),
+            ),
+            "ivfflat_lists": os.environ.get(
+                "POSTGRES_IVFFLAT_LISTS",
+                config.get("postgres", "ivfflat_lists", fallback=100),
+            ),
+            "ivfflat_probes": os.environ.get(
+                "POSTGRES_IVFFLAT_PROBES",
+                config.get("postgres", "ivfflat_probes", fallback=10),
+            ),
         }
 
     @classmethod
@@ -349,6 +572,8 @@ class PGKVStorage(BaseKVStorage):
                         result_dict[mode] = {}
                     result_dict[mode][row["id"]] = row
                 return result_dict
+            elif is_namespace(self.namespace, NameSpace.KV_STORE_DOC_INDEX):
+                return {row["id"]: self._decode_doc_index_row(row) for row in results}
             else:
                 return {row["id"]: row for row in results}
         except Exception as e:
@@ -365,6 +590,9 @@ class PGKVStorage(BaseKVStorage):
             for row in array_res:
                 res[row["id"]] = row
             return res if res else None
+        elif is_namespace(self.namespace, NameSpace.KV_STORE_DOC_INDEX):
+            response = await self.db.query(sql, params)
+            return self._decode_doc_index_row(response) if response else None
         else:
             response = await self.db.query(sql, params)
             return response if response else None
@@ -399,9 +627,37 @@ class PGKVStorage(BaseKVStorage):
             for row in array_res:
                 dict_res[row["mode"]][row["id"]] = row
             return [{k: v} for k, v in dict_res.items()]
+        elif is_namespace(self.namespace, NameSpace.KV_STORE_DOC_INDEX):
+            array_res = await self.db.query(sql, params, multirows=True)
+            return [self._decode_doc_index_row(row) for row in array_res or []]
         else:
             return await self.db.query(sql, params, multirows=True)
 
+    async def get_fields_by_ids(self, ids: list[str], fields: list[str] | None = None) -> dict[str, dict[str, Any]]:
+        """Get records by id in one query, selecting only the requested chunk columns"""
+        if not ids:
+            return {}
+        if is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
+            # Cache entries are grouped by mode, there is no flat id lookup
+            results = {}
+            for id in ids:
+                value = await self.get_by_id(id)
+                if value is not None:
+                    results[id] = value
+            return results
+        if (
+            fields is not None
+            and is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS)
+            and set(fields) <= TEXT_CHUNK_COLUMNS.keys()
+        ):
+            sql = SQL_TEMPLATES["get_fields_by_ids_text_chunks"].format(
+                columns=", ".join(TEXT_CHUNK_COLUMNS[field] for field in fields)
+            )
+            rows = await self.db.query(sql, {"workspace": self.db.workspace, "ids": list(ids)}, multirows=True)
+            return {row.pop("id"): row for row in rows or []}
+        rows = await self.get_by_ids(ids) or []
+        return {row["id"]: row if fields is None else {k: row[k] for k in fields if k in row} for row in rows}
+
     async def get_by_status(self, status: str) -> Union[list[dict[str, Any]], None]:
         """Specifically for llm_response_cache."""
         SQL = SQL_TEMPLATES["get_by_status_" + self.namespace]
@@ -436,27 +692,49 @@ class PGKVStorage(BaseKVStorage):
         if is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
             pass
         elif is_namespace(self.namespace, NameSpace.KV_STORE_FULL_DOCS):
-            for k, v in data.items():
-                upsert_sql = SQL_TEMPLATES["upsert_doc_full"]
-                _data = {
+            rows = [
+                {
                     "id": k,
                     "content": v["content"],
                     "workspace": self.db.workspace,
                 }
-                await self.db.execute(upsert_sql, _data)
+                for k, v in data.items()
+            ]
+            await self.db.executemany(SQL_TEMPLATES["upsert_doc_full"], rows)
         elif is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
-            for mode, items in data.items():
-                for k, v in items.items():
-                    upsert_sql = SQL_TEMPLATES["upsert_llm_response_cache"]
-                    _data = {
-                        "workspace": self.db.workspace,
-                        "id": k,
-                        "original_prompt": v["original_prompt"],
-                        "return_value": v["return"],
-                        "mode": mode,
-                    }
-
-                    await self.db.execute(upsert_sql, _data)
+            rows = [
+                {
+                    "workspace": self.db.workspace,
+                    "id": k,
+                    "original_prompt": v["original_prompt"],
+                    "return_value": v["return"],
+                    "mode": mode,
+                }
+                for mode, items in data.items()
+                for k, v in items.items()
+            ]
+            await self.db.executemany(SQL_TEMPLATES["upsert_llm_response_cache"], rows)
+        elif is_namespace(self.namespace, NameSpace.KV_STORE_DOC_INDEX):
+            rows = [
+                {
+                    "workspace": self.db.workspace,
+                    "id": k,
+                    "chunk_ids": json.dumps(v.get("chunk_ids", [])),
+                    "entities": json.dumps(v.get("entities", []), ensure_ascii=False),
+                    "relations": json.dumps(v.get("relations", []), ensure_ascii=False),
+                }
+                for k, v in data.items()
+            ]
+            await self.db.executemany(SQL_TEMPLATES["upsert_doc_index"], rows)
+
+    @staticmethod
+    def _decode_doc_index_row(row: dict[str, Any]) -> dict[str, Any]:
+        """JSONB columns are returned as strings by asyncpg"""
+        row = dict(row)
+        for key in ("chunk_ids", "entities", "relations"):
+            if isinstance(row.get(key), str):
+                row[key] = json.loads(row[key])
+        return row
 
     async def index_done_callback(self) -> None:
         # PG handles persistence automatically
@@ -553,6 +831,7 @@ class PGVectorStorage(BaseVectorStorage):
     async def initialize(self):
         if self.db is None:
             self.db = await ClientManager.get_client()
+            await self.db.check_vector_index(namespace_to_table_name(self.namespace), self.embedding_func.embedding_dim)
 
     async def finalize(self):
         if self.db is not None:
@@ -569,7 +848,7 @@ class PGVectorStorage(BaseVectorStorage):
                 "chunk_order_index": item["chunk_order_index"],
                 "full_doc_id": item["full_doc_id"],
                 "content": item["content"],
-                "content_vector": json.dumps(item["__vector__"].tolist()),
+                "content_vector": self.db.vector_param(item["__vector__"]),
                 "file_path": item["file_path"],
                 "create_time": current_time,
                 "update_time": current_time,
@@ -593,7 +872,7 @@ class PGVectorStorage(BaseVectorStorage):
             "id": item["__id__"],
             "entity_name": item["entity_name"],
             "content": item["content"],
-            "content_vector": json.dumps(item["__vector__"].tolist()),
+            "content_vector": self.db.vector_param(item["__vector__"]),
             "chunk_ids": chunk_ids,
             "file_path": item.get("file_path", None),
             "create_time": current_time,
@@ -617,7 +896,7 @@ class PGVectorStorage(BaseVectorStorage):
             "source_id": item["src_id"],
             "target_id": item["tgt_id"],
             "content": item["content"],
-            "content_vector": json.dumps(item["__vector__"].tolist()),
+            "content_vector": self.db.vector_param(item["__vector__"]),
             "chunk_ids": chunk_ids,
             "file_path": item.get("file_path", None),
             "create_time": current_time,
@@ -648,32 +927,50 @@ class PGVectorStorage(BaseVectorStorage):
         embeddings = np.concatenate(embeddings_list)
         for i, d in enumerate(list_data):
             d["__vector__"] = embeddings[i]
+
+        if is_namespace(self.namespace, NameSpace.VECTOR_STORE_CHUNKS):
+            prepare = self._upsert_chunks
+        elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_ENTITIES):
+            prepare = self._upsert_entities
+        elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_RELATIONSHIPS):
+            prepare = self._upsert_relationships
+        else:
+            raise ValueError(f"{self.namespace} is not supported")
+
+        upsert_sql = None
+        rows = []
         for item in list_data:
-            if is_namespace(self.namespace, NameSpace.VECTOR_STORE_CHUNKS):
-                upsert_sql, data = self._upsert_chunks(item, current_time)
-            elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_ENTITIES):
-                upsert_sql, data = self._upsert_entities(item, current_time)
-            elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_RELATIONSHIPS):
-                upsert_sql, data = self._upsert_relationships(item, current_time)
-            else:
-                raise ValueError(f"{self.namespace} is not supported")
+            upsert_sql, row = prepare(item, current_time)
+            rows.append(row)
 
-            await self.db.execute(upsert_sql, data)
+        if self.db.vector_binary:
+            # Binary COPY needs the pgvector codec
+            await self.db.copy_upsert(namespace_to_table_name(self.namespace), rows)
+        else:
+            await self.db.executemany(upsert_sql, rows)
 
     #################### query method ###############
     async def query(self, query: str, top_k: int, ids: list[str] | None = None) -> list[dict[str, Any]]:
         embeddings = await self.embedding_func([query], _priority=5)  # higher priority for query
-        embedding = embeddings[0]
-        embedding_string = ",".join(map(str, embedding))
-        # Use parameterized document IDs (None means search across all documents)
-        sql = SQL_TEMPLATES[self.namespace].format(embedding_string=embedding_string)
+        # The embedding is a bound parameter, so the statement text is constant and prepared once
         params = {
             "workspace": self.db.workspace,
-            "doc_ids": ids,
-            "better_than_threshold": self.cosine_better_than_threshold,
+            "embedding": self.db.vector_param(embeddings[0]),
+            "max_distance": 1 - self.cosine_better_than_threshold,
             "top_k": top_k,
         }
-        results = await self.db.query(sql, params=params, multirows=True)
+        settings = None
+        if ids is None:
+            sql = SQL_TEMPLATES[self.namespace]
+        else:
+            # Restrict the search to the chunks of the given documents
+            sql = SQL_TEMPLATES[f"{self.namespace}_by_doc_ids"]
+            params["doc_ids"] = ids
+            if self.db.vector_index_type in ("hnsw", "ivfflat") and not self.db.vector_iterative_scan:
+                # The index would return its candidates before the document filter, possibly none of
+                # them in the given documents. Without iterative scans, search these rows exactly.
+                settings = {"enable_indexscan": "off"}
+        results = await self.db.query(sql, params=params, multirows=True, settings=settings)
         return results
 
     async def index_done_callback(self) -> None:
@@ -1046,6 +1343,9 @@ class PGGraphQueryException(Exception):
 @final
 @dataclass
 class PGGraphStorage(BaseGraphStorage):
+    # Rows per UNWIND statement in the batch upserts, keeps the cypher text bounded
+    _UPSERT_BATCH_SIZE = 500
+
     def __post_init__(self):
         self.graph_name = self.namespace or os.environ.get("AGE_GRAPH_NAME", "lightrag")
         self.db: PostgreSQLDB | None = None
@@ -1470,6 +1770,89 @@ class PGGraphStorage(BaseGraphStorage):
             logger.error(f"POSTGRES, upsert_edge error on edge: `{source_node_id}`-`{target_node_id}`")
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """
+        Upsert multiple nodes with one UNWIND statement per batch.
+
+        Args:
+            nodes: Mapping of node_id to node properties
+        """
+        items = list(nodes.items())
+        for node_id, node_data in items:
+            if "entity_id" not in node_data:
+                raise ValueError(f"PostgreSQL: node properties must contain an 'entity_id' field, got `{node_id}`")
+
+        for start in range(0, len(items), self._UPSERT_BATCH_SIZE):
+            batch = items[start : start + self._UPSERT_BATCH_SIZE]
+            rows = ", ".join(
+                '{entity_id: "%s", props: %s}' % (self._normalize_node_id(node_id), self._format_properties(node_data))
+                for node_id, node_data in batch
+            )
+            query = """SELECT * FROM cypher('%s', $$
+                         UNWIND [%s] AS row
+                         MERGE (n:base {entity_id: row.entity_id})
+                         SET n += row.props
+                         RETURN count(n)
+                       $$) AS (n agtype)""" % (
+                self.graph_name,
+                rows,
+            )
+            try:
+                await self._query(query, readonly=False, upsert=True)
+            except Exception:
+                logger.error(f"POSTGRES, upsert_nodes_batch error on {len(batch)} nodes starting at `{batch[0][0]}`")
+                raise
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_edges_batch(self, edges: dict[tuple[str, str], dict[str, str]]) -> None:
+        """
+        Upsert multiple edges with one UNWIND statement per batch.
+
+        Args:
+            edges: Mapping of (source_node_id, target_node_id) to edge properties
+        """
+        items = list(edges.items())
+        for start in range(0, len(items), self._UPSERT_BATCH_SIZE):
+            batch = items[start : start + self._UPSERT_BATCH_SIZE]
+            rows = ", ".join(
+                '{src: "%s", tgt: "%s", props: %s}'
+                % (
+                    self._normalize_node_id(src_id),
+                    self._normalize_node_id(tgt_id),
+                    self._format_properties(edge_data),
+                )
+                for (src_id, tgt_id), edge_data in batch
+            )
+            query = """SELECT * FROM cypher('%s', $$
+                         UNWIND [%s] AS row
+                         MATCH (source:base {entity_id: row.src})
+                         WITH source, row
+                         MATCH (target:base {entity_id: row.tgt})
+                         MERGE (source)-[r:DIRECTED]-(target)
+                         SET r += row.props
+                         RETURN count(r)
+                       $$) AS (r agtype)""" % (
+                self.graph_name,
+                rows,
+            )
+            try:
+                await self._query(query, readonly=False, upsert=True)
+            except Exception:
+                src_id, tgt_id = batch[0][0]
+                logger.error(
+                    f"POSTGRES, upsert_edges_batch error on {len(batch)} edges starting at `{src_id}`-`{tgt_id}`"
+                )
+                raise
+
     async def delete_node(self, node_id: str) -> None:
         """
         Delete a node from the graph.
@@ -2179,6 +2562,7 @@ NAMESPACE_TABLE_MAP = {
     NameSpace.VECTOR_STORE_RELATIONSHIPS: "LIGHTRAG_VDB_RELATION",
     NameSpace.DOC_STATUS: "LIGHTRAG_DOC_STATUS",
     NameSpace.KV_STORE_LLM_RESPONSE_CACHE: "LIGHTRAG_LLM_CACHE",
+    NameSpace.KV_STORE_DOC_INDEX: "LIGHTRAG_DOC_INDEX",
 }
 
 
@@ -2272,6 +2656,27 @@ TABLES = {
 	               CONSTRAINT LIGHTRAG_DOC_STATUS_PK PRIMARY KEY (workspace, id)
 	              )"""
     },
+    "LIGHTRAG_DOC_INDEX": {
+        "ddl": """CREATE TABLE LIGHTRAG_DOC_INDEX (
+                    workspace VARCHAR(255) NOT NULL,
+                    id VARCHAR(255) NOT NULL,
+                    chunk_ids JSONB,
+                    entities JSONB,
+                    relations JSONB,
+                    create_time TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+                    update_time TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+                    CONSTRAINT LIGHTRAG_DOC_INDEX_PK PRIMARY KEY (workspace, id)
+                    )"""
+    },
+}
+
+# Chunk fields that get_fields_by_ids can select on the server side, and their column expression
+TEXT_CHUNK_COLUMNS = {
+    "tokens": "tokens",
+    "content": "COALESCE(content, '') as content",
+    "chunk_order_index": "chunk_order_index",
+    "full_doc_id": "full_doc_id",
+    "file_path": "file_path",
 }
 
 
@@ -2297,15 +2702,32 @@ SQL_TEMPLATES = {
                                   chunk_order_index, full_doc_id, file_path
                                    FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND id IN ({ids})
                                 """,
+    "get_fields_by_ids_text_chunks": """SELECT id, {columns}
+                                FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND id = ANY($2::varchar[])
+                            """,
     "get_by_ids_llm_response_cache": """SELECT id, original_prompt, COALESCE(return_value, '') as "return", mode
                                  FROM LIGHTRAG_LLM_CACHE WHERE workspace=$1 AND mode= IN ({ids})
                                 """,
+    "get_by_id_doc_index": """SELECT id, chunk_ids, entities, relations
+                                FROM LIGHTRAG_DOC_INDEX WHERE workspace=$1 AND id=$2
+                            """,
+    "get_by_ids_doc_index": """SELECT id, chunk_ids, entities, relations
+                                 FROM LIGHTRAG_DOC_INDEX WHERE workspace=$1 AND id IN ({ids})
+                            """,
     "filter_keys": "SELECT id FROM {table_name} WHERE workspace=$1 AND id IN ({ids})",
     "upsert_doc_full": """INSERT INTO LIGHTRAG_DOC_FULL (id, content, workspace)
                         VALUES ($1, $2, $3)
                         ON CONFLICT (workspace,id) DO UPDATE
                            SET content = $2, update_time = CURRENT_TIMESTAMP
                        """,
+    "upsert_doc_index": """INSERT INTO LIGHTRAG_DOC_INDEX (workspace, id, chunk_ids, entities, relations)
+                        VALUES ($1, $2, $3::jsonb, $4::jsonb, $5::jsonb)
+                        ON CONFLICT (workspace,id) DO UPDATE
+                           SET chunk_ids = EXCLUDED.chunk_ids,
+                           entities = EXCLUDED.entities,
+                           relations = EXCLUDED.relations,
+                           update_time = CURRENT_TIMESTAMP
+                       """,
     "upsert_llm_response_cache": """INSERT INTO LIGHTRAG_LLM_CACHE(workspace,id,original_prompt,return_value,mode)
                                       VALUES ($1, $2, $3, $4, $5)
                                       ON CONFLICT (workspace,mode,id) DO UPDATE
@@ -2351,56 +2773,56 @@ SQL_TEMPLATES = {
                       file_path=EXCLUDED.file_path,
                       update_time = EXCLUDED.update_time
                      """,
+    # Vector search: ORDER BY the distance operator itself so HNSW/IVFFlat indexes are used,
+    # cosine distance < $3 is the same as cosine similarity > threshold
     "relationships": """
-    WITH relevant_chunks AS (
-        SELECT id as chunk_id
-        FROM LIGHTRAG_DOC_CHUNKS
-        WHERE $2::varchar[] IS NULL OR full_doc_id = ANY($2::varchar[])
-    )
-    SELECT source_id as src_id, target_id as tgt_id, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at
-    FROM (
-        SELECT r.id, r.source_id, r.target_id, r.create_time, 1 - (r.content_vector <=> '[{embedding_string}]'::vector) as distance
-        FROM LIGHTRAG_VDB_RELATION r
-        JOIN relevant_chunks c ON c.chunk_id = ANY(r.chunk_ids)
-        WHERE r.workspace=$1
-    ) filtered
-    WHERE distance>$3
-    ORDER BY distance DESC
-    LIMIT $4
+        SELECT source_id as src_id, target_id as tgt_id, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at
+        FROM LIGHTRAG_VDB_RELATION
+        WHERE workspace=$1 AND content_vector <=> $2::vector < $3
+        ORDER BY content_vector <=> $2::vector
+        LIMIT $4
+    """,
+    "relationships_by_doc_ids": """
+        SELECT source_id as src_id, target_id as tgt_id, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at
+        FROM LIGHTRAG_VDB_RELATION
+        WHERE workspace=$1 AND content_vector <=> $2::vector < $3
+        AND chunk_ids && ARRAY(
+            SELECT id FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND full_doc_id = ANY($5::varchar[])
+        )::varchar[]
+        ORDER BY content_vector <=> $2::vector
+        LIMIT $4
     """,
     "entities": """
-        WITH relevant_chunks AS (
-            SELECT id as chunk_id
-            FROM LIGHTRAG_DOC_CHUNKS
-            WHERE $2::varchar[] IS NULL OR full_doc_id = ANY($2::varchar[])
-        )
-        SELECT entity_name, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at FROM
-            (
-                SELECT e.id, e.entity_name, e.create_time, 1 - (e.content_vector <=> '[{embedding_string}]'::vector) as distance
-                FROM LIGHTRAG_VDB_ENTITY e
-                JOIN relevant_chunks c ON c.chunk_id = ANY(e.chunk_ids)
-                WHERE e.workspace=$1
-            ) as chunk_distances
-            WHERE distance>$3
-            ORDER BY distance DESC
-            LIMIT $4
+        SELECT entity_name, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at
+        FROM LIGHTRAG_VDB_ENTITY
+        WHERE workspace=$1 AND content_vector <=> $2::vector < $3
+        ORDER BY content_vector <=> $2::vector
+        LIMIT $4
+    """,
+    "entities_by_doc_ids": """
+        SELECT entity_name, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at
+        FROM LIGHTRAG_VDB_ENTITY
+        WHERE workspace=$1 AND content_vector <=> $2::vector < $3
+        AND chunk_ids && ARRAY(
+            SELECT id FROM LIGHTRAG_DOC_CHUNKS WHERE workspace=$1 AND full_doc_id = ANY($5::varchar[])
+        )::varchar[]
+        ORDER BY content_vector <=> $2::vector
+        LIMIT $4
     """,
     "chunks": """
-        WITH relevant_chunks AS (
-            SELECT id as chunk_id
-            FROM LIGHTRAG_DOC_CHUNKS
-            WHERE $2::varchar[] IS NULL OR full_doc_id = ANY($2::varchar[])
-        )
-        SELECT id, content, file_path, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at FROM
-            (
-                SELECT id, content, file_path, create_time, 1 - (content_vector <=> '[{embedding_string}]'::vector) as distance
-                FROM LIGHTRAG_DOC_CHUNKS
-                WHERE workspace=$1
-                AND id IN (SELECT chunk_id FROM relevant_chunks)
-            ) as chunk_distances
-            WHERE distance>$3
-            ORDER BY distance DESC
-            LIMIT $4
+        SELECT id, content, file_path, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at
+        FROM LIGHTRAG_DOC_CHUNKS
+        WHERE workspace=$1 AND content_vector <=> $2::vector < $3
+        ORDER BY content_vector <=> $2::vector
+        LIMIT $4
+    """,
+    "chunks_by_doc_ids": """
+        SELECT id, content, file_path, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at
+        FROM LIGHTRAG_DOC_CHUNKS
+        WHERE workspace=$1 AND content_vector <=> $2::vector < $3
+        AND full_doc_id = ANY($5::varchar[])
+        ORDER BY content_vector <=> $2::vector
+        LIMIT $4
     """,
     # DROP tables
     "drop_specifiy_table_workspace": """
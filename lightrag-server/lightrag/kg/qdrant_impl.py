@@ -15,11 +15,17 @@ from ..utils import logger
 if not pm.is_installed("qdrant-client"):
     pm.install("qdrant-client")
 
-from qdrant_client import QdrantClient, models  # type: ignore
+from qdrant_client import AsyncQdrantClient, models  # type: ignore
 
 config = configparser.ConfigParser()
 config.read("config.ini", "utf-8")
 
+# Points sent per upsert request
+UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", 256))
+
+# Never the id of a stored point, see _write_barrier()
+_BARRIER_POINT_ID = "00000000-0000-0000-0000-000000000000"
+
 
 def compute_mdhash_id_for_qdrant(content: str, prefix: str = "", style: str = "simple") -> str:
     """
@@ -51,10 +57,10 @@ def compute_mdhash_id_for_qdrant(content: str, prefix: str = "", style: str = "s
 @dataclass
 class QdrantVectorDBStorage(BaseVectorStorage):
     @staticmethod
-    def create_collection_if_not_exist(client: QdrantClient, collection_name: str, **kwargs):
-        if client.collection_exists(collection_name):
+    async def create_collection_if_not_exist(client: AsyncQdrantClient, collection_name: str, **kwargs):
+        if await client.collection_exists(collection_name):
             return
-        client.create_collection(collection_name, **kwargs)
+        await client.create_collection(collection_name, **kwargs)
 
     def __post_init__(self):
         kwargs = self.global_config.get("vector_db_storage_cls_kwargs", {})
@@ -63,17 +69,43 @@ class QdrantVectorDBStorage(BaseVectorStorage):
             raise ValueError("cosine_better_than_threshold must be specified in vector_db_storage_cls_kwargs")
         self.cosine_better_than_threshold = cosine_threshold
 
-        self._client = QdrantClient(
+        # The async client keeps searches and upserts from blocking the event loop
+        self._client = AsyncQdrantClient(
             url=os.environ.get("QDRANT_URL", config.get("qdrant", "uri", fallback=None)),
             api_key=os.environ.get("QDRANT_API_KEY", config.get("qdrant", "apikey", fallback=None)),
         )
         self._max_batch_size = self.global_config["embedding_batch_num"]
-        QdrantVectorDBStorage.create_collection_if_not_exist(
+        # Set while upserts sent with wait=False may not be applied yet
+        self._unconfirmed_writes = False
+
+    async def initialize(self):
+        await QdrantVectorDBStorage.create_collection_if_not_exist(
             self._client,
             self.namespace,
             vectors_config=models.VectorParams(size=self.embedding_func.embedding_dim, distance=models.Distance.COSINE),
         )
 
+    async def finalize(self):
+        await self._write_barrier()
+        await self._client.close()
+
+    async def _write_barrier(self) -> None:
+        """Wait until the upserts sent with wait=False are applied
+
+        Qdrant applies the updates of a shard in order, so a delete matching nothing that
+        is sent to every shard with wait=True returns once all earlier upserts are visible.
+        """
+        if not self._unconfirmed_writes:
+            return
+        await self._client.delete(
+            collection_name=self.namespace,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(must=[models.HasIdCondition(has_id=[_BARRIER_POINT_ID])])
+            ),
+            wait=True,
+        )
+        self._unconfirmed_writes = False
+
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
         logger.info(f"Inserting {len(data)} to {self.namespace}")
         if not data:
@@ -109,12 +141,22 @@ class QdrantVectorDBStorage(BaseVectorStorage):
                 )
             )
 
-        results = self._client.upsert(collection_name=self.namespace, points=list_points, wait=True)
-        return results
+        # Batches are queued without waiting for them to be applied, index_done_callback waits
+        self._unconfirmed_writes = True
+        await asyncio.gather(
+            *[
+                self._client.upsert(
+                    collection_name=self.namespace,
+                    points=list_points[i : i + UPSERT_BATCH_SIZE],
+                    wait=False,
+                )
+                for i in range(0, len(list_points), UPSERT_BATCH_SIZE)
+            ]
+        )
 
     async def query(self, query: str, top_k: int, ids: list[str] | None = None) -> list[dict[str, Any]]:
         embedding = await self.embedding_func([query], _priority=5)  # higher priority for query
-        results = self._client.search(
+        results = await self._client.search(
             collection_name=self.namespace,
             query_vector=embedding[0],
             limit=top_k,
@@ -134,8 +176,8 @@ class QdrantVectorDBStorage(BaseVectorStorage):
         ]
 
     async def index_done_callback(self) -> None:
-        # Qdrant handles persistence automatically
-        pass
+        # Qdrant handles persistence automatically, only make the queued upserts visible
+        await self._write_barrier()
 
     async def delete(self, ids: List[str]) -> None:
         """Delete vectors with specified IDs
@@ -147,7 +189,7 @@ class QdrantVectorDBStorage(BaseVectorStorage):
             # Convert regular ids to Qdrant compatible ids
             qdrant_ids = [compute_mdhash_id_for_qdrant(id) for id in ids]
             # Delete points from the collection
-            self._client.delete(
+            await self._client.delete(
                 collection_name=self.namespace,
                 points_selector=models.PointIdsList(
                     points=qdrant_ids,
@@ -170,7 +212,7 @@ class QdrantVectorDBStorage(BaseVectorStorage):
             logger.debug(f"Attempting to delete entity {entity_name} with ID {entity_id}")
 
             # Delete the entity point from the collection
-            self._client.delete(
+            await self._client.delete(
                 collection_name=self.namespace,
                 points_selector=models.PointIdsList(
                     points=[entity_id],
@@ -189,7 +231,7 @@ class QdrantVectorDBStorage(BaseVectorStorage):
         """
         try:
             # Find relations where the entity is either source or target
-            results = self._client.scroll(
+            results = await self._client.scroll(
                 collection_name=self.namespace,
                 scroll_filter=models.Filter(
                     should=[
@@ -207,7 +249,7 @@ class QdrantVectorDBStorage(BaseVectorStorage):
 
             if ids_to_delete:
                 # Delete the relations
-                self._client.delete(
+                await self._client.delete(
                     collection_name=self.namespace,
                     points_selector=models.PointIdsList(
                         points=ids_to_delete,
@@ -234,7 +276,7 @@ class QdrantVectorDBStorage(BaseVectorStorage):
             qdrant_id = compute_mdhash_id_for_qdrant(id)
 
             # Retrieve the point by ID
-            result = self._client.retrieve(
+            result = await self._client.retrieve(
                 collection_name=self.namespace,
                 ids=[qdrant_id],
                 with_payload=True,
@@ -270,7 +312,7 @@ class QdrantVectorDBStorage(BaseVectorStorage):
             qdrant_ids = [compute_mdhash_id_for_qdrant(id) for id in ids]
 
             # Retrieve the points by IDs
-            results = self._client.retrieve(
+            results = await self._client.retrieve(
                 collection_name=self.namespace,
                 ids=qdrant_ids,
                 with_payload=True,
@@ -301,11 +343,13 @@ class QdrantVectorDBStorage(BaseVectorStorage):
         """
         try:
             # Delete the collection and recreate it
-            if self._client.collection_exists(self.namespace):
-                self._client.delete_collection(self.namespace)
+            if await self._client.collection_exists(self.namespace):
+                await self._client.delete_collection(self.namespace)
+
+            self._unconfirmed_writes = False
 
             # Recreate the collection
-            QdrantVectorDBStorage.create_collection_if_not_exist(
+            await QdrantVectorDBStorage.create_collection_if_not_exist(
                 self._client,
                 self.namespace,
                 vectors_config=models.VectorParams(
@@ -0,0 +1,215 @@
+"""
+Worker-local replicas of storage namespaces for multi-worker mode.
+
+Keeping the JSON KV namespaces in Manager dict proxies turned every read into a pickled
+IPC call to the manager process, and the NetworkX graph had to be reparsed from disk
+whenever another worker saved it. Instead each worker keeps a local replica and catches
+up with the writes of other workers by replaying a shared change log:
+
+- Writers hold the storage lock of the namespace, so there is a single writer at a time.
+  A write appends one frame to the change log in the data plane directory (tmpfs when
+  available), publishes the new log size and then bumps the namespace generation, both
+  counters living in shared memory.
+- A reader whose generation matches the shared one reads its replica without any lock
+  or IPC. Otherwise it replays only the frames appended since its last sync.
+- Once the log outgrows KV_PLANE_COMPACT_BYTES and twice its last snapshot, the writer
+  replaces it with a snapshot of the replica and bumps the log epoch, which makes the
+  other workers rebuild their replica from the new log.
+
+In single process mode there is one replica per namespace shared by all its storages and
+no log at all.
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import struct
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Iterable, TypeVar
+
+from lightrag.constants import DEFAULT_KV_PLANE_COMPACT_BYTES
+from lightrag.utils import logger
+
+from .shared_storage import (
+    NamespaceGeneration,
+    get_data_plane_dir,
+    get_namespace_data,
+    get_namespace_generation,
+)
+
+COMPACT_MIN_BYTES = int(os.getenv("KV_PLANE_COMPACT_BYTES", DEFAULT_KV_PLANE_COMPACT_BYTES))
+
+_FRAME_HEADER = struct.Struct("<Q")
+
+# namespace -> replica of this process
+_planes: dict[str, "SharedChangeLog"] = {}
+
+PlaneT = TypeVar("PlaneT", bound="SharedChangeLog")
+
+
+class SharedChangeLog(ABC):
+    """Replica of one namespace kept current through the change log, see the module docstring
+
+    Subclasses hold the replicated state and define how frames are applied. Every method
+    must be called with the storage lock of the namespace held, except is_current() which
+    only reads shared memory.
+    """
+
+    def __init__(self, namespace: str, generation: NamespaceGeneration, log_file: str | None):
+        self.namespace = namespace
+        self._generation = generation
+        self._log_file = log_file
+        # Position of this replica in the shared history
+        self._synced_generation = generation.generation if log_file is None else 0
+        self._epoch = 0
+        self._offset = 0
+
+    @abstractmethod
+    def _apply_payload(self, payload: bytes, snapshot: bool) -> None:
+        """Apply one frame, snapshot is set for the frame a compacted log starts with"""
+
+    @abstractmethod
+    def _snapshot_payload(self) -> bytes:
+        """Encode the whole replica as the first frame of a compacted log"""
+
+    @property
+    def version(self) -> int:
+        """Generation of the data held by this replica, for caches derived from it"""
+        return self._generation.generation if self._log_file is None else self._synced_generation
+
+    def is_current(self) -> bool:
+        return self._log_file is None or self._synced_generation == self._generation.generation
+
+    def sync(self) -> None:
+        """Apply the changes committed by other workers since the last sync"""
+        generation = self._generation.generation
+        if self._log_file is None or generation == self._synced_generation:
+            return
+
+        epoch, end = self._generation.log_epoch, self._generation.log_offset
+        if epoch != self._epoch:
+            # The log was compacted, the replica is rebuilt from the snapshot it starts with
+            self._epoch, self._offset = epoch, 0
+        if end > self._offset:
+            with open(self._log_file, "rb") as f:
+                f.seek(self._offset)
+                buffer = f.read(end - self._offset)
+            self._apply_frames(buffer)
+        self._synced_generation = generation
+
+    def _apply_frames(self, buffer: bytes) -> None:
+        position = 0
+        while position < len(buffer):
+            (size,) = _FRAME_HEADER.unpack_from(buffer, position)
+            start = position + _FRAME_HEADER.size
+            self._apply_payload(buffer[start : start + size], snapshot=self._offset == 0)
+            position = start + size
+            self._offset += _FRAME_HEADER.size + size
+
+    def _publish(self, payload: Callable[[], bytes]) -> None:
+        """Append a frame for a change already applied to the replica after sync()"""
+        if self._log_file is not None:
+            if self._offset > max(COMPACT_MIN_BYTES, 2 * self._generation.log_base):
+                self._write_snapshot()
+            else:
+                data = payload()
+                with open(self._log_file, "ab") as f:
+                    f.write(_FRAME_HEADER.pack(len(data)) + data)
+                    self._offset = f.tell()
+                self._generation.log_offset = self._offset
+        self._synced_generation = self._generation.bump()
+
+    def reset(self) -> None:
+        """Publish the replica as a whole, used after loading from disk or clearing"""
+        if self._log_file is not None:
+            self._write_snapshot()
+        self._synced_generation = self._generation.bump()
+
+    def _write_snapshot(self) -> None:
+        data = self._snapshot_payload()
+        tmp_file = f"{self._log_file}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(_FRAME_HEADER.pack(len(data)) + data)
+            size = f.tell()
+        os.replace(tmp_file, self._log_file)
+        self._epoch = self._generation.log_epoch + 1
+        self._offset = size
+        self._generation.log_base = size
+        self._generation.log_offset = size
+        self._generation.log_epoch = self._epoch
+        logger.debug(f"Process {os.getpid()} data plane snapshot of {self.namespace} ({size} bytes)")
+
+
+class SharedKVPlane(SharedChangeLog):
+    """Replica of a key-value namespace
+
+    A frame holds whole-record upserts, deletes and entries merged into dict records. The
+    latter keep LLM cache writes small, the cache stores all entries of a mode in one record.
+    """
+
+    def __init__(self, namespace: str, generation: NamespaceGeneration, log_file: str | None, data: dict[str, Any]):
+        super().__init__(namespace, generation, log_file)
+        self.data = data
+
+    def _apply_payload(self, payload: bytes, snapshot: bool) -> None:
+        upserts, deletes, entries = pickle.loads(payload)
+        if snapshot:
+            self.data.clear()
+        self.data.update(upserts)
+        for key in deletes:
+            self.data.pop(key, None)
+        for key, values in entries.items():
+            record = self.data.get(key)
+            if record is None:
+                record = self.data[key] = {}
+            record.update(values)
+
+    def _snapshot_payload(self) -> bytes:
+        return pickle.dumps((self.data, [], {}), protocol=pickle.HIGHEST_PROTOCOL)
+
+    def commit(
+        self,
+        upserts: dict[str, Any] | None = None,
+        deletes: Iterable[str] = (),
+        entries: dict[str, dict[str, Any]] | None = None,
+    ) -> None:
+        """Publish a change that was already applied to self.data after sync()
+
+        entries maps a key to the items that were merged into its dict record.
+        """
+        self._publish(
+            lambda: pickle.dumps(
+                (upserts or {}, list(deletes), entries or {}),
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        )
+
+
+async def get_plane(
+    namespace: str, factory: Callable[[NamespaceGeneration, str | None], Awaitable[PlaneT]]
+) -> PlaneT:
+    """Return the replica of a namespace for the current process
+
+    factory(generation, log_file) creates it on first use, log_file is None in single
+    process mode.
+    """
+    generation = await get_namespace_generation(namespace)
+    plane = _planes.get(namespace)
+    # Shared data is re-created after finalize_share_data(), and so are the generations
+    if plane is None or plane._generation is not generation:
+        data_plane_dir = get_data_plane_dir()
+        log_file = os.path.join(data_plane_dir, f"{namespace}.log") if data_plane_dir else None
+        plane = _planes[namespace] = await factory(generation, log_file)
+    return plane
+
+
+async def get_kv_plane(namespace: str) -> SharedKVPlane:
+    """Return the replica of a key-value namespace for the current process"""
+
+    async def factory(generation: NamespaceGeneration, log_file: str | None) -> SharedKVPlane:
+        # Without a log the namespace data itself is the replica shared by all storages
+        data = await get_namespace_data(namespace) if log_file is None else {}
+        return SharedKVPlane(namespace, generation, log_file, data)
+
+    return await get_plane(namespace, factory)
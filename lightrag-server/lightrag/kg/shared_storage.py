@@ -1,9 +1,20 @@
 import asyncio
+import multiprocessing
 import os
+import shutil
 import sys
+import tempfile
+import time
+import zlib
 from multiprocessing import Manager
 from multiprocessing.synchronize import Lock as ProcessLock
-from typing import Any, Dict, Generic, Optional, TypeVar, Union
+from typing import Any, Dict, Generic, Iterable, List, Optional, TypeVar, Union
+
+from lightrag.constants import (
+    DEFAULT_GRAPH_DB_LOCK_STRIPES,
+    DEFAULT_MAX_SHARED_NAMESPACES,
+    DEFAULT_STORAGE_LOCK_STRIPES,
+)
 
 
 # Define a direct print function for critical logs that must be visible in all processes
@@ -32,7 +43,15 @@ _initialized = None
 # shared data for storage across processes
 _shared_dicts: Optional[Dict[str, Any]] = None
 _init_flags: Optional[Dict[str, bool]] = None  # namespace -> initialized
-_update_flags: Optional[Dict[str, bool]] = None  # namespace -> updated
+_update_flags: Optional[Dict[str, list]] = None  # namespace -> update flags of this process
+
+# generation counters in shared memory, see get_namespace_generation()
+_generation_counters: Optional[Any] = None  # RawArray in multiprocess mode, list otherwise
+_generation_slots: Optional[Dict[str, int]] = None  # namespace -> first counter index
+_local_generations: Dict[str, "NamespaceGeneration"] = {}  # per process cache of the above
+# directory (tmpfs when available) for the change logs of the KV data plane
+_data_plane_dir: Optional[str] = None
+_data_plane_owner: Optional[int] = None  # pid that created the directory and removes it
 
 # locks for mutex access
 _storage_lock: Optional[LockType] = None
@@ -44,6 +63,62 @@ _data_init_lock: Optional[LockType] = None
 # async locks for coroutine synchronization in multiprocess mode
 _async_locks: Optional[Dict[str, asyncio.Lock]] = None
 
+# striped locks for per-entity / per-relation graph access, see get_graph_db_lock(keys=...)
+_graph_key_locks: Optional[List[LockType]] = None
+_graph_key_async_locks: Optional[List[asyncio.Lock]] = None
+
+# striped locks for per-namespace storage access, see get_storage_lock(namespace=...)
+_storage_locks: Optional[List[LockType]] = None
+_storage_async_locks: Optional[List[asyncio.Lock]] = None
+
+# lock wait time histograms of this process, lock name -> stats
+_LOCK_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+_lock_wait_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def _record_lock_wait(name: str, seconds: float) -> None:
+    stats = _lock_wait_stats.get(name)
+    if stats is None:
+        stats = _lock_wait_stats[name] = {
+            "count": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+            "buckets": [0] * (len(_LOCK_WAIT_BUCKETS) + 1),
+        }
+    stats["count"] += 1
+    stats["total_seconds"] += seconds
+    stats["max_seconds"] = max(stats["max_seconds"], seconds)
+    for index, bound in enumerate(_LOCK_WAIT_BUCKETS):
+        if seconds <= bound:
+            break
+    else:
+        index = len(_LOCK_WAIT_BUCKETS)
+    stats["buckets"][index] += 1
+
+
+def get_lock_wait_stats() -> Dict[str, Dict[str, Any]]:
+    """Lock wait time histograms of the current process
+
+    Returns:
+        Per lock name: acquisition count, total and max wait seconds, and a histogram whose
+        keys are bucket upper bounds in seconds ("+Inf" for the overflow bucket)
+    """
+    labels = [str(bound) for bound in _LOCK_WAIT_BUCKETS] + ["+Inf"]
+    return {
+        name: {
+            "count": stats["count"],
+            "total_seconds": round(stats["total_seconds"], 6),
+            "max_seconds": round(stats["max_seconds"], 6),
+            "buckets": dict(zip(labels, stats["buckets"])),
+        }
+        for name, stats in _lock_wait_stats.items()
+    }
+
+
+def _stripe_of(key: str, stripes: int) -> int:
+    # crc32 instead of hash(), which is randomized per process
+    return zlib.crc32(key.encode("utf-8")) % stripes
+
 
 class UnifiedLock(Generic[T]):
     """Provide a unified lock interface type for asyncio.Lock and multiprocessing.Lock"""
@@ -55,6 +130,7 @@ class UnifiedLock(Generic[T]):
         name: str = "unnamed",
         enable_logging: bool = True,
         async_lock: Optional[asyncio.Lock] = None,
+        stats_name: Optional[str] = None,
     ):
         self._lock = lock
         self._is_async = is_async
@@ -62,8 +138,18 @@ class UnifiedLock(Generic[T]):
         self._name = name  # for debug only
         self._enable_logging = enable_logging  # for debug only
         self._async_lock = async_lock  # auxiliary lock for coroutine synchronization
+        self._stats_name = stats_name or name  # stripes of one lock family share a histogram
+
+    async def _acquire_process_lock(self) -> None:
+        """Poll the process lock, a blocking acquire would stall the event loop"""
+        delay = 0.0005
+        while not self._lock.acquire(block=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
 
     async def __aenter__(self) -> "UnifiedLock[T]":
+        wait_start = time.perf_counter()
+        async_lock_acquired = False
         try:
             # direct_log(
             #     f"== Lock == Process {self._pid}: Acquiring lock '{self._name}' (async={self._is_async})",
@@ -77,6 +163,7 @@ class UnifiedLock(Generic[T]):
                 #     enable_output=self._enable_logging,
                 # )
                 await self._async_lock.acquire()
+                async_lock_acquired = True
                 direct_log(
                     f"== Lock == Process {self._pid}: Async lock for '{self._name}' acquired",
                     enable_output=self._enable_logging,
@@ -86,16 +173,17 @@ class UnifiedLock(Generic[T]):
             if self._is_async:
                 await self._lock.acquire()
             else:
-                self._lock.acquire()
+                await self._acquire_process_lock()
 
+            _record_lock_wait(self._stats_name, time.perf_counter() - wait_start)
             direct_log(
                 f"== Lock == Process {self._pid}: Lock '{self._name}' acquired (async={self._is_async})",
                 enable_output=self._enable_logging,
             )
             return self
-        except Exception as e:
-            # If main lock acquisition fails, release the async lock if it was acquired
-            if not self._is_async and self._async_lock is not None and self._async_lock.locked():
+        except BaseException as e:
+            # If main lock acquisition fails or is cancelled, release the async lock if it was acquired
+            if async_lock_acquired:
                 self._async_lock.release()
 
             direct_log(
@@ -166,7 +254,9 @@ class UnifiedLock(Generic[T]):
                 f"== Lock == Process {self._pid}: Acquiring lock '{self._name}' (sync)",
                 enable_output=self._enable_logging,
             )
+            wait_start = time.perf_counter()
             self._lock.acquire()
+            _record_lock_wait(self._stats_name, time.perf_counter() - wait_start)
             direct_log(
                 f"== Lock == Process {self._pid}: Lock '{self._name}' acquired (sync)",
                 enable_output=self._enable_logging,
@@ -203,6 +293,36 @@ class UnifiedLock(Generic[T]):
             raise
 
 
+class KeyedUnifiedLock:
+    """Hold the lock stripes covering a set of keys
+
+    Keys are mapped to a fixed pool of stripes with a process independent hash, so all
+    workers agree on the stripe of a key. Stripes are acquired in ascending order, which
+    keeps concurrent holders of overlapping key sets from deadlocking.
+    """
+
+    def __init__(self, locks: List[UnifiedLock]):
+        self._locks = locks
+        self._acquired: List[UnifiedLock] = []
+
+    async def __aenter__(self) -> "KeyedUnifiedLock":
+        try:
+            for lock in self._locks:
+                await lock.__aenter__()
+                self._acquired.append(lock)
+        except BaseException:
+            await self._release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._release()
+
+    async def _release(self) -> None:
+        while self._acquired:
+            await self._acquired.pop().__aexit__(None, None, None)
+
+
 def get_internal_lock(enable_logging: bool = False) -> UnifiedLock:
     """return unified storage lock for data consistency"""
     async_lock = _async_locks.get("internal_lock") if _is_multiprocess else None
@@ -215,8 +335,22 @@ def get_internal_lock(enable_logging: bool = False) -> UnifiedLock:
     )
 
 
-def get_storage_lock(enable_logging: bool = False) -> UnifiedLock:
-    """return unified storage lock for data consistency"""
+def get_storage_lock(enable_logging: bool = False, namespace: Optional[str] = None) -> UnifiedLock:
+    """return unified storage lock for data consistency
+
+    With a namespace, only the lock stripe of that namespace is returned, so storages of
+    different namespaces do not contend.
+    """
+    if namespace is not None:
+        stripe = _stripe_of(namespace, len(_storage_locks))
+        return UnifiedLock(
+            lock=_storage_locks[stripe],
+            is_async=not _is_multiprocess,
+            name=f"storage_lock_{stripe}",
+            enable_logging=enable_logging,
+            async_lock=_storage_async_locks[stripe] if _is_multiprocess else None,
+            stats_name="storage_lock",
+        )
     async_lock = _async_locks.get("storage_lock") if _is_multiprocess else None
     return UnifiedLock(
         lock=_storage_lock,
@@ -239,8 +373,30 @@ def get_pipeline_status_lock(enable_logging: bool = False) -> UnifiedLock:
     )
 
 
-def get_graph_db_lock(enable_logging: bool = False) -> UnifiedLock:
-    """return unified graph database lock for ensuring atomic operations"""
+def get_graph_db_lock(
+    enable_logging: bool = False, keys: Optional[Iterable[str]] = None
+) -> Union[UnifiedLock, KeyedUnifiedLock]:
+    """return unified graph database lock for ensuring atomic operations
+
+    Without keys the global graph lock is returned. With keys (entity names, relation keys)
+    only the stripes covering those keys are locked, so merges of disjoint entity sets do not
+    contend. Code that needs both must take the keyed lock first.
+    """
+    if keys is not None:
+        stripes = sorted({_stripe_of(key, len(_graph_key_locks)) for key in keys})
+        return KeyedUnifiedLock(
+            [
+                UnifiedLock(
+                    lock=_graph_key_locks[stripe],
+                    is_async=not _is_multiprocess,
+                    name=f"graph_key_lock_{stripe}",
+                    enable_logging=enable_logging,
+                    async_lock=_graph_key_async_locks[stripe] if _is_multiprocess else None,
+                    stats_name="graph_key_lock",
+                )
+                for stripe in stripes
+            ]
+        )
     async_lock = _async_locks.get("graph_db_lock") if _is_multiprocess else None
     return UnifiedLock(
         lock=_graph_db_lock,
@@ -263,6 +419,64 @@ def get_data_init_lock(enable_logging: bool = False) -> UnifiedLock:
     )
 
 
+class NamespaceGeneration:
+    """Counters of a namespace kept in shared memory, read by every worker without IPC
+
+    generation: bumped on every committed change of the namespace
+    cleared: generation at which the update flags were last cleared
+    log_epoch, log_offset, log_base: state of the KV data plane change log
+    """
+
+    FIELDS = ("generation", "cleared", "log_epoch", "log_offset", "log_base")
+
+    def __init__(self, namespace: str, counters: Any, base: int):
+        self.namespace = namespace
+        self._counters = counters
+        self._base = base
+
+    def bump(self) -> int:
+        """Increment the generation, the caller must hold a lock serializing writers"""
+        self.generation += 1
+        return self.generation
+
+
+def _generation_field(index: int) -> property:
+    def getter(self: NamespaceGeneration) -> int:
+        return self._counters[self._base + index]
+
+    def setter(self: NamespaceGeneration, value: int) -> None:
+        self._counters[self._base + index] = value
+
+    return property(getter, setter)
+
+
+for _index, _field in enumerate(NamespaceGeneration.FIELDS):
+    setattr(NamespaceGeneration, _field, _generation_field(_index))
+
+
+class UpdateFlag:
+    """Per-worker view of a namespace generation with the interface of the former boolean flag
+
+    The flag is set while the namespace has a generation newer than both the one this
+    worker has caught up with and the one at which all flags were last cleared.
+    """
+
+    def __init__(self, generation: NamespaceGeneration):
+        self._generation = generation
+        self._seen = generation.generation
+
+    @property
+    def value(self) -> bool:
+        return self._generation.generation > max(self._seen, self._generation.cleared)
+
+    @value.setter
+    def value(self, updated: bool) -> None:
+        if updated:
+            self._seen = min(self._seen, self._generation.generation - 1)
+        else:
+            self._seen = self._generation.generation
+
+
 def initialize_share_data(workers: int = 1):
     """
     Initialize shared storage data for single or multi-process mode.
@@ -275,13 +489,14 @@ def initialize_share_data(workers: int = 1):
 
     The function determines whether to use cross-process shared variables for data storage
     based on the number of workers. If workers=1, it uses thread locks and local dictionaries.
-    If workers>1, it uses process locks and shared dictionaries managed by multiprocessing.Manager.
+    If workers>1, it uses process locks living in shared memory (inherited by the forked
+    workers) and shared dictionaries managed by multiprocessing.Manager.
 
     Args:
         workers (int): Number of worker processes. If 1, single-process mode is used.
                       If > 1, multi-process mode with shared memory is used.
     """
-    global _manager, _workers, _is_multiprocess, _storage_lock, _internal_lock, _pipeline_status_lock, _graph_db_lock, _data_init_lock, _shared_dicts, _init_flags, _initialized, _update_flags, _async_locks
+    global _manager, _workers, _is_multiprocess, _storage_lock, _internal_lock, _pipeline_status_lock, _graph_db_lock, _data_init_lock, _shared_dicts, _init_flags, _initialized, _update_flags, _async_locks, _graph_key_locks, _graph_key_async_locks, _storage_locks, _storage_async_locks, _generation_counters, _generation_slots, _data_plane_dir, _data_plane_owner
 
     # Check if already initialized
     if _initialized:
@@ -289,18 +504,29 @@ def initialize_share_data(workers: int = 1):
         return
 
     _workers = workers
+    graph_key_stripes = max(1, int(os.getenv("GRAPH_DB_LOCK_STRIPES", DEFAULT_GRAPH_DB_LOCK_STRIPES)))
+    storage_stripes = max(1, int(os.getenv("STORAGE_LOCK_STRIPES", DEFAULT_STORAGE_LOCK_STRIPES)))
+    max_namespaces = max(1, int(os.getenv("MAX_SHARED_NAMESPACES", DEFAULT_MAX_SHARED_NAMESPACES)))
+    counter_count = max_namespaces * len(NamespaceGeneration.FIELDS)
+    _update_flags = {}
 
     if workers > 1:
         _is_multiprocess = True
         _manager = Manager()
-        _internal_lock = _manager.Lock()
-        _storage_lock = _manager.Lock()
-        _pipeline_status_lock = _manager.Lock()
-        _graph_db_lock = _manager.Lock()
-        _data_init_lock = _manager.Lock()
+        # Locks are semaphores in shared memory inherited by the forked workers,
+        # acquiring them needs no round trip to the Manager process
+        _internal_lock = multiprocessing.Lock()
+        _storage_lock = multiprocessing.Lock()
+        _pipeline_status_lock = multiprocessing.Lock()
+        _graph_db_lock = multiprocessing.Lock()
+        _data_init_lock = multiprocessing.Lock()
         _shared_dicts = _manager.dict()
         _init_flags = _manager.dict()
-        _update_flags = _manager.dict()
+        _generation_counters = multiprocessing.RawArray("q", counter_count)
+        _generation_slots = _manager.dict()
+        shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        _data_plane_dir = tempfile.mkdtemp(prefix="lightrag-data-plane-", dir=shm_dir)
+        _data_plane_owner = os.getpid()
 
         # Initialize async locks for multiprocess mode
         _async_locks = {
@@ -310,6 +536,10 @@ def initialize_share_data(workers: int = 1):
             "graph_db_lock": asyncio.Lock(),
             "data_init_lock": asyncio.Lock(),
         }
+        _graph_key_locks = [multiprocessing.Lock() for _ in range(graph_key_stripes)]
+        _graph_key_async_locks = [asyncio.Lock() for _ in range(graph_key_stripes)]
+        _storage_locks = [multiprocessing.Lock() for _ in range(storage_stripes)]
+        _storage_async_locks = [asyncio.Lock() for _ in range(storage_stripes)]
 
         direct_log(f"Process {os.getpid()} Shared-Data created for Multiple Process (workers={workers})")
     else:
@@ -321,8 +551,14 @@ def initialize_share_data(workers: int = 1):
         _data_init_lock = asyncio.Lock()
         _shared_dicts = {}
         _init_flags = {}
-        _update_flags = {}
+        _generation_counters = [0] * counter_count
+        _generation_slots = {}
+        _data_plane_dir = None
         _async_locks = None  # No need for async locks in single process mode
+        _graph_key_locks = [asyncio.Lock() for _ in range(graph_key_stripes)]
+        _graph_key_async_locks = None
+        _storage_locks = [asyncio.Lock() for _ in range(storage_stripes)]
+        _storage_async_locks = None
         direct_log(f"Process {os.getpid()} Shared-Data created for Single Process")
 
     # Mark as initialized
@@ -360,87 +596,82 @@ async def initialize_pipeline_status():
         direct_log(f"Process {os.getpid()} Pipeline namespace initialized")
 
 
+async def get_namespace_generation(namespace: str) -> NamespaceGeneration:
+    """Return the shared generation counters of a namespace, allocating them on first use"""
+    if _generation_slots is None:
+        raise ValueError("Try to create namespace before Shared-Data is initialized")
+
+    generation = _local_generations.get(namespace)
+    if generation is not None:
+        return generation
+
+    async with get_internal_lock():
+        base = _generation_slots.get(namespace)
+        if base is None:
+            base = len(_generation_slots) * len(NamespaceGeneration.FIELDS)
+            if base >= len(_generation_counters):
+                raise ValueError(
+                    f"No generation counters left for namespace {namespace}, increase MAX_SHARED_NAMESPACES"
+                )
+            _generation_slots[namespace] = base
+    generation = _local_generations[namespace] = NamespaceGeneration(namespace, _generation_counters, base)
+    return generation
+
+
+def get_data_plane_dir() -> Optional[str]:
+    """Directory for the KV data plane change logs, None in single process mode"""
+    return _data_plane_dir
+
+
 async def get_update_flag(namespace: str):
     """
     Create a namespace's update flag for a workers.
     Returen the update flag to caller for referencing or reset.
+
+    The flag is backed by the namespace generation in shared memory, reading it needs no IPC.
     """
     global _update_flags
     if _update_flags is None:
         raise ValueError("Try to create namespace before Shared-Data is initialized")
 
-    async with get_internal_lock():
-        if namespace not in _update_flags:
-            if _is_multiprocess and _manager is not None:
-                _update_flags[namespace] = _manager.list()
-            else:
-                _update_flags[namespace] = []
-            direct_log(f"Process {os.getpid()} initialized updated flags for namespace: [{namespace}]")
-
-        if _is_multiprocess and _manager is not None:
-            new_update_flag = _manager.Value("b", False)
-        else:
-            # Create a simple mutable object to store boolean value for compatibility with mutiprocess
-            class MutableBoolean:
-                def __init__(self, initial_value=False):
-                    self.value = initial_value
-
-            new_update_flag = MutableBoolean(False)
-
-        _update_flags[namespace].append(new_update_flag)
-        return new_update_flag
+    new_update_flag = UpdateFlag(await get_namespace_generation(namespace))
+    _update_flags.setdefault(namespace, []).append(new_update_flag)
+    return new_update_flag
 
 
 async def set_all_update_flags(namespace: str):
     """Set all update flag of namespace indicating all workers need to reload data from files"""
-    global _update_flags
     if _update_flags is None:
         raise ValueError("Try to create namespace before Shared-Data is initialized")
 
+    generation = await get_namespace_generation(namespace)
     async with get_internal_lock():
-        if namespace not in _update_flags:
-            raise ValueError(f"Namespace {namespace} not found in update flags")
-        # Update flags for both modes
-        for i in range(len(_update_flags[namespace])):
-            _update_flags[namespace][i].value = True
+        generation.bump()
 
 
 async def clear_all_update_flags(namespace: str):
     """Clear all update flag of namespace indicating all workers need to reload data from files"""
-    global _update_flags
     if _update_flags is None:
         raise ValueError("Try to create namespace before Shared-Data is initialized")
 
+    generation = await get_namespace_generation(namespace)
     async with get_internal_lock():
-        if namespace not in _update_flags:
-            raise ValueError(f"Namespace {namespace} not found in update flags")
-        # Update flags for both modes
-        for i in range(len(_update_flags[namespace])):
-            _update_flags[namespace][i].value = False
+        generation.cleared = generation.generation
 
 
 async def get_all_update_flags_status() -> Dict[str, list]:
     """
     Get update flags status for all namespaces.
 
+    Only the flags of the current worker are visible, other workers keep their own.
+
     Returns:
         Dict[str, list]: A dictionary mapping namespace names to lists of update flag statuses
     """
     if _update_flags is None:
         return {}
 
-    result = {}
-    async with get_internal_lock():
-        for namespace, flags in _update_flags.items():
-            worker_statuses = []
-            for flag in flags:
-                if _is_multiprocess:
-                    worker_statuses.append(flag.value)
-                else:
-                    worker_statuses.append(flag)
-            result[namespace] = worker_statuses
-
-    return result
+    return {namespace: [flag.value for flag in flags] for namespace, flags in _update_flags.items()}
 
 
 async def try_initialize_namespace(namespace: str) -> bool:
@@ -492,7 +723,7 @@ def finalize_share_data():
     In multi-process mode, it shuts down the Manager and releases all shared objects.
     In single-process mode, it simply resets the global variables.
     """
-    global _manager, _is_multiprocess, _storage_lock, _internal_lock, _pipeline_status_lock, _graph_db_lock, _data_init_lock, _shared_dicts, _init_flags, _initialized, _update_flags, _async_locks
+    global _manager, _is_multiprocess, _storage_lock, _internal_lock, _pipeline_status_lock, _graph_db_lock, _data_init_lock, _shared_dicts, _init_flags, _initialized, _update_flags, _async_locks, _graph_key_locks, _graph_key_async_locks, _storage_locks, _storage_async_locks, _generation_counters, _generation_slots, _data_plane_dir, _data_plane_owner
 
     # Check if already initialized
     if not _initialized:
@@ -516,20 +747,8 @@ def finalize_share_data():
                 _shared_dicts.clear()
             if _init_flags is not None:
                 _init_flags.clear()
-            if _update_flags is not None:
-                # Clear each namespace's update flags list and Value objects
-                try:
-                    for namespace in _update_flags:
-                        flags_list = _update_flags[namespace]
-                        if isinstance(flags_list, list):
-                            # Clear Value objects in the list
-                            for flag in flags_list:
-                                if hasattr(flag, "value"):  # Check if it's a Value object
-                                    flag.value = False
-                            flags_list.clear()
-                except Exception:
-                    pass  # Ignore any errors during update flags cleanup
-                _update_flags.clear()
+            if _generation_slots is not None:
+                _generation_slots.clear()
 
             # Shut down the Manager - this will automatically clean up all shared resources
             _manager.shutdown()
@@ -537,6 +756,10 @@ def finalize_share_data():
         except Exception as e:
             direct_log(f"Process {os.getpid()} Error shutting down Manager: {e}", level="ERROR")
 
+    # Only the process that created the data plane directory removes it, workers share it
+    if _data_plane_dir is not None and _data_plane_owner == os.getpid():
+        shutil.rmtree(_data_plane_dir, ignore_errors=True)
+
     # Reset global variables
     _manager = None
     _initialized = None
@@ -550,5 +773,14 @@ def finalize_share_data():
     _data_init_lock = None
     _update_flags = None
     _async_locks = None
+    _graph_key_locks = None
+    _graph_key_async_locks = None
+    _storage_locks = None
+    _storage_async_locks = None
+    _generation_counters = None
+    _generation_slots = None
+    _local_generations.clear()
+    _data_plane_dir = None
+    _data_plane_owner = None
 
     direct_log(f"Process {os.getpid()} storage data finalization complete")
@@ -224,6 +224,13 @@ class TiDBKVStorage(BaseKVStorage):
         SQL = SQL_TEMPLATES["get_by_ids_" + self.namespace].format(ids=",".join([f"'{id}'" for id in ids]))
         return await self.db.query(SQL, multirows=True)
 
+    async def get_fields_by_ids(self, ids: list[str], fields: list[str] | None = None) -> dict[str, dict[str, Any]]:
+        # Rows come back in table order and only for the ids found
+        if not ids:
+            return {}
+        rows = await self.get_by_ids(ids) or []
+        return {row["id"]: row if fields is None else {k: row[k] for k in fields if k in row} for row in rows}
+
     async def filter_keys(self, keys: set[str]) -> set[str]:
         SQL = SQL_TEMPLATES["filter_keys"].format(
             table_name=namespace_to_table_name(self.namespace),
@@ -3,17 +3,20 @@ from __future__ import annotations
 import asyncio
 import configparser
 import os
+import time
 import traceback
 import warnings
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import datetime, timezone
 from functools import partial
-from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Optional, cast, final
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Mapping, Optional, cast, final
 
 from dotenv import load_dotenv
 from lightrag.constants import DEFAULT_FORCE_LLM_SUMMARY_ON_MERGE, DEFAULT_MAX_TOKEN_SUMMARY
 from lightrag.kg import STORAGES, verify_storage_implementation
 from lightrag.kg.shared_storage import get_namespace_data, get_pipeline_status_lock
+from lightrag.llm.client_pool import client_registry
 from lightrag.utils import get_env_value
 
 from .base import (
@@ -37,9 +40,12 @@ from .operate import (
     query_with_keywords,
 )
 from .prompt import GRAPH_FIELD_SEP
-from .types import KnowledgeGraph
+from .types import KnowledgeGraph, KnowledgeGraphEdge, KnowledgeGraphMeta, KnowledgeGraphNode
 from .utils import (
+    DebouncedFlusher,
     EmbeddingFunc,
+    FairRequestScheduler,
+    MicroBatcher,
     TiktokenTokenizer,
     Tokenizer,
     always_get_an_event_loop,
@@ -100,6 +106,12 @@ class LightRAG:
     entity_extract_max_gleaning: int = field(default=1)
     """Maximum number of entity extraction attempts for ambiguous content."""
 
+    entity_extract_max_tokens_in_flight: int = field(default=get_env_value("MAX_EXTRACT_TOKENS_IN_FLIGHT", 0, int))
+    """Budget of estimated prompt tokens across all concurrent extraction requests, 0 for no budget."""
+
+    entity_extract_batch_tokens: int = field(default=get_env_value("EXTRACT_BATCH_TOKENS", 0, int))
+    """Token size of batched extraction requests packing several short chunks, 0 disables batching."""
+
     summary_to_max_tokens: int = field(default=get_env_value("MAX_TOKEN_SUMMARY", DEFAULT_MAX_TOKEN_SUMMARY, int))
 
     force_llm_summary_on_merge: int = field(
@@ -214,12 +226,30 @@ class LightRAG:
     enable_llm_cache_for_entity_extract: bool = field(default=True)
     """If True, enables caching for entity extraction steps to reduce LLM costs."""
 
+    chunk_fetch_batch_size: int = field(default=get_env_value("CHUNK_FETCH_BATCH_SIZE", 500, int))
+    """Maximum number of chunks fetched from the KV storage in one request when building a query context."""
+
+    chunk_cache_size: int = field(default=get_env_value("CHUNK_CACHE_SIZE", 0, int))
+    """Number of chunk records kept in memory in front of the KV storage for queries, 0 disables the cache."""
+
+    llm_cache_flush_interval: float = field(default=get_env_value("LLM_CACHE_FLUSH_INTERVAL", 5.0, float))
+    """Maximum seconds a query's LLM cache entries wait before the cache is persisted in the background."""
+
+    llm_cache_flush_max_pending: int = field(default=get_env_value("LLM_CACHE_FLUSH_MAX_PENDING", 64, int))
+    """Number of queries waiting to be persisted that triggers an LLM cache flush without waiting for the interval."""
+
     # Extensions
     # ---
 
     max_parallel_insert: int = field(default=int(os.getenv("MAX_PARALLEL_INSERT", 2)))
     """Maximum number of parallel insert operations."""
 
+    insert_flush_interval: float = field(default=get_env_value("INSERT_FLUSH_INTERVAL", 5.0, float))
+    """Maximum seconds a merged document waits before storages are flushed to disk."""
+
+    insert_flush_max_docs: int = field(default=get_env_value("INSERT_FLUSH_MAX_DOCS", 8, int))
+    """Number of merged documents that triggers a storage flush without waiting for the interval."""
+
     addon_params: dict[str, Any] = field(
         default_factory=lambda: {"language": get_env_value("SUMMARY_LANGUAGE", "English", str)}
     )
@@ -304,7 +334,7 @@ class LightRAG:
                 self.tokenizer = TiktokenTokenizer()
 
         # Fix global_config now
-        global_config = asdict(self)
+        global_config = self._get_global_config()
         _print_config = ",\n  ".join([f"{k} = {v}" for k, v in global_config.items()])
         logger.debug(f"LightRAG init with param:\n  {_print_config}\n")
 
@@ -330,7 +360,7 @@ class LightRAG:
 
         self.llm_response_cache: BaseKVStorage = self.key_string_value_json_storage_cls(  # type: ignore
             namespace=make_namespace(self.namespace_prefix, NameSpace.KV_STORE_LLM_RESPONSE_CACHE),
-            global_config=asdict(self),  # Add global_config to ensure cache works properly
+            global_config=self._get_global_config(),  # Add global_config to ensure cache works properly
             embedding_func=self.embedding_func,
         )
 
@@ -344,6 +374,11 @@ class LightRAG:
             namespace=make_namespace(self.namespace_prefix, NameSpace.KV_STORE_TEXT_CHUNKS),
             embedding_func=self.embedding_func,
         )
+        # Reverse index from document to its chunks, entities and relations, used for deletion
+        self.doc_index: BaseKVStorage = self.key_string_value_json_storage_cls(  # type: ignore
+            namespace=make_namespace(self.namespace_prefix, NameSpace.KV_STORE_DOC_INDEX),
+            embedding_func=self.embedding_func,
+        )
         self.chunk_entity_relation_graph: BaseGraphStorage = self.graph_storage_cls(  # type: ignore
             namespace=make_namespace(self.namespace_prefix, NameSpace.GRAPH_STORE_CHUNK_ENTITY_RELATION),
             embedding_func=self.embedding_func,
@@ -383,6 +418,22 @@ class LightRAG:
             )
         )
 
+        # Shared by all documents processed concurrently so extraction has one global LLM budget
+        self._extraction_scheduler = FairRequestScheduler(
+            self.llm_model_max_async, self.entity_extract_max_tokens_in_flight
+        )
+        self._extraction_batcher = (
+            MicroBatcher(self.entity_extract_batch_tokens) if self.entity_extract_batch_tokens > 0 else None
+        )
+
+        # Queries mark the LLM cache dirty, it is persisted in the background instead of after each query
+        self._llm_cache_flusher = DebouncedFlusher(
+            self.llm_response_cache.index_done_callback,
+            name=self.llm_response_cache.namespace,
+            max_wait=self.llm_cache_flush_interval,
+            max_pending=self.llm_cache_flush_max_pending,
+        )
+
         self._storages_status = StoragesStatus.CREATED
 
         if self.auto_manage_storages_states:
@@ -392,6 +443,26 @@ class LightRAG:
         if self.auto_manage_storages_states:
             self._run_async_safely(self.finalize_storages, "Storage Finalization")
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in _CONFIG_FIELD_NAMES:
+            # Rebuilt on next use so queries and inserts see the new value
+            self.__dict__["_global_config_snapshot"] = None
+
+    def _get_global_config(self) -> Mapping[str, Any]:
+        """Read-only snapshot of the configuration fields, handed to storages, queries and inserts
+
+        It replaces asdict(self), which deep-copied every field (addon_params, storage kwargs,
+        the tokenizer, ...) on each call. The snapshot is built once, passed by reference and
+        rebuilt only after a field is reassigned. Field values are shared with this instance,
+        so callers must not mutate them.
+        """
+        snapshot = self.__dict__.get("_global_config_snapshot")
+        if snapshot is None:
+            snapshot = MappingProxyType({f.name: getattr(self, f.name) for f in fields(self)})
+            self.__dict__["_global_config_snapshot"] = snapshot
+        return snapshot
+
     def _run_async_safely(self, async_func, action_name=""):
         """Safely execute an async function, avoiding event loop conflicts."""
         try:
@@ -415,6 +486,7 @@ class LightRAG:
             for storage in (
                 self.full_docs,
                 self.text_chunks,
+                self.doc_index,
                 self.entities_vdb,
                 self.relationships_vdb,
                 self.chunks_vdb,
@@ -427,17 +499,24 @@ class LightRAG:
 
             await asyncio.gather(*tasks)
 
+            # The pooled LLM and embedding clients stay open until every instance using them is finalized
+            client_registry.retain()
+
             self._storages_status = StoragesStatus.INITIALIZED
             logger.debug("Initialized Storages")
 
     async def finalize_storages(self):
         """Asynchronously finalize the storages"""
         if self._storages_status == StoragesStatus.INITIALIZED:
+            # Persist the LLM cache entries of the last queries before the storages close
+            await self._llm_cache_flusher.aclose()
+
             tasks = []
 
             for storage in (
                 self.full_docs,
                 self.text_chunks,
+                self.doc_index,
                 self.entities_vdb,
                 self.relationships_vdb,
                 self.chunks_vdb,
@@ -450,6 +529,9 @@ class LightRAG:
 
             await asyncio.gather(*tasks)
 
+            # Close the pooled LLM and embedding clients unless another instance still uses them
+            await client_registry.release()
+
             self._storages_status = StoragesStatus.FINALIZED
             logger.debug("Finalized Storages")
 
@@ -476,6 +558,20 @@ class LightRAG:
 
         return await self.chunk_entity_relation_graph.get_knowledge_graph(node_label, max_depth, max_nodes)
 
+    async def stream_knowledge_graph(
+        self,
+        node_label: str,
+        max_depth: int = 3,
+        max_nodes: int = 1000,
+    ) -> AsyncIterator[KnowledgeGraphMeta | KnowledgeGraphNode | KnowledgeGraphEdge]:
+        """Stream the knowledge graph of get_knowledge_graph() item by item
+
+        Yields:
+            A KnowledgeGraphMeta with the is_truncated flag, then nodes, then edges
+        """
+        async for item in self.chunk_entity_relation_graph.stream_knowledge_graph(node_label, max_depth, max_nodes):
+            yield item
+
     def _get_storage_class(self, storage_name: str) -> Callable[..., Any]:
         import_path = STORAGES[storage_name]
         storage_class = lazy_external_import(import_path, storage_name)
@@ -797,231 +893,13 @@ class LightRAG:
                 job_name = f"{path_prefix}[{total_files} files]"
                 pipeline_status["job_name"] = job_name
 
-                # Create a counter to track the number of processed files
-                processed_count = 0
-                # Create a semaphore to limit the number of concurrent file processing
-                semaphore = asyncio.Semaphore(self.max_parallel_insert)
-
-                async def process_document(
-                    doc_id: str,
-                    status_doc: DocProcessingStatus,
-                    split_by_character: str | None,
-                    split_by_character_only: bool,
-                    pipeline_status: dict,
-                    pipeline_status_lock: asyncio.Lock,
-                    semaphore: asyncio.Semaphore,
-                ) -> None:
-                    """Process single document"""
-                    file_extraction_stage_ok = False
-                    async with semaphore:
-                        nonlocal processed_count
-                        current_file_number = 0
-                        try:
-                            # Get file path from status document
-                            file_path = getattr(status_doc, "file_path", "unknown_source")
-
-                            async with pipeline_status_lock:
-                                # Update processed file count and save current file number
-                                processed_count += 1
-                                current_file_number = processed_count  # Save the current file number
-                                pipeline_status["cur_batch"] = processed_count
-
-                                log_message = f"Extracting stage {current_file_number}/{total_files}: {file_path}"
-                                logger.info(log_message)
-                                pipeline_status["history_messages"].append(log_message)
-                                log_message = f"Processing d-id: {doc_id}"
-                                logger.info(log_message)
-                                pipeline_status["latest_message"] = log_message
-                                pipeline_status["history_messages"].append(log_message)
-
-                            # Generate chunks from document
-                            chunks: dict[str, Any] = {
-                                compute_mdhash_id(dp["content"], prefix="chunk-"): {
-                                    **dp,
-                                    "full_doc_id": doc_id,
-                                    "file_path": file_path,  # Add file path to each chunk
-                                }
-                                for dp in self.chunking_func(
-                                    self.tokenizer,
-                                    status_doc.content,
-                                    split_by_character,
-                                    split_by_character_only,
-                                    self.chunk_overlap_token_size,
-                                    self.chunk_token_size,
-                                )
-                            }
-
-                            # Process document (text chunks and full docs) in parallel
-                            # Create tasks with references for potential cancellation
-                            doc_status_task = asyncio.create_task(
-                                self.doc_status.upsert(
-                                    {
-                                        doc_id: {
-                                            "status": DocStatus.PROCESSING,
-                                            "chunks_count": len(chunks),
-                                            "content": status_doc.content,
-                                            "content_summary": status_doc.content_summary,
-                                            "content_length": status_doc.content_length,
-                                            "created_at": status_doc.created_at,
-                                            "updated_at": datetime.now(timezone.utc).isoformat(),
-                                            "file_path": file_path,
-                                        }
-                                    }
-                                )
-                            )
-                            chunks_vdb_task = asyncio.create_task(self.chunks_vdb.upsert(chunks))
-                            entity_relation_task = asyncio.create_task(
-                                self._process_entity_relation_graph(chunks, pipeline_status, pipeline_status_lock)
-                            )
-                            full_docs_task = asyncio.create_task(
-                                self.full_docs.upsert({doc_id: {"content": status_doc.content}})
-                            )
-                            text_chunks_task = asyncio.create_task(self.text_chunks.upsert(chunks))
-                            tasks = [
-                                doc_status_task,
-                                chunks_vdb_task,
-                                entity_relation_task,
-                                full_docs_task,
-                                text_chunks_task,
-                            ]
-                            await asyncio.gather(*tasks)
-                            file_extraction_stage_ok = True
-
-                        except Exception as e:
-                            # Log error and update pipeline status
-                            logger.error(traceback.format_exc())
-                            error_msg = f"Failed to extrat document {current_file_number}/{total_files}: {file_path}"
-                            logger.error(error_msg)
-                            async with pipeline_status_lock:
-                                pipeline_status["latest_message"] = error_msg
-                                pipeline_status["history_messages"].append(traceback.format_exc())
-                                pipeline_status["history_messages"].append(error_msg)
-
-                                # Cancel other tasks as they are no longer meaningful
-                                for task in [
-                                    chunks_vdb_task,
-                                    entity_relation_task,
-                                    full_docs_task,
-                                    text_chunks_task,
-                                ]:
-                                    if not task.done():
-                                        task.cancel()
-
-                            # Persistent llm cache
-                            if self.llm_response_cache:
-                                await self.llm_response_cache.index_done_callback()
-
-                            # Update document status to failed
-                            await self.doc_status.upsert(
-                                {
-                                    doc_id: {
-                                        "status": DocStatus.FAILED,
-                                        "error": str(e),
-                                        "content": status_doc.content,
-                                        "content_summary": status_doc.content_summary,
-                                        "content_length": status_doc.content_length,
-                                        "created_at": status_doc.created_at,
-                                        "updated_at": datetime.now(timezone.utc).isoformat(),
-                                        "file_path": file_path,
-                                    }
-                                }
-                            )
-
-                    # Semphore released, concurrency controlled by graph_db_lock in merge_nodes_and_edges instead
-
-                    if file_extraction_stage_ok:
-                        try:
-                            # Get chunk_results from entity_relation_task
-                            chunk_results = await entity_relation_task
-                            await merge_nodes_and_edges(
-                                chunk_results=chunk_results,  # result collected from entity_relation_task
-                                knowledge_graph_inst=self.chunk_entity_relation_graph,
-                                entity_vdb=self.entities_vdb,
-                                relationships_vdb=self.relationships_vdb,
-                                global_config=asdict(self),
-                                pipeline_status=pipeline_status,
-                                pipeline_status_lock=pipeline_status_lock,
-                                llm_response_cache=self.llm_response_cache,
-                                current_file_number=current_file_number,
-                                total_files=total_files,
-                                file_path=file_path,
-                            )
-
-                            await self.doc_status.upsert(
-                                {
-                                    doc_id: {
-                                        "status": DocStatus.PROCESSED,
-                                        "chunks_count": len(chunks),
-                                        "content": status_doc.content,
-                                        "content_summary": status_doc.content_summary,
-                                        "content_length": status_doc.content_length,
-                                        "created_at": status_doc.created_at,
-                                        "updated_at": datetime.now(timezone.utc).isoformat(),
-                                        "file_path": file_path,
-                                    }
-                                }
-                            )
-
-                            # Call _insert_done after processing each file
-                            await self._insert_done()
-
-                            async with pipeline_status_lock:
-                                log_message = (
-                                    f"Completed processing file {current_file_number}/{total_files}: {file_path}"
-                                )
-                                logger.info(log_message)
-                                pipeline_status["latest_message"] = log_message
-                                pipeline_status["history_messages"].append(log_message)
-
-                        except Exception as e:
-                            # Log error and update pipeline status
-                            logger.error(traceback.format_exc())
-                            error_msg = (
-                                f"Merging stage failed in document {current_file_number}/{total_files}: {file_path}"
-                            )
-                            logger.error(error_msg)
-                            async with pipeline_status_lock:
-                                pipeline_status["latest_message"] = error_msg
-                                pipeline_status["history_messages"].append(traceback.format_exc())
-                                pipeline_status["history_messages"].append(error_msg)
-
-                            # Persistent llm cache
-                            if self.llm_response_cache:
-                                await self.llm_response_cache.index_done_callback()
-
-                            # Update document status to failed
-                            await self.doc_status.upsert(
-                                {
-                                    doc_id: {
-                                        "status": DocStatus.FAILED,
-                                        "error": str(e),
-                                        "content": status_doc.content,
-                                        "content_summary": status_doc.content_summary,
-                                        "content_length": status_doc.content_length,
-                                        "created_at": status_doc.created_at,
-                                        "updated_at": datetime.now().isoformat(),
-                                        "file_path": file_path,
-                                    }
-                                }
-                            )
-
-                # Create processing tasks for all documents
-                doc_tasks = []
-                for doc_id, status_doc in to_process_docs.items():
-                    doc_tasks.append(
-                        process_document(
-                            doc_id,
-                            status_doc,
-                            split_by_character,
-                            split_by_character_only,
-                            pipeline_status,
-                            pipeline_status_lock,
-                            semaphore,
-                        )
-                    )
-
-                # Wait for all document processing to complete
-                await asyncio.gather(*doc_tasks)
+                await self._run_document_stages(
+                    to_process_docs,
+                    split_by_character,
+                    split_by_character_only,
+                    pipeline_status,
+                    pipeline_status_lock,
+                )
 
                 # Check if there's a pending request to process more documents (with lock)
                 has_pending_request = False
@@ -1060,16 +938,288 @@ class LightRAG:
                 pipeline_status["latest_message"] = log_message
                 pipeline_status["history_messages"].append(log_message)
 
+    async def _run_document_stages(
+        self,
+        to_process_docs: dict[str, DocProcessingStatus],
+        split_by_character: str | None,
+        split_by_character_only: bool,
+        pipeline_status: dict,
+        pipeline_status_lock,
+    ) -> None:
+        """Run documents through the chunk, embed, extract, merge and flush stages
+
+        Every stage has its own worker pool and hands documents to the next stage through a bounded
+        queue, so a slow stage applies back-pressure instead of buffering whole documents. Storages
+        are flushed once for a group of merged documents, when insert_flush_max_docs documents are
+        waiting or insert_flush_interval seconds passed since the first one arrived. Documents are
+        marked processed only after their data was flushed.
+
+        Per-stage counters, busy time, throughput and queue depth are published in
+        pipeline_status["stages"].
+        """
+        total_files = len(to_process_docs)
+        loop = asyncio.get_running_loop()
+        pipeline_start = loop.time()
+        queue_size = max(1, self.max_parallel_insert)
+        workers = {
+            "chunk": 1,
+            "embed": max(1, self.max_parallel_insert),
+            "extract": max(1, self.max_parallel_insert),
+            # Merges only hold graph locks for their reads and writes, summaries run unlocked
+            "merge": max(1, self.max_parallel_insert),
+            "flush": 1,
+        }
+        queues: dict[str, asyncio.Queue] = {name: asyncio.Queue(maxsize=queue_size) for name in workers}
+        stats = {name: {"processed": 0, "failed": 0, "busy_seconds": 0.0} for name in workers}
+        processed_count = 0
+
+        async def publish_stats() -> None:
+            elapsed = max(loop.time() - pipeline_start, 1e-9)
+            snapshot = {
+                name: {
+                    "workers": workers[name],
+                    "queue_depth": queues[name].qsize(),
+                    "processed": stats[name]["processed"],
+                    "failed": stats[name]["failed"],
+                    "busy_seconds": round(stats[name]["busy_seconds"], 3),
+                    "docs_per_second": round(stats[name]["processed"] / elapsed, 3),
+                }
+                for name in workers
+            }
+            async with pipeline_status_lock:
+                # Replace the whole value, nested changes are not propagated by shared dicts
+                pipeline_status["stages"] = snapshot
+
+        def status_record(doc: dict[str, Any], status: DocStatus, **extra) -> dict[str, Any]:
+            status_doc: DocProcessingStatus = doc["status_doc"]
+            record = {
+                "status": status,
+                "content": status_doc.content,
+                "content_summary": status_doc.content_summary,
+                "content_length": status_doc.content_length,
+                "created_at": status_doc.created_at,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+                "file_path": doc["file_path"],
+                **extra,
+            }
+            if "chunks" in doc:
+                record["chunks_count"] = len(doc["chunks"])
+            return {doc["doc_id"]: record}
+
+        async def fail_document(doc: dict[str, Any], stage: str, error: Exception) -> None:
+            logger.error(traceback.format_exc())
+            error_msg = f"Failed to {stage} document {doc['file_number']}/{total_files}: {doc['file_path']}"
+            logger.error(error_msg)
+            async with pipeline_status_lock:
+                pipeline_status["latest_message"] = error_msg
+                pipeline_status["history_messages"].append(traceback.format_exc())
+                pipeline_status["history_messages"].append(error_msg)
+
+            # The storages may be what failed, the pipeline must keep running either way
+            try:
+                # Persistent llm cache
+                if self.llm_response_cache:
+                    await self.llm_response_cache.index_done_callback()
+
+                # Update document status to failed
+                await self.doc_status.upsert(status_record(doc, DocStatus.FAILED, error=str(error)))
+            except Exception as e:
+                logger.error(f"Failed to record the failure of document {doc['doc_id']}: {e}")
+
+        async def chunk_document(doc: dict[str, Any]) -> None:
+            nonlocal processed_count
+            async with pipeline_status_lock:
+                # Update processed file count and save current file number
+                processed_count += 1
+                doc["file_number"] = processed_count
+                pipeline_status["cur_batch"] = processed_count
+
+                log_message = f"Extracting stage {processed_count}/{total_files}: {doc['file_path']}"
+                logger.info(log_message)
+                pipeline_status["history_messages"].append(log_message)
+                log_message = f"Processing d-id: {doc['doc_id']}"
+                logger.info(log_message)
+                pipeline_status["latest_message"] = log_message
+                pipeline_status["history_messages"].append(log_message)
+
+            # Generate chunks from document
+            doc["chunks"] = {
+                compute_mdhash_id(dp["content"], prefix="chunk-"): {
+                    **dp,
+                    "full_doc_id": doc["doc_id"],
+                    "file_path": doc["file_path"],  # Add file path to each chunk
+                }
+                for dp in self.chunking_func(
+                    self.tokenizer,
+                    doc["status_doc"].content,
+                    split_by_character,
+                    split_by_character_only,
+                    self.chunk_overlap_token_size,
+                    self.chunk_token_size,
+                )
+            }
+
+        async def embed_document(doc: dict[str, Any]) -> None:
+            # Store document, chunks and their embeddings in parallel
+            await asyncio.gather(
+                self.doc_status.upsert(status_record(doc, DocStatus.PROCESSING)),
+                self.chunks_vdb.upsert(doc["chunks"]),
+                self.full_docs.upsert({doc["doc_id"]: {"content": doc["status_doc"].content}}),
+                self.text_chunks.upsert(doc["chunks"]),
+            )
+
+        async def extract_document(doc: dict[str, Any]) -> None:
+            doc["chunk_results"] = await self._process_entity_relation_graph(
+                doc["chunks"], pipeline_status, pipeline_status_lock
+            )
+
+        async def merge_document(doc: dict[str, Any]) -> None:
+            await merge_nodes_and_edges(
+                chunk_results=doc.pop("chunk_results"),
+                knowledge_graph_inst=self.chunk_entity_relation_graph,
+                entity_vdb=self.entities_vdb,
+                relationships_vdb=self.relationships_vdb,
+                global_config=self._get_global_config(),
+                pipeline_status=pipeline_status,
+                pipeline_status_lock=pipeline_status_lock,
+                llm_response_cache=self.llm_response_cache,
+                current_file_number=doc["file_number"],
+                total_files=total_files,
+                file_path=doc["file_path"],
+                doc_id=doc["doc_id"],
+                chunk_ids=list(doc["chunks"].keys()),
+                doc_index=self.doc_index,
+            )
+
+        async def run_stage(name: str, handler, next_stage: str | None) -> None:
+            async def worker() -> None:
+                while (doc := await queues[name].get()) is not None:
+                    start_time = loop.time()
+                    try:
+                        await handler(doc)
+                    except Exception as e:
+                        stats[name]["failed"] += 1
+                        await fail_document(doc, name, e)
+                    else:
+                        stats[name]["processed"] += 1
+                        if next_stage is not None:
+                            await queues[next_stage].put(doc)
+                    finally:
+                        stats[name]["busy_seconds"] += loop.time() - start_time
+                        await publish_stats()
+
+            cancelled = False
+            try:
+                await asyncio.gather(*[worker() for _ in range(workers[name])])
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                # Tell every worker of the next stage that no more documents will arrive, also when this
+                # stage failed. A cancelled pipeline cancels the next stage too, nothing would take them.
+                if next_stage is not None and not cancelled:
+                    for _ in range(workers[next_stage]):
+                        await queues[next_stage].put(None)
+
+        async def flush_documents(docs: list[dict[str, Any]]) -> None:
+            start_time = loop.time()
+            try:
+                await self._insert_done()
+            except Exception as e:
+                stats["flush"]["failed"] += len(docs)
+                for doc in docs:
+                    await fail_document(doc, "flush", e)
+                return
+            finally:
+                stats["flush"]["busy_seconds"] += loop.time() - start_time
+
+            for doc in docs:
+                await self.doc_status.upsert(status_record(doc, DocStatus.PROCESSED))
+                async with pipeline_status_lock:
+                    log_message = f"Completed processing file {doc['file_number']}/{total_files}: {doc['file_path']}"
+                    logger.info(log_message)
+                    pipeline_status["latest_message"] = log_message
+                    pipeline_status["history_messages"].append(log_message)
+            stats["flush"]["processed"] += len(docs)
+            await publish_stats()
+
+        async def run_flush_stage() -> None:
+            pending: list[dict[str, Any]] = []
+            deadline = 0.0
+            get_task = None
+            finished = False
+            try:
+                while not finished:
+                    if get_task is None:
+                        get_task = asyncio.ensure_future(queues["flush"].get())
+                    timeout = max(0.0, deadline - loop.time()) if pending else None
+                    done, _ = await asyncio.wait({get_task}, timeout=timeout)
+                    if get_task in done:
+                        doc = get_task.result()
+                        get_task = None
+                        if doc is None:
+                            finished = True
+                        else:
+                            if not pending:
+                                deadline = loop.time() + self.insert_flush_interval
+                            pending.append(doc)
+                    if pending and (
+                        finished or len(pending) >= self.insert_flush_max_docs or loop.time() >= deadline
+                    ):
+                        await flush_documents(pending)
+                        pending = []
+            finally:
+                if get_task is not None:
+                    get_task.cancel()
+
+        async def feed_documents() -> None:
+            for doc_id, status_doc in to_process_docs.items():
+                await queues["chunk"].put(
+                    {
+                        "doc_id": doc_id,
+                        "status_doc": status_doc,
+                        "file_path": getattr(status_doc, "file_path", "unknown_source"),
+                        "file_number": 0,
+                    }
+                )
+            for _ in range(workers["chunk"]):
+                await queues["chunk"].put(None)
+
+        tasks = [
+            asyncio.create_task(feed_documents()),
+            asyncio.create_task(run_stage("chunk", chunk_document, "embed")),
+            asyncio.create_task(run_stage("embed", embed_document, "extract")),
+            asyncio.create_task(run_stage("extract", extract_document, "merge")),
+            asyncio.create_task(run_stage("merge", merge_document, "flush")),
+            asyncio.create_task(run_flush_stage()),
+        ]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        for task in done:
+            if task.exception():
+                # A failed stage stops consuming its queue, the stages feeding it would wait forever
+                for pending_task in pending:
+                    pending_task.cancel()
+                if pending:
+                    await asyncio.wait(pending)
+                raise task.exception()
+
     async def _process_entity_relation_graph(
         self, chunk: dict[str, Any], pipeline_status=None, pipeline_status_lock=None
     ) -> list:
         try:
             chunk_results = await extract_entities(
                 chunk,
-                global_config=asdict(self),
+                global_config=self._get_global_config(),
                 pipeline_status=pipeline_status,
                 pipeline_status_lock=pipeline_status_lock,
                 llm_response_cache=self.llm_response_cache,
+                scheduler=self._extraction_scheduler,
+                batcher=self._extraction_batcher,
             )
             return chunk_results
         except Exception as e:
@@ -1086,6 +1236,7 @@ class LightRAG:
             for storage_inst in [  # type: ignore
                 self.full_docs,
                 self.text_chunks,
+                self.doc_index,
                 self.llm_response_cache,
                 self.entities_vdb,
                 self.relationships_vdb,
@@ -1281,7 +1432,10 @@ class LightRAG:
         """
         loop = always_get_an_event_loop()
 
-        return loop.run_until_complete(self.aquery(query, param, system_prompt))  # type: ignore
+        response = loop.run_until_complete(self.aquery(query, param, system_prompt))
+        # The loop stops running once this call returns, persist the cached answer now
+        loop.run_until_complete(self._llm_cache_flusher.flush())
+        return response  # type: ignore
 
     async def aquery(
         self,
@@ -1302,9 +1456,11 @@ class LightRAG:
             str: The result of the query execution.
         """
         # If a custom model is provided in param, temporarily update global config
-        global_config = asdict(self)
+        global_config = self._get_global_config()
         # Save original query for vector search
         param.original_query = query
+        # Reset per-query timings, the default QueryParam instance may be shared across calls
+        param.timings = {}
 
         if param.mode in ["local", "global", "hybrid", "mix"]:
             response = await kg_query(
@@ -1343,6 +1499,9 @@ class LightRAG:
             )
         else:
             raise ValueError(f"Unknown mode {param.mode}")
+        if hasattr(response, "__aiter__"):
+            # A streamed response reaches the LLM cache only once it has been read
+            return self._query_stream_done(response)
         await self._query_done()
         return response
 
@@ -1362,7 +1521,10 @@ class LightRAG:
             Query response
         """
         loop = always_get_an_event_loop()
-        return loop.run_until_complete(self.aquery_with_separate_keyword_extraction(query, prompt, param))
+        response = loop.run_until_complete(self.aquery_with_separate_keyword_extraction(query, prompt, param))
+        # The loop stops running once this call returns, persist the cached answer now
+        loop.run_until_complete(self._llm_cache_flusher.flush())
+        return response
 
     # TODO: Deprecated, use user_prompt in QueryParam instead
     async def aquery_with_separate_keyword_extraction(
@@ -1388,7 +1550,7 @@ class LightRAG:
             relationships_vdb=self.relationships_vdb,
             chunks_vdb=self.chunks_vdb,
             text_chunks_db=self.text_chunks,
-            global_config=asdict(self),
+            global_config=self._get_global_config(),
             hashing_kv=self.llm_response_cache,
         )
 
@@ -1396,7 +1558,14 @@ class LightRAG:
         return response
 
     async def _query_done(self):
-        await self.llm_response_cache.index_done_callback()
+        self._llm_cache_flusher.mark_dirty()
+
+    async def _query_stream_done(self, response: AsyncIterator[str]) -> AsyncIterator[str]:
+        try:
+            async for chunk in response:
+                yield chunk
+        finally:
+            await self._query_done()
 
     async def aclear_cache(self, modes: list[str] | None = None) -> None:
         """Clear cache data from the LLM response cache storage.
@@ -1515,100 +1684,105 @@ class LightRAG:
 
     # TODO: Deprecated (Deleting documents can cause hallucinations in RAG.)
     # Document delete is not working properly for most of the storage implementations.
-    async def adelete_by_doc_id(self, doc_id: str) -> None:
+    async def adelete_by_doc_id(self, doc_id: str) -> dict[str, Any] | None:
         """Delete a document and all its related data
 
+        The chunks, entities and relations of the document are looked up in the doc_index reverse
+        index written during merging. Documents indexed before the reverse index existed fall back
+        to scanning the chunk and graph storages.
+
         Args:
             doc_id: Document ID to delete
+
+        Returns:
+            Deletion metrics (elapsed seconds, lookup method and record counts), or None if nothing was deleted
         """
+        start_time = time.perf_counter()
         try:
             # 1. Get the document status and related data
             if not await self.doc_status.get_by_id(doc_id):
                 logger.warning(f"Document {doc_id} not found")
-                return
+                return None
 
             logger.debug(f"Starting deletion for document {doc_id}")
 
-            # 2. Get all chunks related to this document
-            # Find all chunks where full_doc_id equals the current doc_id
-            all_chunks = await self.text_chunks.get_all()
-            related_chunks = {
-                chunk_id: chunk_data
-                for chunk_id, chunk_data in all_chunks.items()
-                if isinstance(chunk_data, dict) and chunk_data.get("full_doc_id") == doc_id
-            }
-
-            if not related_chunks:
+            # 2. Get all chunks, entities and relations related to this document
+            index_record = await self.doc_index.get_by_id(doc_id)
+            if index_record:
+                lookup = "index"
+                chunk_ids = set(index_record.get("chunk_ids", []))
+                candidate_relations = [tuple(pair) for pair in index_record.get("relations", [])]
+                # Relation endpoints cover placeholder nodes missing from records written by older versions
+                endpoints = [node_id for pair in candidate_relations for node_id in pair]
+                candidate_entities = list(dict.fromkeys([*index_record.get("entities", []), *endpoints]))
+            else:
+                lookup = "scan"
+                logger.info(f"No reverse index for document {doc_id}, scanning storages")
+                # Find all chunks where full_doc_id equals the current doc_id
+                all_chunks = await self.text_chunks.get_all()
+                chunk_ids = {
+                    chunk_id
+                    for chunk_id, chunk_data in all_chunks.items()
+                    if isinstance(chunk_data, dict) and chunk_data.get("full_doc_id") == doc_id
+                }
+                candidate_entities = await self.chunk_entity_relation_graph.get_all_labels()
+                candidate_relations = set()
+                for node_label in candidate_entities:
+                    node_edges = await self.chunk_entity_relation_graph.get_node_edges(node_label)
+                    candidate_relations.update(tuple(sorted(edge)) for edge in node_edges or [])
+                candidate_relations = list(candidate_relations)
+
+            if not chunk_ids:
                 logger.warning(f"No chunks found for document {doc_id}")
-                return
-
-            # Get all related chunk IDs
-            chunk_ids = set(related_chunks.keys())
+                return None
             logger.debug(f"Found {len(chunk_ids)} chunks to delete")
 
-            # TODO: self.entities_vdb.client_storage only works for local storage, need to fix this
-
-            # 3. Before deleting, check the related entities and relationships for these chunks
-            for chunk_id in chunk_ids:
-                # Check entities
-                entities_storage = await self.entities_vdb.client_storage
-                entities = [dp for dp in entities_storage["data"] if chunk_id in dp.get("source_id")]
-                logger.debug(f"Chunk {chunk_id} has {len(entities)} related entities")
-
-                # Check relationships
-                relationships_storage = await self.relationships_vdb.client_storage
-                relations = [dp for dp in relationships_storage["data"] if chunk_id in dp.get("source_id")]
-                logger.debug(f"Chunk {chunk_id} has {len(relations)} related relations")
+            # 3. Delete chunks from vector database
+            await self.chunks_vdb.delete(list(chunk_ids))
+            await self.text_chunks.delete(list(chunk_ids))
 
-            # Continue with the original deletion process...
-
-            # 4. Delete chunks from vector database
-            if chunk_ids:
-                await self.chunks_vdb.delete(chunk_ids)
-                await self.text_chunks.delete(chunk_ids)
-
-            # 5. Find and process entities and relationships that have these chunks as source
-            # Get all nodes and edges from the graph storage using storage-agnostic methods
+            # 4. Find entities and relationships that have these chunks as source
             entities_to_delete = set()
-            entities_to_update = {}  # entity_name -> new_source_id
+            entities_to_update = {}  # entity_name -> node data with new source_id
             relationships_to_delete = set()
-            relationships_to_update = {}  # (src, tgt) -> new_source_id
-
-            # Process entities - use storage-agnostic methods
-            all_labels = await self.chunk_entity_relation_graph.get_all_labels()
-            for node_label in all_labels:
-                node_data = await self.chunk_entity_relation_graph.get_node(node_label)
-                if node_data and "source_id" in node_data:
-                    # Split source_id using GRAPH_FIELD_SEP
-                    sources = set(node_data["source_id"].split(GRAPH_FIELD_SEP))
-                    sources.difference_update(chunk_ids)
-                    if not sources:
-                        entities_to_delete.add(node_label)
-                        logger.debug(f"Entity {node_label} marked for deletion - no remaining sources")
-                    else:
-                        new_source_id = GRAPH_FIELD_SEP.join(sources)
-                        entities_to_update[node_label] = new_source_id
-                        logger.debug(f"Entity {node_label} will be updated with new source_id: {new_source_id}")
-
-            # Process relationships
-            for node_label in all_labels:
-                node_edges = await self.chunk_entity_relation_graph.get_node_edges(node_label)
-                if node_edges:
-                    for src, tgt in node_edges:
-                        edge_data = await self.chunk_entity_relation_graph.get_edge(src, tgt)
-                        if edge_data and "source_id" in edge_data:
-                            # Split source_id using GRAPH_FIELD_SEP
-                            sources = set(edge_data["source_id"].split(GRAPH_FIELD_SEP))
-                            sources.difference_update(chunk_ids)
-                            if not sources:
-                                relationships_to_delete.add((src, tgt))
-                                logger.debug(f"Relationship {src}-{tgt} marked for deletion - no remaining sources")
-                            else:
-                                new_source_id = GRAPH_FIELD_SEP.join(sources)
-                                relationships_to_update[(src, tgt)] = new_source_id
-                                logger.debug(
-                                    f"Relationship {src}-{tgt} will be updated with new source_id: {new_source_id}"
-                                )
+            relationships_to_update = {}  # (src, tgt) -> edge data with new source_id
+
+            nodes = await self.chunk_entity_relation_graph.get_nodes_batch(candidate_entities)
+            for node_label, node_data in nodes.items():
+                if not node_data or "source_id" not in node_data:
+                    continue
+                # Split source_id using GRAPH_FIELD_SEP
+                sources = set(node_data["source_id"].split(GRAPH_FIELD_SEP))
+                if sources.isdisjoint(chunk_ids):
+                    continue
+                sources.difference_update(chunk_ids)
+                if not sources:
+                    entities_to_delete.add(node_label)
+                    logger.debug(f"Entity {node_label} marked for deletion - no remaining sources")
+                else:
+                    node_data["source_id"] = GRAPH_FIELD_SEP.join(sources)
+                    entities_to_update[node_label] = node_data
+                    logger.debug(f"Entity {node_label} will be updated with new source_id: {node_data['source_id']}")
+
+            edges = await self.chunk_entity_relation_graph.get_edges_batch(
+                [{"src": src, "tgt": tgt} for src, tgt in candidate_relations]
+            )
+            for (src, tgt), edge_data in edges.items():
+                if not edge_data or "source_id" not in edge_data:
+                    continue
+                sources = set(edge_data["source_id"].split(GRAPH_FIELD_SEP))
+                if sources.isdisjoint(chunk_ids):
+                    continue
+                sources.difference_update(chunk_ids)
+                if not sources:
+                    relationships_to_delete.add((src, tgt))
+                    logger.debug(f"Relationship {src}-{tgt} marked for deletion - no remaining sources")
+                else:
+                    edge_data["source_id"] = GRAPH_FIELD_SEP.join(sources)
+                    relationships_to_update[(src, tgt)] = edge_data
+                    logger.debug(
+                        f"Relationship {src}-{tgt} will be updated with new source_id: {edge_data['source_id']}"
+                    )
 
             # Delete entities
             if entities_to_delete:
@@ -1619,110 +1793,53 @@ class LightRAG:
                 logger.debug(f"Deleted {len(entities_to_delete)} entities from graph")
 
             # Update entities
-            for entity, new_source_id in entities_to_update.items():
-                node_data = await self.chunk_entity_relation_graph.get_node(entity)
-                if node_data:
-                    node_data["source_id"] = new_source_id
-                    await self.chunk_entity_relation_graph.upsert_node(entity, node_data)
-                    logger.debug(f"Updated entity {entity} with new source_id: {new_source_id}")
+            for entity, node_data in entities_to_update.items():
+                await self.chunk_entity_relation_graph.upsert_node(entity, node_data)
 
             # Delete relationships
             if relationships_to_delete:
+                rel_ids = []
                 for src, tgt in relationships_to_delete:
-                    rel_id_0 = compute_mdhash_id(src + tgt, prefix="rel-")
-                    rel_id_1 = compute_mdhash_id(tgt + src, prefix="rel-")
-                    await self.relationships_vdb.delete([rel_id_0, rel_id_1])
-                    logger.debug(f"Deleted relationship {src}-{tgt} from vector DB")
+                    rel_ids.append(compute_mdhash_id(src + tgt, prefix="rel-"))
+                    rel_ids.append(compute_mdhash_id(tgt + src, prefix="rel-"))
+                await self.relationships_vdb.delete(rel_ids)
                 await self.chunk_entity_relation_graph.remove_edges(list(relationships_to_delete))
                 logger.debug(f"Deleted {len(relationships_to_delete)} relationships from graph")
 
             # Update relationships
-            for (src, tgt), new_source_id in relationships_to_update.items():
-                edge_data = await self.chunk_entity_relation_graph.get_edge(src, tgt)
-                if edge_data:
-                    edge_data["source_id"] = new_source_id
-                    await self.chunk_entity_relation_graph.upsert_edge(src, tgt, edge_data)
-                    logger.debug(f"Updated relationship {src}-{tgt} with new source_id: {new_source_id}")
-
-            # 6. Delete original document and status
+            for (src, tgt), edge_data in relationships_to_update.items():
+                await self.chunk_entity_relation_graph.upsert_edge(src, tgt, edge_data)
+
+            # 5. Delete original document, status and reverse index record
             await self.full_docs.delete([doc_id])
             await self.doc_status.delete([doc_id])
+            await self.doc_index.delete([doc_id])
 
-            # 7. Ensure all indexes are updated
+            # 6. Ensure all indexes are updated
             await self._insert_done()
 
+            metrics = {
+                "doc_id": doc_id,
+                "lookup": lookup,
+                "elapsed": round(time.perf_counter() - start_time, 4),
+                "chunks_deleted": len(chunk_ids),
+                "entities_examined": len(candidate_entities),
+                "relations_examined": len(candidate_relations),
+                "entities_deleted": len(entities_to_delete),
+                "relations_deleted": len(relationships_to_delete),
+                "entities_updated": len(entities_to_update),
+                "relations_updated": len(relationships_to_update),
+            }
             logger.info(
-                f"Successfully deleted document {doc_id} and related data. "
+                f"Successfully deleted document {doc_id} and related data in {metrics['elapsed']}s ({lookup}). "
                 f"Deleted {len(entities_to_delete)} entities and {len(relationships_to_delete)} relationships. "
                 f"Updated {len(entities_to_update)} entities and {len(relationships_to_update)} relationships."
             )
-
-            async def process_data(data_type, vdb, chunk_id):
-                # Check data (entities or relationships)
-                storage = await vdb.client_storage
-                data_with_chunk = [
-                    dp for dp in storage["data"] if chunk_id in (dp.get("source_id") or "").split(GRAPH_FIELD_SEP)
-                ]
-
-                data_for_vdb = {}
-                if data_with_chunk:
-                    logger.warning(f"found {len(data_with_chunk)} {data_type} still referencing chunk {chunk_id}")
-
-                    for item in data_with_chunk:
-                        old_sources = item["source_id"].split(GRAPH_FIELD_SEP)
-                        new_sources = [src for src in old_sources if src != chunk_id]
-
-                        if not new_sources:
-                            logger.info(
-                                f"{data_type} {item.get('entity_name', 'N/A')} is deleted because source_id is not exists"
-                            )
-                            await vdb.delete_entity(item)
-                        else:
-                            item["source_id"] = GRAPH_FIELD_SEP.join(new_sources)
-                            item_id = item["__id__"]
-                            data_for_vdb[item_id] = item.copy()
-                            if data_type == "entities":
-                                data_for_vdb[item_id]["content"] = data_for_vdb[item_id].get("content") or (
-                                    item.get("entity_name", "") + (item.get("description") or "")
-                                )
-                            else:  # relationships
-                                data_for_vdb[item_id]["content"] = data_for_vdb[item_id].get("content") or (
-                                    (item.get("keywords") or "")
-                                    + (item.get("src_id") or "")
-                                    + (item.get("tgt_id") or "")
-                                    + (item.get("description") or "")
-                                )
-
-                    if data_for_vdb:
-                        await vdb.upsert(data_for_vdb)
-                        logger.info(f"Successfully updated {data_type} in vector DB")
-
-            # Add verification step
-            async def verify_deletion():
-                # Verify if the document has been deleted
-                if await self.full_docs.get_by_id(doc_id):
-                    logger.warning(f"Document {doc_id} still exists in full_docs")
-
-                # Verify if chunks have been deleted
-                all_remaining_chunks = await self.text_chunks.get_all()
-                remaining_related_chunks = {
-                    chunk_id: chunk_data
-                    for chunk_id, chunk_data in all_remaining_chunks.items()
-                    if isinstance(chunk_data, dict) and chunk_data.get("full_doc_id") == doc_id
-                }
-
-                if remaining_related_chunks:
-                    logger.warning(f"Found {len(remaining_related_chunks)} remaining chunks")
-
-                # Verify entities and relationships
-                for chunk_id in chunk_ids:
-                    await process_data("entities", self.entities_vdb, chunk_id)
-                    await process_data("relationships", self.relationships_vdb, chunk_id)
-
-            await verify_deletion()
+            return metrics
 
         except Exception as e:
             logger.error(f"Error while deleting document {doc_id}: {e}")
+            return None
 
     async def adelete_by_entity(self, entity_name: str) -> None:
         """Asynchronously delete an entity and all its relationships.
@@ -2019,3 +2136,6 @@ class LightRAG:
             asyncio.set_event_loop(loop)
 
         loop.run_until_complete(self.aexport_data(output_path, file_format, include_vector_data))
+
+
+_CONFIG_FIELD_NAMES = frozenset(f.name for f in fields(LightRAG))
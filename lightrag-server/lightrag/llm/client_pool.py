@@ -0,0 +1,246 @@
+"""
+Process-wide registry of pooled API clients for the LLM and embedding bindings.
+
+Bindings used to build a new HTTP client for every request, paying connection and TLS
+setup each time. Clients are now created once per (binding, base_url, api_key, config,
+event loop) and reused, each with a bounded keep-alive connection pool and HTTP/2 when
+the h2 package is available.
+
+The bindings are plain functions shared by every LightRAG instance, so the clients are
+too. Each instance registers as an owner of the clients of its event loop when its
+storages are initialized, and the clients are closed when the last owner finalizes.
+A client that still has requests in flight is closed once they are done.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from ..utils import logger
+
+# Closes of retired clients started from release(), kept referenced until they finish
+_closing_tasks: set[asyncio.Task] = set()
+
+
+def http_client_options() -> dict[str, Any]:
+    """Keyword arguments for httpx.AsyncClient shared by all pooled clients
+
+    Environment variables:
+        LLM_HTTP_MAX_CONNECTIONS: Upper bound of open connections per client (default 100)
+        LLM_HTTP_MAX_KEEPALIVE: Idle connections kept open for reuse (default 20)
+        LLM_HTTP_KEEPALIVE_EXPIRY: Seconds an idle connection is kept (default 30)
+        LLM_HTTP2: Negotiate HTTP/2 when the server supports it (default true, needs h2)
+    """
+    import httpx
+
+    http2 = os.getenv("LLM_HTTP2", "true").lower() in ("true", "1", "yes")
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            http2 = False
+
+    return {
+        "http2": http2,
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 100)),
+            max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", 20)),
+            keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", 30)),
+        ),
+    }
+
+
+@dataclass
+class PooledClient:
+    """A shared API client together with its usage counters"""
+
+    kind: str
+    base_url: str | None
+    client: Any
+    close: Callable[[], Awaitable[None]]
+    loop: asyncio.AbstractEventLoop
+    http_client: Any = None
+    created_at: float = field(default_factory=time.time)
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    # Set once the registry dropped the client, it is closed when no request is in flight
+    retired: bool = False
+    _close_started: bool = field(default=False, init=False, repr=False)
+
+    @property
+    def closed(self) -> bool:
+        return self.loop.is_closed() or bool(getattr(self.http_client, "is_closed", False))
+
+    def acquire(self) -> None:
+        """Count a request as started, pair with release()"""
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self, failed: bool = False) -> None:
+        self.in_flight -= 1
+        if failed:
+            self.errors += 1
+        if self.retired and self.in_flight == 0 and not self.loop.is_closed():
+            # Also called from garbage collection, see stream_releaser()
+            self.loop.call_soon_threadsafe(self._start_close)
+
+    def stream_releaser(self, stream: Any) -> Callable[[bool], None]:
+        """Return the release function of a request answered with a stream, it runs at most once
+
+        The stream calls it when it ends. A stream that is never iterated never runs its
+        cleanup, so the release is also bound to the garbage collection of the stream.
+        """
+        released = False
+
+        def release(failed: bool = False) -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.release(failed)
+
+        weakref.finalize(stream, release)
+        return release
+
+    async def retire(self) -> None:
+        """Close the client now if it is idle, otherwise once the last request in flight ends"""
+        self.retired = True
+        if self.in_flight <= 0:
+            await self._close()
+
+    def _start_close(self) -> None:
+        if self._close_started:
+            return
+        task = self.loop.create_task(self._close())
+        _closing_tasks.add(task)
+        task.add_done_callback(_closing_tasks.discard)
+
+    async def _close(self) -> None:
+        if self._close_started:
+            return
+        self._close_started = True
+        try:
+            await self.close()
+        except Exception as e:
+            logger.warning(f"Failed to close pooled {self.kind} client for {self.base_url}: {e}")
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[Any]:
+        """Use the client for one request"""
+        self.acquire()
+        failed = False
+        try:
+            yield self.client
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.release(failed)
+
+    def metrics(self) -> dict[str, Any]:
+        pool_max = open_connections = idle_connections = None
+        # httpx does not expose pool state publicly, read it from httpcore when possible
+        pool = getattr(getattr(self.http_client, "_transport", None), "_pool", None)
+        if pool is not None:
+            pool_max = getattr(pool, "_max_connections", None)
+            connections = list(getattr(pool, "connections", []) or [])
+            open_connections = len(connections)
+            idle_connections = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "kind": self.kind,
+            "base_url": self.base_url,
+            "age_seconds": round(time.time() - self.created_at, 1),
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_connections": pool_max,
+            "open_connections": open_connections,
+            "idle_connections": idle_connections,
+            "utilization": round(self.in_flight / pool_max, 3) if pool_max else None,
+        }
+
+
+class ClientRegistry:
+    """Clients keyed by binding, endpoint, credentials, config and event loop
+
+    httpx clients are bound to the event loop they were first used in, so a client is
+    never shared across loops. Entries of closed loops or closed clients are replaced.
+    """
+
+    def __init__(self):
+        self._clients: dict[tuple, PooledClient] = {}
+        # event loop -> number of owners that retained its clients
+        self._owners: dict[asyncio.AbstractEventLoop, int] = {}
+
+    @staticmethod
+    def _key(kind: str, base_url: str | None, api_key: str | None, config: Any) -> tuple:
+        # Never keep the raw api key around in the registry
+        api_key_digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else None
+        config_repr = json.dumps(config or {}, sort_keys=True, default=repr)
+        return (kind, base_url, api_key_digest, config_repr, id(asyncio.get_running_loop()))
+
+    def get(
+        self,
+        kind: str,
+        base_url: str | None,
+        api_key: str | None,
+        config: Any,
+        factory: Callable[[], tuple[Any, Callable[[], Awaitable[None]], Any]],
+    ) -> PooledClient:
+        """Return the shared client, factory() -> (client, async close, httpx client) creates it on first use"""
+        key = self._key(kind, base_url, api_key, config)
+        entry = self._clients.get(key)
+        if entry is None or entry.closed:
+            client, close, http_client = factory()
+            entry = PooledClient(
+                kind=kind,
+                base_url=base_url,
+                client=client,
+                close=close,
+                loop=asyncio.get_running_loop(),
+                http_client=http_client,
+            )
+            self._clients[key] = entry
+            logger.debug(f"Created pooled {kind} client for {base_url}")
+        return entry
+
+    def retain(self) -> None:
+        """Register an owner of the clients of the running event loop, pair with release()"""
+        loop = asyncio.get_running_loop()
+        self._owners[loop] = self._owners.get(loop, 0) + 1
+
+    async def release(self) -> None:
+        """Unregister an owner, the clients of the running loop are closed with its last owner
+
+        Clients of closed loops are forgotten as well.
+        """
+        loop = asyncio.get_running_loop()
+        remaining = self._owners.pop(loop, 0) - 1
+        if remaining > 0:
+            self._owners[loop] = remaining
+            return
+        for closed_loop in [owner_loop for owner_loop in self._owners if owner_loop.is_closed()]:
+            del self._owners[closed_loop]
+        for key, entry in list(self._clients.items()):
+            if entry.loop.is_closed():
+                del self._clients[key]
+            elif entry.loop is loop:
+                del self._clients[key]
+                await entry.retire()
+
+    def metrics(self) -> list[dict[str, Any]]:
+        return [entry.metrics() for entry in self._clients.values() if not entry.closed]
+
+
+client_registry = ClientRegistry()
@@ -17,10 +17,31 @@ import numpy as np
 import ollama
 from lightrag.api import __api_version__
 from lightrag.exceptions import APIConnectionError, APITimeoutError, RateLimitError
+from lightrag.llm.client_pool import PooledClient, client_registry, http_client_options
 from lightrag.utils import logger
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 
+def get_ollama_async_client(host: str | None, timeout: float, api_key: str | None = None) -> PooledClient:
+    """Return the shared ollama.AsyncClient for this host, creating it on first use.
+
+    The client keeps a bounded keep-alive connection pool that is reused across requests.
+    It is closed when the last LightRAG instance using it is finalized, callers must not close it.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": f"LightRAG/{__api_version__}",
+    }
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+
+    def factory():
+        client = ollama.AsyncClient(host=host, timeout=timeout, headers=headers, **http_client_options())
+        return client, client._client.aclose, client._client
+
+    return client_registry.get("ollama", host, api_key, {"timeout": timeout}, factory)
+
+
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -41,15 +62,12 @@ async def _ollama_model_if_cache(
     timeout = kwargs.pop("timeout", None) or 600  # Default timeout 300s
     kwargs.pop("hashing_kv", None)
     api_key = kwargs.pop("api_key", None)
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": f"LightRAG/{__api_version__}",
-    }
-    if api_key:
-        headers["Authorization"] = f"Bearer {api_key}"
 
-    ollama_client = ollama.AsyncClient(host=host, timeout=timeout, headers=headers)
+    pooled_client = get_ollama_async_client(host, timeout, api_key)
+    ollama_client = pooled_client.client
+    released = False
 
+    pooled_client.acquire()
     try:
         messages = []
         if system_prompt:
@@ -62,20 +80,23 @@ async def _ollama_model_if_cache(
             """cannot cache stream response and process reasoning"""
 
             async def inner():
+                failed = False
                 try:
                     async for chunk in response:
                         yield chunk["message"]["content"]
                 except Exception as e:
                     logger.error(f"Error in stream response: {str(e)}")
+                    failed = True
                     raise
                 finally:
-                    try:
-                        await ollama_client._client.aclose()
-                        logger.debug("Successfully closed Ollama client for streaming")
-                    except Exception as close_error:
-                        logger.warning(f"Failed to close Ollama client: {close_error}")
-
-            return inner()
+                    # The request is over once the stream is consumed, the client stays open for reuse
+                    release_stream(failed)
+
+            stream_response = inner()
+            # The stream releases the request slot itself, or its garbage collection if never iterated
+            release_stream = pooled_client.stream_releaser(stream_response)
+            released = True
+            return stream_response
         else:
             model_response = response["message"]["content"]
 
@@ -87,19 +108,13 @@ async def _ollama_model_if_cache(
 
             return model_response
     except Exception as e:
-        try:
-            await ollama_client._client.aclose()
-            logger.debug("Successfully closed Ollama client after exception")
-        except Exception as close_error:
-            logger.warning(f"Failed to close Ollama client after exception: {close_error}")
+        if not released:
+            released = True
+            pooled_client.release(failed=True)
         raise e
     finally:
-        if not stream:
-            try:
-                await ollama_client._client.aclose()
-                logger.debug("Successfully closed Ollama client for non-streaming response")
-            except Exception as close_error:
-                logger.warning(f"Failed to close Ollama client in finally block: {close_error}")
+        if not released:
+            pooled_client.release()
 
 
 async def ollama_model_complete(
@@ -120,32 +135,15 @@ async def ollama_model_complete(
 
 async def ollama_embed(texts: list[str], embed_model, **kwargs) -> np.ndarray:
     api_key = kwargs.pop("api_key", None)
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": f"LightRAG/{__api_version__}",
-    }
-    if api_key:
-        headers["Authorization"] = f"Bearer {api_key}"
-
     host = kwargs.pop("host", None)
     timeout = kwargs.pop("timeout", None) or 300  # Default time out 300s
 
-    ollama_client = ollama.AsyncClient(host=host, timeout=timeout, headers=headers)
+    pooled_client = get_ollama_async_client(host, timeout, api_key)
 
     try:
-        data = await ollama_client.embed(model=embed_model, input=texts)
+        async with pooled_client.lease() as ollama_client:
+            data = await ollama_client.embed(model=embed_model, input=texts)
         return np.array(data["embeddings"])
     except Exception as e:
         logger.error(f"Error in ollama_embed: {str(e)}")
-        try:
-            await ollama_client._client.aclose()
-            logger.debug("Successfully closed Ollama client after exception in embed")
-        except Exception as close_error:
-            logger.warning(f"Failed to close Ollama client after exception in embed: {close_error}")
         raise e
-    finally:
-        try:
-            await ollama_client._client.aclose()
-            logger.debug("Successfully closed Ollama client after embed")
-        except Exception as close_error:
-            logger.warning(f"Failed to close Ollama client after embed: {close_error}")
@@ -20,6 +20,7 @@ from typing import Any, Union
 import numpy as np
 from dotenv import load_dotenv
 from lightrag.api import __api_version__
+from lightrag.llm.client_pool import PooledClient, client_registry, http_client_options
 from lightrag.types import GPTKeywordExtractionFormat
 from lightrag.utils import (
     locate_json_string_body_from_string,
@@ -27,7 +28,7 @@ from lightrag.utils import (
     safe_unicode_decode,
     wrap_embedding_func_with_attrs,
 )
-from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, RateLimitError
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, DefaultAsyncHttpxClient, RateLimitError
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
 # use the .env that is inside the current folder
@@ -85,6 +86,42 @@ def create_openai_async_client(
     return AsyncOpenAI(**merged_configs)
 
 
+def get_openai_async_client(
+    api_key: str | None = None,
+    base_url: str | None = None,
+    client_configs: dict[str, Any] = None,
+) -> PooledClient:
+    """Return the shared AsyncOpenAI client for this endpoint, creating it on first use.
+
+    The client keeps a bounded keep-alive connection pool (HTTP/2 when available) that is
+    reused across requests. It is closed when the last LightRAG instance using it is finalized,
+    callers must not close it.
+
+    Args:
+        api_key: OpenAI API key. If None, uses the OPENAI_API_KEY environment variable.
+        base_url: Base URL for the OpenAI API. If None, uses OPENAI_API_BASE or the default OpenAI API URL.
+        client_configs: Additional configuration options for the AsyncOpenAI client.
+            An http_client given here is used as is instead of a pooled one.
+
+    Returns:
+        The pooled client entry, its client attribute is the AsyncOpenAI instance.
+    """
+    if not api_key:
+        api_key = os.environ["OPENAI_API_KEY"]
+    if base_url is None:
+        base_url = os.environ.get("OPENAI_API_BASE", "https://api.openai.com/v1")
+    client_configs = client_configs or {}
+
+    def factory():
+        configs = dict(client_configs)
+        if configs.get("http_client") is None:
+            configs["http_client"] = DefaultAsyncHttpxClient(**http_client_options())
+        client = create_openai_async_client(api_key=api_key, base_url=base_url, client_configs=configs)
+        return client, client.close, configs["http_client"]
+
+    return client_registry.get("openai", base_url, api_key, client_configs, factory)
+
+
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -141,8 +178,9 @@ async def openai_complete_if_cache(
     # Extract client configuration options
     client_configs = kwargs.pop("openai_client_configs", {})
 
-    # Create the OpenAI client
-    openai_async_client = create_openai_async_client(api_key=api_key, base_url=base_url, client_configs=client_configs)
+    # Get the shared OpenAI client, it stays open for reuse by later requests
+    pooled_client = get_openai_async_client(api_key=api_key, base_url=base_url, client_configs=client_configs)
+    openai_async_client = pooled_client.client
 
     # Remove special kwargs that shouldn't be passed to OpenAI
     kwargs.pop("hashing_kv", None)
@@ -163,27 +201,28 @@ async def openai_complete_if_cache(
     verbose_debug(f"Query: {prompt}")
     logger.debug("===== Sending Query to LLM =====")
 
+    pooled_client.acquire()
     try:
-        # Don't use async with context manager, use client directly
+        # Don't use async with context manager, the client is shared
         if "response_format" in kwargs:
             response = await openai_async_client.beta.chat.completions.parse(model=model, messages=messages, **kwargs)
         else:
             response = await openai_async_client.chat.completions.create(model=model, messages=messages, **kwargs)
     except APIConnectionError as e:
         logger.error(f"OpenAI API Connection Error: {e}")
-        await openai_async_client.close()  # Ensure client is closed
+        pooled_client.release(failed=True)
         raise
     except RateLimitError as e:
         logger.error(f"OpenAI API Rate Limit Error: {e}")
-        await openai_async_client.close()  # Ensure client is closed
+        pooled_client.release(failed=True)
         raise
     except APITimeoutError as e:
         logger.error(f"OpenAI API Timeout Error: {e}")
-        await openai_async_client.close()  # Ensure client is closed
+        pooled_client.release(failed=True)
         raise
     except Exception as e:
         logger.error(f"OpenAI API Call Failed,\nModel: {model},\nParams: {kwargs}, Got: {e}")
-        await openai_async_client.close()  # Ensure client is closed
+        pooled_client.release(failed=True)
         raise
 
     if hasattr(response, "__aiter__"):
@@ -191,6 +230,7 @@ async def openai_complete_if_cache(
         async def inner():
             # Track if we've started iterating
             iteration_started = False
+            failed = False
             try:
                 iteration_started = True
                 async for chunk in response:
@@ -218,8 +258,7 @@ async def openai_complete_if_cache(
                         logger.debug("Successfully closed stream response after error")
                     except Exception as close_error:
                         logger.warning(f"Failed to close stream response: {close_error}")
-                # Ensure client is closed in case of exception
-                await openai_async_client.close()
+                failed = True
                 raise
             finally:
                 # Ensure resources are released even if no exception occurs
@@ -230,16 +269,16 @@ async def openai_complete_if_cache(
                     except Exception as close_error:
                         logger.warning(f"Failed to close stream response in finally block: {close_error}")
 
-                # This prevents resource leaks since the caller doesn't handle closing
-                try:
-                    await openai_async_client.close()
-                    logger.debug("Successfully closed OpenAI client for streaming response")
-                except Exception as client_close_error:
-                    logger.warning(f"Failed to close OpenAI client in streaming finally block: {client_close_error}")
+                # The request is over once the stream is consumed, the client stays open for reuse
+                release_stream(failed)
 
-        return inner()
+        stream_response = inner()
+        # The stream releases the request slot itself, or its garbage collection if never iterated
+        release_stream = pooled_client.stream_releaser(stream_response)
+        return stream_response
 
     else:
+        failed = False
         try:
             if (
                 not response
@@ -248,14 +287,14 @@ async def openai_complete_if_cache(
                 or not hasattr(response.choices[0].message, "content")
             ):
                 logger.error("Invalid response from OpenAI API")
-                await openai_async_client.close()  # Ensure client is closed
+                failed = True
                 raise InvalidResponseError("Invalid response from OpenAI API")
 
             content = response.choices[0].message.content
 
             if not content or content.strip() == "":
                 logger.error("Received empty content from OpenAI API")
-                await openai_async_client.close()  # Ensure client is closed
+                failed = True
                 raise InvalidResponseError("Received empty content from OpenAI API")
 
             if r"\u" in content:
@@ -274,8 +313,8 @@ async def openai_complete_if_cache(
 
             return content
         finally:
-            # Ensure client is closed in all cases for non-streaming responses
-            await openai_async_client.close()
+            # Release the request slot, the client stays open for reuse
+            pooled_client.release(failed)
 
 
 async def openai_complete(
@@ -401,9 +440,9 @@ async def openai_embed(
         RateLimitError: If the OpenAI API rate limit is exceeded.
         APITimeoutError: If the OpenAI API request times out.
     """
-    # Create the OpenAI client
-    openai_async_client = create_openai_async_client(api_key=api_key, base_url=base_url, client_configs=client_configs)
+    # Get the shared OpenAI client, it stays open for reuse by later requests
+    pooled_client = get_openai_async_client(api_key=api_key, base_url=base_url, client_configs=client_configs)
 
-    async with openai_async_client:
+    async with pooled_client.lease() as openai_async_client:
         response = await openai_async_client.embeddings.create(model=model, input=texts, encoding_format="float")
         return np.array([dp.embedding for dp in response.data])
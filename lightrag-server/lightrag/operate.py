@@ -5,9 +5,10 @@ import json
 import os
 import re
 import time
-from collections import Counter, defaultdict
+import weakref
+from collections import Counter, OrderedDict, defaultdict
 from functools import partial
-from typing import Any, AsyncIterator
+from typing import Any, AsyncIterator, Awaitable, Iterable, Iterator
 
 from dotenv import load_dotenv
 
@@ -15,7 +16,10 @@ from .base import BaseGraphStorage, BaseKVStorage, BaseVectorStorage, QueryParam
 from .prompt import GRAPH_FIELD_SEP, PROMPTS
 from .utils import (
     CacheData,
+    FairRequestScheduler,
+    MicroBatcher,
     Tokenizer,
+    cache_stream_on_completion,
     clean_str,
     compute_args_hash,
     compute_mdhash_id,
@@ -26,6 +30,7 @@ from .utils import (
     normalize_extracted_info,
     pack_user_ass_to_openai_messages,
     process_combine_contexts,
+    replay_cached_stream,
     save_to_cache,
     split_string_by_multi_markers,
     truncate_list_by_token_size,
@@ -37,6 +42,47 @@ from .utils import (
 # the OS environment variables take precedence over the .env file
 load_dotenv(dotenv_path=".env", override=False)
 
+# Optimistic merge rounds before conflicting items are merged while holding the graph locks
+_MERGE_MAX_ATTEMPTS = 3
+
+# Chunk fields used to build query contexts, the only ones fetched from the KV storage
+_QUERY_CHUNK_FIELDS = ["content", "file_path", "tokens"]
+
+# id(text_chunks_db) -> (weak reference to it, chunk records by id in least recently used order)
+_chunk_caches: dict[int, tuple[weakref.ref, OrderedDict[str, dict]]] = {}
+
+# Characters tokenized at a time by the token chunker, so the token list of a large document is never built whole
+CHUNK_BLOCK_SIZE = 1 << 20
+
+
+def _split_by_token_windows(
+    tokenizer: Tokenizer,
+    content: str,
+    overlap_token_size: int,
+    max_token_size: int,
+) -> list[tuple[int, str]]:
+    """Split content into overlapping token windows, returns (token_count, text) pairs
+
+    The window text is sliced from content using token start offsets instead of decoding
+    every window back from tokens. Tokenizers without offset support fall back to decoding.
+    """
+    step = max_token_size - overlap_token_size
+    try:
+        tokens, offsets = tokenizer.encode_with_offsets(content)
+    except NotImplementedError:
+        tokens = tokenizer.encode(content)
+        return [
+            (min(max_token_size, len(tokens) - start), tokenizer.decode(tokens[start : start + max_token_size]))
+            for start in range(0, len(tokens), step)
+        ]
+
+    windows = []
+    for start in range(0, len(tokens), step):
+        end = start + max_token_size
+        char_end = offsets[end] if end < len(tokens) else len(content)
+        windows.append((min(max_token_size, len(tokens) - start), content[offsets[start] : char_end]))
+    return windows
+
 
 def chunking_by_token_size(
     tokenizer: Tokenizer,
@@ -46,7 +92,6 @@ def chunking_by_token_size(
     overlap_token_size: int = 128,
     max_token_size: int = 1024,
 ) -> list[dict[str, Any]]:
-    tokens = tokenizer.encode(content)
     results: list[dict[str, Any]] = []
     if split_by_character:
         raw_chunks = content.split(split_by_character)
@@ -59,9 +104,9 @@ def chunking_by_token_size(
             for chunk in raw_chunks:
                 _tokens = tokenizer.encode(chunk)
                 if len(_tokens) > max_token_size:
-                    for start in range(0, len(_tokens), max_token_size - overlap_token_size):
-                        chunk_content = tokenizer.decode(_tokens[start : start + max_token_size])
-                        new_chunks.append((min(max_token_size, len(_tokens) - start), chunk_content))
+                    new_chunks.extend(
+                        _split_by_token_windows(tokenizer, chunk, overlap_token_size, max_token_size)
+                    )
                 else:
                     new_chunks.append((len(_tokens), chunk))
         for index, (_len, chunk) in enumerate(new_chunks):
@@ -73,18 +118,77 @@ def chunking_by_token_size(
                 }
             )
     else:
-        for index, start in enumerate(range(0, len(tokens), max_token_size - overlap_token_size)):
-            chunk_content = tokenizer.decode(tokens[start : start + max_token_size])
-            results.append(
-                {
-                    "tokens": min(max_token_size, len(tokens) - start),
-                    "content": chunk_content.strip(),
-                    "chunk_order_index": index,
-                }
-            )
+        # Documents shorter than a block are split in one go, exactly as before
+        blocks = (content[i : i + CHUNK_BLOCK_SIZE] for i in range(0, len(content), CHUNK_BLOCK_SIZE))
+        results.extend(
+            chunking_by_token_size_stream(tokenizer, blocks, overlap_token_size, max_token_size, CHUNK_BLOCK_SIZE)
+        )
     return results
 
 
+def chunking_by_token_size_stream(
+    tokenizer: Tokenizer,
+    contents: Iterable[str],
+    overlap_token_size: int = 128,
+    max_token_size: int = 1024,
+    block_size: int = CHUNK_BLOCK_SIZE,
+) -> Iterator[dict[str, Any]]:
+    """Chunk a stream of text pieces by token size with bounded memory
+
+    Text pieces are buffered until about block_size characters are available, then every
+    window that lies safely before the end of the buffer is emitted and only the text from
+    the next window start onwards is kept. The last few tokens of a block are never emitted
+    early because their tokenization can change once the following text arrives.
+
+    Args:
+        tokenizer: Tokenizer used for counting and splitting
+        contents: Iterable of consecutive text pieces, e.g. lines or blocks read from a file
+        overlap_token_size: Number of overlapping tokens between consecutive chunks
+        max_token_size: Maximum number of tokens per chunk
+        block_size: Number of buffered characters that triggers tokenization of the buffer
+
+    Yields:
+        Chunk dicts with the same keys as chunking_by_token_size
+    """
+    step = max_token_size - overlap_token_size
+    # Tokens at the end of the buffer may merge with text that has not arrived yet
+    tail_guard = 16
+    buffer = ""
+    index = 0
+
+    def _chunk(token_count: int, text: str) -> dict[str, Any]:
+        nonlocal index
+        chunk = {"tokens": token_count, "content": text.strip(), "chunk_order_index": index}
+        index += 1
+        return chunk
+
+    for piece in contents:
+        buffer += piece
+        if len(buffer) < block_size:
+            continue
+
+        try:
+            tokens, offsets = tokenizer.encode_with_offsets(buffer)
+        except NotImplementedError:
+            tokens, offsets = tokenizer.encode(buffer), None
+
+        start = 0
+        while start + max_token_size + tail_guard <= len(tokens):
+            end = start + max_token_size
+            if offsets is not None:
+                yield _chunk(max_token_size, buffer[offsets[start] : offsets[end]])
+            else:
+                yield _chunk(max_token_size, tokenizer.decode(tokens[start:end]))
+            start += step
+
+        if start:
+            buffer = buffer[offsets[start] :] if offsets is not None else tokenizer.decode(tokens[start:])
+
+    if buffer:
+        for token_count, text in _split_by_token_windows(tokenizer, buffer, overlap_token_size, max_token_size):
+            yield _chunk(token_count, text)
+
+
 async def _handle_entity_relation_summary(
     entity_or_relation_name: str,
     description: str,
@@ -215,22 +319,24 @@ async def _handle_single_relationship_extraction(
     )
 
 
-async def _merge_nodes_then_upsert(
+async def _merge_node_data(
     entity_name: str,
     nodes_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_node: dict | None,
     global_config: dict,
     pipeline_status: dict = None,
     pipeline_status_lock=None,
     llm_response_cache: BaseKVStorage | None = None,
-):
-    """Get existing nodes from knowledge graph use name,if exists, merge data, else create, then upsert."""
+) -> dict:
+    """Merge extracted node fragments with the node already stored in the graph (if any)
+
+    Nothing is written to the graph, the caller upserts the returned properties.
+    """
     already_entity_types = []
     already_source_ids = []
     already_description = []
     already_file_paths = []
 
-    already_node = await knowledge_graph_inst.get_node(entity_name)
     if already_node is not None:
         already_entity_types.append(already_node["entity_type"])
         already_source_ids.extend(split_string_by_multi_markers(already_node["source_id"], [GRAPH_FIELD_SEP]))
@@ -275,7 +381,7 @@ async def _merge_nodes_then_upsert(
                     pipeline_status["latest_message"] = status_message
                     pipeline_status["history_messages"].append(status_message)
 
-    node_data = dict(
+    return dict(
         entity_id=entity_name,
         entity_type=entity_type,
         description=description,
@@ -283,55 +389,48 @@ async def _merge_nodes_then_upsert(
         file_path=file_path,
         created_at=int(time.time()),
     )
-    await knowledge_graph_inst.upsert_node(
-        entity_name,
-        node_data=node_data,
-    )
-    node_data["entity_name"] = entity_name
-    return node_data
 
 
-async def _merge_edges_then_upsert(
+async def _merge_edge_data(
     src_id: str,
     tgt_id: str,
     edges_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_edge: dict | None,
     global_config: dict,
     pipeline_status: dict = None,
     pipeline_status_lock=None,
     llm_response_cache: BaseKVStorage | None = None,
-):
-    if src_id == tgt_id:
-        return None
+) -> dict:
+    """Merge extracted edge fragments with the edge already stored in the graph (if any)
 
+    Nothing is written to the graph, the caller upserts the returned properties.
+    """
     already_weights = []
     already_source_ids = []
     already_description = []
     already_keywords = []
     already_file_paths = []
 
-    if await knowledge_graph_inst.has_edge(src_id, tgt_id):
-        already_edge = await knowledge_graph_inst.get_edge(src_id, tgt_id)
-        # Handle the case where get_edge returns None or missing fields
-        if already_edge:
-            # Get weight with default 0.0 if missing
-            already_weights.append(already_edge.get("weight", 0.0))
+    # Handle the case where the stored edge is missing or lacks fields
+    if already_edge:
+        # Get weight with default 0.0 if missing
+        already_weights.append(already_edge.get("weight", 0.0))
 
-            # Get source_id with empty string default if missing or None
-            if already_edge.get("source_id") is not None:
-                already_source_ids.extend(split_string_by_multi_markers(already_edge["source_id"], [GRAPH_FIELD_SEP]))
+        # Get source_id with empty string default if missing or None
+        if already_edge.get("source_id") is not None:
+            already_source_ids.extend(split_string_by_multi_markers(already_edge["source_id"], [GRAPH_FIELD_SEP]))
 
-            # Get file_path with empty string default if missing or None
-            if already_edge.get("file_path") is not None:
-                already_file_paths.extend(split_string_by_multi_markers(already_edge["file_path"], [GRAPH_FIELD_SEP]))
+        # Get file_path with empty string default if missing or None
+        if already_edge.get("file_path") is not None:
+            already_file_paths.extend(split_string_by_multi_markers(already_edge["file_path"], [GRAPH_FIELD_SEP]))
 
-            # Get description with empty string default if missing or None
-            if already_edge.get("description") is not None:
-                already_description.append(already_edge["description"])
+        # Get description with empty string default if missing or None
+        if already_edge.get("description") is not None:
+            already_description.append(already_edge["description"])
 
-            # Get keywords with empty string default if missing or None
-            if already_edge.get("keywords") is not None:
-                already_keywords.extend(split_string_by_multi_markers(already_edge["keywords"], [GRAPH_FIELD_SEP]))
+        # Get keywords with empty string default if missing or None
+        if already_edge.get("keywords") is not None:
+            already_keywords.extend(split_string_by_multi_markers(already_edge["keywords"], [GRAPH_FIELD_SEP]))
 
     # Process edges_data with None checks
     weight = sum([dp["weight"] for dp in edges_data] + already_weights)
@@ -359,30 +458,6 @@ async def _merge_edges_then_upsert(
         set([dp["file_path"] for dp in edges_data if dp.get("file_path")] + already_file_paths)
     )
 
-    for need_insert_id in [src_id, tgt_id]:
-        if not (await knowledge_graph_inst.has_node(need_insert_id)):
-            # # Discard this edge if the node does not exist
-            # if need_insert_id == src_id:
-            #     logger.warning(
-            #         f"Discard edge: {src_id} - {tgt_id} | Source node missing"
-            #     )
-            # else:
-            #     logger.warning(
-            #         f"Discard edge: {src_id} - {tgt_id} | Target node missing"
-            #     )
-            # return None
-            await knowledge_graph_inst.upsert_node(
-                need_insert_id,
-                node_data={
-                    "entity_id": need_insert_id,
-                    "source_id": source_id,
-                    "description": description,
-                    "entity_type": "UNKNOWN",
-                    "file_path": file_path,
-                    "created_at": int(time.time()),
-                },
-            )
-
     force_llm_summary_on_merge = global_config["force_llm_summary_on_merge"]
 
     num_fragment = description.count(GRAPH_FIELD_SEP) + 1
@@ -412,30 +487,15 @@ async def _merge_edges_then_upsert(
                     pipeline_status["latest_message"] = status_message
                     pipeline_status["history_messages"].append(status_message)
 
-    await knowledge_graph_inst.upsert_edge(
-        src_id,
-        tgt_id,
-        edge_data=dict(
-            weight=weight,
-            description=description,
-            keywords=keywords,
-            source_id=source_id,
-            file_path=file_path,
-            created_at=int(time.time()),
-        ),
-    )
-
-    edge_data = dict(
-        src_id=src_id,
-        tgt_id=tgt_id,
+    return dict(
+        weight=weight,
         description=description,
         keywords=keywords,
         source_id=source_id,
         file_path=file_path,
+        created_at=int(time.time()),
     )
 
-    return edge_data
-
 
 async def merge_nodes_and_edges(
     chunk_results: list,
@@ -449,9 +509,18 @@ async def merge_nodes_and_edges(
     current_file_number: int = 0,
     total_files: int = 0,
     file_path: str = "unknown_source",
+    doc_id: str | None = None,
+    chunk_ids: list[str] | None = None,
+    doc_index: BaseKVStorage | None = None,
 ) -> None:
     """Merge nodes and edges from extraction results
 
+    The merge runs in three phases so LLM summaries never hold a graph lock: the stored
+    entities and relations are snapshotted under their keyed locks, merged and summarized
+    without any lock, then written in one batch after checking that none of them changed
+    since the snapshot. Items changed by a concurrent merge are re-merged and the apply
+    is retried.
+
     Args:
         chunk_results: List of tuples (maybe_nodes, maybe_edges) containing extracted entities and relationships
         knowledge_graph_inst: Knowledge graph storage
@@ -461,6 +530,9 @@ async def merge_nodes_and_edges(
         pipeline_status: Pipeline status dictionary
         pipeline_status_lock: Lock for pipeline status
         llm_response_cache: LLM response cache
+        doc_id: Document the chunk results belong to
+        chunk_ids: Chunk ids of the document
+        doc_index: Reverse index storage, records the chunks, entities and relations touched by doc_id
     """
     # Get lock manager from shared storage
     from .kg.shared_storage import get_graph_db_lock
@@ -479,60 +551,124 @@ async def merge_nodes_and_edges(
             sorted_edge_key = tuple(sorted(edge_key))
             all_edges[sorted_edge_key].extend(edges)
 
-    # Centralized processing of all nodes and edges
-    entities_data = []
-    relationships_data = []
-
-    # Merge nodes and edges
-    # Use graph database lock to ensure atomic merges and updates
-    graph_db_lock = get_graph_db_lock(enable_logging=False)
-    async with graph_db_lock:
-        async with pipeline_status_lock:
-            log_message = f"Merging stage {current_file_number}/{total_files}: {file_path}"
-            logger.info(log_message)
-            pipeline_status["latest_message"] = log_message
-            pipeline_status["history_messages"].append(log_message)
-
-        # Process and update all entities at once
-        for entity_name, entities in all_nodes.items():
-            entity_data = await _merge_nodes_then_upsert(
-                entity_name,
-                entities,
-                knowledge_graph_inst,
-                global_config,
-                pipeline_status,
-                pipeline_status_lock,
-                llm_response_cache,
-            )
-            entities_data.append(entity_data)
-
-        # Process and update all relationships at once
-        for edge_key, edges in all_edges.items():
-            edge_data = await _merge_edges_then_upsert(
-                edge_key[0],
-                edge_key[1],
-                edges,
-                knowledge_graph_inst,
-                global_config,
-                pipeline_status,
-                pipeline_status_lock,
-                llm_response_cache,
-            )
-            if edge_data is not None:
-                relationships_data.append(edge_data)
+    async with pipeline_status_lock:
+        log_message = f"Merging stage {current_file_number}/{total_files}: {file_path}"
+        logger.info(log_message)
+        pipeline_status["latest_message"] = log_message
+        pipeline_status["history_messages"].append(log_message)
+
+    # Edge endpoints are read alongside the entities so missing ones can be created in the same write
+    merge_edges = {edge_key: edges for edge_key, edges in all_edges.items() if edge_key[0] != edge_key[1]}
+    node_ids = list(all_nodes.keys())
+    seen_node_ids = set(node_ids)
+    for src_id, tgt_id in merge_edges:
+        for node_id in (src_id, tgt_id):
+            if node_id not in seen_node_ids:
+                seen_node_ids.add(node_id)
+                node_ids.append(node_id)
+    edge_pairs = [{"src": src_id, "tgt": tgt_id} for src_id, tgt_id in merge_edges]
+    lock_keys = node_ids + [f"{src_id}{GRAPH_FIELD_SEP}{tgt_id}" for src_id, tgt_id in merge_edges]
+
+    async def _read_graph_state() -> tuple[dict[str, dict], dict[tuple[str, str], dict]]:
+        nodes, edges = await asyncio.gather(
+            knowledge_graph_inst.get_nodes_batch(node_ids),
+            knowledge_graph_inst.get_edges_batch(edge_pairs),
+        )
+        # Copy, in-memory backends hand out their live attribute dicts
+        return (
+            {node_id: dict(node) for node_id, node in nodes.items() if node is not None},
+            {edge_key: dict(edge) for edge_key, edge in edges.items() if edge is not None},
+        )
 
-        # Update total counts
-        total_entities_count = len(entities_data)
-        total_relations_count = len(relationships_data)
+    merged_nodes: dict[str, dict] = {}
+    merged_edges: dict[tuple[str, str], dict] = {}
+
+    async def _merge_into(entity_names, edge_keys, nodes_snapshot, edges_snapshot) -> None:
+        # LLM summaries for different items run concurrently, bounded by llm_model_max_async
+        node_results, edge_results = await asyncio.gather(
+            asyncio.gather(
+                *[
+                    _merge_node_data(
+                        entity_name,
+                        all_nodes[entity_name],
+                        nodes_snapshot.get(entity_name),
+                        global_config,
+                        pipeline_status,
+                        pipeline_status_lock,
+                        llm_response_cache,
+                    )
+                    for entity_name in entity_names
+                ]
+            ),
+            asyncio.gather(
+                *[
+                    _merge_edge_data(
+                        edge_key[0],
+                        edge_key[1],
+                        merge_edges[edge_key],
+                        edges_snapshot.get(edge_key),
+                        global_config,
+                        pipeline_status,
+                        pipeline_status_lock,
+                        llm_response_cache,
+                    )
+                    for edge_key in edge_keys
+                ]
+            ),
+        )
+        merged_nodes.update(zip(entity_names, node_results))
+        merged_edges.update(zip(edge_keys, edge_results))
+
+    async def _apply(current_nodes: dict[str, dict]) -> list[str]:
+        """Write the merged items, returns the ids of all nodes written including placeholders"""
+        nodes_to_upsert = {entity_name: merged_nodes[entity_name] for entity_name in all_nodes}
+        edges_to_upsert = {edge_key: merged_edges[edge_key] for edge_key in merge_edges}
+
+        # Edge endpoints that are neither stored nor extracted get a placeholder node,
+        # the first relation referencing the endpoint provides its properties
+        for (src_id, tgt_id), edge_props in edges_to_upsert.items():
+            for node_id in (src_id, tgt_id):
+                if node_id not in nodes_to_upsert and node_id not in current_nodes:
+                    nodes_to_upsert[node_id] = {
+                        "entity_id": node_id,
+                        "source_id": edge_props["source_id"],
+                        "description": edge_props["description"],
+                        "entity_type": "UNKNOWN",
+                        "file_path": edge_props["file_path"],
+                        "created_at": int(time.time()),
+                    }
+
+        entities_data = [{**merged_nodes[entity_name], "entity_name": entity_name} for entity_name in all_nodes]
+        relationships_data = [
+            {
+                "src_id": src_id,
+                "tgt_id": tgt_id,
+                "description": edge_props["description"],
+                "keywords": edge_props["keywords"],
+                "source_id": edge_props["source_id"],
+                "file_path": edge_props["file_path"],
+            }
+            for (src_id, tgt_id), edge_props in edges_to_upsert.items()
+        ]
 
-        log_message = f"Updating {total_entities_count} entities  {current_file_number}/{total_files}: {file_path}"
+        log_message = (
+            f"Updating {len(entities_data)} entities, {len(relationships_data)} relations "
+            f"{current_file_number}/{total_files}: {file_path}"
+        )
         logger.info(log_message)
         if pipeline_status is not None:
             async with pipeline_status_lock:
                 pipeline_status["latest_message"] = log_message
                 pipeline_status["history_messages"].append(log_message)
 
-        # Update vector databases with all collected data
+        async def _write_graph():
+            # Nodes first, edges need both endpoints to exist
+            await knowledge_graph_inst.upsert_nodes_batch(nodes_to_upsert)
+            await knowledge_graph_inst.upsert_edges_batch(edges_to_upsert)
+
+        # Graph and vector writes are independent of each other and run concurrently
+        write_tasks = [_write_graph()]
+
         if entity_vdb is not None and entities_data:
             data_for_vdb = {
                 compute_mdhash_id(dp["entity_name"], prefix="ent-"): {
@@ -544,14 +680,7 @@ async def merge_nodes_and_edges(
                 }
                 for dp in entities_data
             }
-            await entity_vdb.upsert(data_for_vdb)
-
-        log_message = f"Updating {total_relations_count} relations {current_file_number}/{total_files}: {file_path}"
-        logger.info(log_message)
-        if pipeline_status is not None:
-            async with pipeline_status_lock:
-                pipeline_status["latest_message"] = log_message
-                pipeline_status["history_messages"].append(log_message)
+            write_tasks.append(entity_vdb.upsert(data_for_vdb))
 
         if relationships_vdb is not None and relationships_data:
             data_for_vdb = {
@@ -565,7 +694,58 @@ async def merge_nodes_and_edges(
                 }
                 for dp in relationships_data
             }
-            await relationships_vdb.upsert(data_for_vdb)
+            write_tasks.append(relationships_vdb.upsert(data_for_vdb))
+
+        await asyncio.gather(*write_tasks)
+        return list(nodes_to_upsert)
+
+    # Phase 1: snapshot the stored items under their keyed locks
+    async with get_graph_db_lock(enable_logging=False, keys=lock_keys):
+        nodes_snapshot, edges_snapshot = await _read_graph_state()
+
+    # Phase 2: merge and summarize without holding any lock
+    await _merge_into(list(all_nodes), list(merge_edges), nodes_snapshot, edges_snapshot)
+
+    # Phase 3: apply if no item changed since its snapshot, otherwise re-merge the changed ones.
+    # The global lock keeps whole-graph operations (entity edits, deletions) out of the write.
+    graph_db_lock = get_graph_db_lock(enable_logging=False)
+    attempt = 0
+    while True:
+        attempt += 1
+        async with get_graph_db_lock(enable_logging=False, keys=lock_keys):
+            async with graph_db_lock:
+                current_nodes, current_edges = await _read_graph_state()
+                stale_nodes = [name for name in all_nodes if current_nodes.get(name) != nodes_snapshot.get(name)]
+                stale_edges = [key for key in merge_edges if current_edges.get(key) != edges_snapshot.get(key)]
+                if (stale_nodes or stale_edges) and attempt >= _MERGE_MAX_ATTEMPTS:
+                    logger.warning(
+                        f"Merge conflicts persist after {attempt} attempts, merging {len(stale_nodes)} entities "
+                        f"and {len(stale_edges)} relations under lock: {file_path}"
+                    )
+                    await _merge_into(stale_nodes, stale_edges, current_nodes, current_edges)
+                    stale_nodes, stale_edges = [], []
+                if not stale_nodes and not stale_edges:
+                    upserted_node_ids = await _apply(current_nodes)
+                    break
+
+        logger.info(
+            f"Merge conflict on {len(stale_nodes)} entities and {len(stale_edges)} relations, "
+            f"re-merging (attempt {attempt}): {file_path}"
+        )
+        nodes_snapshot, edges_snapshot = current_nodes, current_edges
+        await _merge_into(stale_nodes, stale_edges, nodes_snapshot, edges_snapshot)
+
+    if doc_index is not None and doc_id is not None:
+        await doc_index.upsert(
+            {
+                doc_id: {
+                    "chunk_ids": list(chunk_ids or []),
+                    # Placeholder endpoints carry this document's source_id too, deletion must see them
+                    "entities": upserted_node_ids,
+                    "relations": [list(edge_key) for edge_key in all_edges.keys()],
+                }
+            }
+        )
 
 
 async def extract_entities(
@@ -574,7 +754,25 @@ async def extract_entities(
     pipeline_status: dict = None,
     pipeline_status_lock=None,
     llm_response_cache: BaseKVStorage | None = None,
+    scheduler: FairRequestScheduler | None = None,
+    batcher: MicroBatcher | None = None,
 ) -> list:
+    """Extract entities and relationships from the chunks of a document
+
+    Args:
+        chunks: Chunks to extract from, keyed by chunk id
+        global_config: LightRAG configuration
+        pipeline_status: Shared pipeline status for progress messages
+        pipeline_status_lock: Lock guarding pipeline_status
+        llm_response_cache: Cache for extraction responses
+        scheduler: Pipeline-wide admission control shared by all documents being processed.
+            A private scheduler limited to llm_model_max_async is used when not given.
+        batcher: Packs short chunks of the document into one extraction request, shared by all
+            documents being processed
+
+    Returns:
+        list: One (maybe_nodes, maybe_edges) tuple per chunk
+    """
     use_llm_func: callable = global_config["llm_model_func"]
     entity_extract_max_gleaning = global_config["entity_extract_max_gleaning"]
 
@@ -649,48 +847,56 @@ async def extract_entities(
 
         return maybe_nodes, maybe_edges
 
-    async def _process_single_content(chunk_key_dp: tuple[str, TextChunkSchema]):
-        """Process a single chunk
+    async def _scheduled_llm_call(
+        doc_key: str, cost: int, prompt: str, history: list | None = None, cached: bool = True
+    ) -> str:
+        async with scheduler.slot(doc_key, cost):
+            return await use_llm_func_with_cache(
+                prompt,
+                use_llm_func,
+                llm_response_cache=llm_response_cache if cached else None,
+                history_messages=history,
+                cache_type="extract",
+            )
+
+    async def _run_extraction(doc_key: str, input_text: str, input_tokens: int, cached: bool = True) -> list[str]:
+        """Run the initial extraction and the gleaning rounds for one request
         Args:
-            chunk_key_dp (tuple[str, TextChunkSchema]):
-                ("chunk-xxxxxx", {"tokens": int, "content": str, "full_doc_id": str, "chunk_order_index": int})
+            doc_key (str): Document the request is scheduled for
+            input_text (str): Text inserted into the extraction prompt
+            input_tokens (int): Token count of input_text, used for the scheduling budget
+            cached (bool): Whether the LLM responses go through the extraction cache
         Returns:
-            tuple: (maybe_nodes, maybe_edges) containing extracted entities and relationships
+            list[str]: The initial extraction result followed by every gleaning result
         """
-        nonlocal processed_chunks
-        chunk_key = chunk_key_dp[0]
-        chunk_dp = chunk_key_dp[1]
-        content = chunk_dp["content"]
-        # Get file path from chunk data or use default
-        file_path = chunk_dp.get("file_path", "unknown_source")
-
-        # Get initial extraction
-        hint_prompt = entity_extract_prompt.format(**{**context_base, "input_text": content})
-
-        final_result = await use_llm_func_with_cache(
-            hint_prompt,
-            use_llm_func,
-            llm_response_cache=llm_response_cache,
-            cache_type="extract",
-        )
+        hint_prompt = entity_extract_prompt.format(**{**context_base, "input_text": input_text})
+        cost = prompt_tokens + input_tokens
+        final_result = await _scheduled_llm_call(doc_key, cost, hint_prompt, cached=cached)
         history = pack_user_ass_to_openai_messages(hint_prompt, final_result)
+        results = [final_result]
 
-        # Process initial extraction with file path
-        maybe_nodes, maybe_edges = await _process_extraction_result(final_result, chunk_key, file_path)
-
-        # Process additional gleaning results
         for now_glean_index in range(entity_extract_max_gleaning):
-            glean_result = await use_llm_func_with_cache(
-                continue_prompt,
-                use_llm_func,
-                llm_response_cache=llm_response_cache,
-                history_messages=history,
-                cache_type="extract",
+            cost += len(tokenizer.encode(results[-1])) + continue_prompt_tokens
+            glean_result = await _scheduled_llm_call(doc_key, cost, continue_prompt, history, cached=cached)
+            history += pack_user_ass_to_openai_messages(continue_prompt, glean_result)
+            results.append(glean_result)
+
+            if now_glean_index == entity_extract_max_gleaning - 1:
+                break
+
+            if_loop_result: str = await _scheduled_llm_call(
+                doc_key, cost + len(tokenizer.encode(glean_result)), if_loop_prompt, history, cached=cached
             )
+            if_loop_result = if_loop_result.strip().strip('"').strip("'").lower()
+            if if_loop_result != "yes":
+                break
 
-            history += pack_user_ass_to_openai_messages(continue_prompt, glean_result)
+        return results
 
-            # Process gleaning result separately with file path
+    async def _collect_results(results: list[str], chunk_key: str, file_path: str):
+        """Parse the initial and gleaning results of one chunk into (maybe_nodes, maybe_edges)"""
+        maybe_nodes, maybe_edges = await _process_extraction_result(results[0], chunk_key, file_path)
+        for glean_result in results[1:]:
             glean_nodes, glean_edges = await _process_extraction_result(glean_result, chunk_key, file_path)
 
             # Merge results - only add entities and edges with new names
@@ -700,20 +906,127 @@ async def extract_entities(
             for edge_key, edges in glean_edges.items():
                 if edge_key not in maybe_edges:  # Only accetp edges with new name in gleaning stage
                     maybe_edges[edge_key].extend(edges)
+        return maybe_nodes, maybe_edges
 
-            if now_glean_index == entity_extract_max_gleaning - 1:
-                break
-
-            if_loop_result: str = await use_llm_func_with_cache(
-                if_loop_prompt,
-                use_llm_func,
-                llm_response_cache=llm_response_cache,
-                history_messages=history,
+    async def _extract_single(chunk_key_dp: tuple[str, TextChunkSchema]):
+        chunk_key, chunk_dp = chunk_key_dp
+        results = await _run_extraction(
+            chunk_dp.get("full_doc_id", chunk_key), chunk_dp["content"], chunk_dp["tokens"]
+        )
+        return await _collect_results(results, chunk_key, chunk_dp.get("file_path", "unknown_source"))
+
+    def _demultiplex(result: str, section_count: int) -> list[str] | None:
+        """Split a batched extraction result into one result per section, None if no section markers"""
+        parts = section_marker.split(result)
+        if len(parts) == 1:
+            return None
+        sections = [""] * section_count
+        for number, text in zip(parts[1::2], parts[2::2]):
+            index = int(number) - 1
+            if 0 <= index < section_count:
+                sections[index] += text
+        return sections
+
+    def _chunk_cache_key(chunk_dp: TextChunkSchema) -> tuple[str, str]:
+        """Cache key and prompt under which the results of a batched chunk are cached"""
+        prompt = entity_extract_prompt.format(**{**context_base, "input_text": chunk_dp["content"]})
+        return compute_args_hash(prompt, cache_type="extract_batched"), prompt
+
+    async def _get_cached_chunk_results(chunk_dp: TextChunkSchema) -> list[str] | None:
+        args_hash, prompt = _chunk_cache_key(chunk_dp)
+        cached, _, _, _ = await handle_cache(llm_response_cache, args_hash, prompt, "default", cache_type="extract")
+        return json.loads(cached) if cached else None
+
+    async def _save_chunk_results(chunk_dp: TextChunkSchema, results: list[str]) -> None:
+        if llm_response_cache is None or not global_config.get("enable_llm_cache_for_entity_extract"):
+            return
+        args_hash, prompt = _chunk_cache_key(chunk_dp)
+        await save_to_cache(
+            llm_response_cache,
+            CacheData(
+                args_hash=args_hash,
+                content=json.dumps(results, ensure_ascii=False),
+                prompt=prompt,
                 cache_type="extract",
+            ),
+        )
+
+    async def _extract_batch(batch: list[tuple[str, TextChunkSchema]]) -> list:
+        """Extract a batch of short chunks with one request and route the records back to their chunks
+
+        The batch composition depends on timing, so the requests are not cached. The results
+        are cached per chunk instead, a reprocessed chunk hits the cache whatever its batch.
+        """
+        doc_key = batch[0][1].get("full_doc_id", batch[0][0])
+        chunk_results = None
+        if len(batch) > 1:
+            input_text = "\n\n".join(
+                [
+                    PROMPTS["entity_extraction_batch_note"].format(**context_base, section_count=len(batch)),
+                    *[
+                        PROMPTS["entity_extraction_batch_section"].format(index=index + 1, text=chunk_dp["content"])
+                        for index, (_, chunk_dp) in enumerate(batch)
+                    ],
+                ]
             )
-            if_loop_result = if_loop_result.strip().strip('"').strip("'").lower()
-            if if_loop_result != "yes":
-                break
+            input_tokens = sum(chunk_dp["tokens"] for _, chunk_dp in batch)
+            results = await _run_extraction(doc_key, input_text, input_tokens, cached=False)
+
+            initial_sections = _demultiplex(results[0], len(batch))
+            if initial_sections is None:
+                logger.warning(
+                    f"Batched extraction of {len(batch)} chunks returned no section markers, retrying unbatched"
+                )
+            else:
+                glean_sections = []
+                for glean_result in results[1:]:
+                    sections = _demultiplex(glean_result, len(batch))
+                    if sections is None:
+                        logger.warning("Gleaning result of batched extraction has no section markers, skipped")
+                        continue
+                    glean_sections.append(sections)
+                chunk_results = [
+                    [initial_sections[index], *[sections[index] for sections in glean_sections]]
+                    for index in range(len(batch))
+                ]
+
+        if chunk_results is None:
+            chunk_results = await asyncio.gather(
+                *[
+                    _run_extraction(doc_key, chunk_dp["content"], chunk_dp["tokens"], cached=False)
+                    for _, chunk_dp in batch
+                ]
+            )
+
+        for (_, chunk_dp), results in zip(batch, chunk_results):
+            await _save_chunk_results(chunk_dp, results)
+        return [
+            await _collect_results(results, chunk_key, chunk_dp.get("file_path", "unknown_source"))
+            for (chunk_key, chunk_dp), results in zip(batch, chunk_results)
+        ]
+
+    async def _process_single_content(chunk_key_dp: tuple[str, TextChunkSchema]):
+        """Process a single chunk
+        Args:
+            chunk_key_dp (tuple[str, TextChunkSchema]):
+                ("chunk-xxxxxx", {"tokens": int, "content": str, "full_doc_id": str, "chunk_order_index": int})
+        Returns:
+            tuple: (maybe_nodes, maybe_edges) containing extracted entities and relationships
+        """
+        nonlocal processed_chunks
+        chunk_key, chunk_dp = chunk_key_dp
+        chunk_tokens = chunk_dp["tokens"]
+        if batcher is not None and chunk_tokens * 2 <= batcher.max_tokens:
+            cached_results = await _get_cached_chunk_results(chunk_dp)
+            if cached_results is not None:
+                maybe_nodes, maybe_edges = await _collect_results(
+                    cached_results, chunk_key, chunk_dp.get("file_path", "unknown_source")
+                )
+            else:
+                # _extract_batch is a closure of this document, so batches never mix documents
+                maybe_nodes, maybe_edges = await batcher.submit(chunk_key_dp, chunk_tokens, _extract_batch)
+        else:
+            maybe_nodes, maybe_edges = await _extract_single(chunk_key_dp)
 
         processed_chunks += 1
         entities_count = len(maybe_nodes)
@@ -730,17 +1043,20 @@ async def extract_entities(
         # Return the extracted nodes and edges for centralized processing
         return maybe_nodes, maybe_edges
 
-    # Get max async tasks limit from global_config
-    llm_model_max_async = global_config.get("llm_model_max_async", 4)
-    semaphore = asyncio.Semaphore(llm_model_max_async)
+    if scheduler is None:
+        # Get max async tasks limit from global_config
+        scheduler = FairRequestScheduler(global_config.get("llm_model_max_async", 4))
 
-    async def _process_with_semaphore(chunk):
-        async with semaphore:
-            return await _process_single_content(chunk)
+    tokenizer: Tokenizer = global_config["tokenizer"]
+    prompt_tokens = len(tokenizer.encode(entity_extract_prompt.format(**{**context_base, "input_text": ""})))
+    continue_prompt_tokens = len(tokenizer.encode(continue_prompt))
+    section_marker = re.compile(
+        r'\(\s*"?section"?\s*' + re.escape(context_base["tuple_delimiter"]) + r"\s*(\d+)\s*\)"
+    )
 
     tasks = []
     for c in ordered_chunks:
-        task = asyncio.create_task(_process_with_semaphore(c))
+        task = asyncio.create_task(_process_single_content(c))
         tasks.append(task)
 
     # Wait for tasks to complete or for the first exception to occur
@@ -794,7 +1110,7 @@ async def kg_query(
         hashing_kv, args_hash, query, query_param.mode, cache_type="query"
     )
     if cached_response is not None:
-        return cached_response
+        return replay_cached_stream(cached_response) if query_param.stream else cached_response
 
     hl_keywords, ll_keywords = await get_keywords_from_query(query, query_param, global_config, hashing_kv)
 
@@ -877,20 +1193,21 @@ async def kg_query(
         )
 
     if hashing_kv.global_config.get("enable_llm_cache"):
-        # Save to cache
-        await save_to_cache(
-            hashing_kv,
-            CacheData(
-                args_hash=args_hash,
-                content=response,
-                prompt=query,
-                quantized=quantized,
-                min_val=min_val,
-                max_val=max_val,
-                mode=query_param.mode,
-                cache_type="query",
-            ),
+        cache_data = CacheData(
+            args_hash=args_hash,
+            content=response,
+            prompt=query,
+            quantized=quantized,
+            min_val=min_val,
+            max_val=max_val,
+            mode=query_param.mode,
+            cache_type="query",
         )
+        if hasattr(response, "__aiter__"):
+            # Streamed responses are cached once the client has read them to the end
+            response = cache_stream_on_completion(response, hashing_kv, cache_data)
+        else:
+            await save_to_cache(hashing_kv, cache_data)
 
     return response
 
@@ -1065,6 +1382,7 @@ async def _get_vector_context(
             key=lambda x: x["content"],
             max_token_size=query_param.max_token_for_text_unit,
             tokenizer=tokenizer,
+            timings=query_param.timings,
         )
 
         logger.debug(
@@ -1096,6 +1414,54 @@ async def _get_vector_context(
         return [], [], []
 
 
+async def _run_retrieval_legs(
+    legs: dict[str, Awaitable[tuple[list, list, list]]],
+    query_param: QueryParam,
+) -> dict[str, tuple[list, list, list]]:
+    """Run independent retrieval legs concurrently
+
+    Each leg gets its own timeout (query_param.retrieval_timeout) and its elapsed time is
+    recorded in query_param.timings. A leg that times out or fails is dropped so the context
+    can still be built from the legs that succeeded; if every leg fails the first error is raised.
+
+    Args:
+        legs: Mapping of leg name to the coroutine producing (entities, relations, text_units)
+        query_param: Query parameters carrying the timeout and receiving the timings
+
+    Returns:
+        Mapping of leg name to its result, only for legs that completed
+    """
+    timeout = query_param.retrieval_timeout
+
+    async def _run_leg(name: str, leg: Awaitable[tuple[list, list, list]]):
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(leg, timeout=timeout)
+        finally:
+            query_param.timings[name] = round(time.perf_counter() - start, 4)
+
+    names = list(legs.keys())
+    outcomes = await asyncio.gather(
+        *[_run_leg(name, leg) for name, leg in legs.items()],
+        return_exceptions=True,
+    )
+
+    results = {}
+    errors = []
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            logger.warning(f"Retrieval leg '{name}' timed out after {timeout}s, using partial results")
+        elif isinstance(outcome, BaseException):
+            logger.error(f"Retrieval leg '{name}' failed: {outcome}")
+            errors.append(outcome)
+        else:
+            results[name] = outcome
+
+    if not results and errors:
+        raise errors[0]
+    return results
+
+
 async def _build_query_context(
     ll_keywords: str,
     hl_keywords: str,
@@ -1108,79 +1474,57 @@ async def _build_query_context(
 ):
     logger.info(f"Process {os.getpid()} building query context...")
 
-    # Handle local and global modes as before
-    if query_param.mode == "local":
-        entities_context, relations_context, text_units_context = await _get_node_data(
+    # Plan the retrieval legs for the mode, they are independent of each other
+    legs: dict[str, Awaitable[tuple[list, list, list]]] = {}
+    if query_param.mode in ["local", "hybrid", "mix"]:
+        legs["local"] = _get_node_data(
             ll_keywords,
             knowledge_graph_inst,
             entities_vdb,
             text_chunks_db,
             query_param,
         )
-    elif query_param.mode == "global":
-        entities_context, relations_context, text_units_context = await _get_edge_data(
+    if query_param.mode in ["global", "hybrid", "mix"]:
+        legs["global"] = _get_edge_data(
             hl_keywords,
             knowledge_graph_inst,
             relationships_vdb,
             text_chunks_db,
             query_param,
         )
-    else:  # hybrid or mix mode
-        ll_data = await _get_node_data(
-            ll_keywords,
-            knowledge_graph_inst,
-            entities_vdb,
-            text_chunks_db,
-            query_param,
-        )
-        hl_data = await _get_edge_data(
-            hl_keywords,
-            knowledge_graph_inst,
-            relationships_vdb,
-            text_chunks_db,
+    # Only get vector data if in mix mode
+    if query_param.mode == "mix" and hasattr(query_param, "original_query"):
+        legs["vector"] = _get_vector_context(
+            query_param.original_query,  # We need to pass the original query
+            chunks_vdb,
             query_param,
+            text_chunks_db.global_config.get("tokenizer"),
         )
 
-        (
+    leg_results = await _run_retrieval_legs(legs, query_param)
+
+    # Missing legs (timed out or failed) contribute nothing to the combined context
+    ll_entities_context, ll_relations_context, ll_text_units_context = leg_results.get("local") or ([], [], [])
+    hl_entities_context, hl_relations_context, hl_text_units_context = leg_results.get("global") or ([], [], [])
+    vector_entities_context, vector_relations_context, vector_text_units_context = leg_results.get("vector") or (
+        [],
+        [],
+        [],
+    )
+
+    if query_param.mode == "local":
+        entities_context, relations_context, text_units_context = (
             ll_entities_context,
             ll_relations_context,
             ll_text_units_context,
-        ) = ll_data
-
-        (
+        )
+    elif query_param.mode == "global":
+        entities_context, relations_context, text_units_context = (
             hl_entities_context,
             hl_relations_context,
             hl_text_units_context,
-        ) = hl_data
-
-        # Initialize vector data with empty lists
-        vector_entities_context, vector_relations_context, vector_text_units_context = (
-            [],
-            [],
-            [],
         )
-
-        # Only get vector data if in mix mode
-        if query_param.mode == "mix" and hasattr(query_param, "original_query"):
-            # Get tokenizer from text_chunks_db
-            tokenizer = text_chunks_db.global_config.get("tokenizer")
-
-            # Get vector context in triple format
-            vector_data = await _get_vector_context(
-                query_param.original_query,  # We need to pass the original query
-                chunks_vdb,
-                query_param,
-                tokenizer,
-            )
-
-            # If vector_data is not None, unpack it
-            if vector_data is not None:
-                (
-                    vector_entities_context,
-                    vector_relations_context,
-                    vector_text_units_context,
-                ) = vector_data
-
+    else:  # hybrid or mix mode
         # Combine and deduplicate the entities, relationships, and sources
         entities_context = process_combine_contexts(hl_entities_context, ll_entities_context, vector_entities_context)
         relations_context = process_combine_contexts(
@@ -1283,6 +1627,7 @@ async def _get_node_data(
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_local_context,
         tokenizer=tokenizer,
+        timings=query_param.timings,
     )
     logger.debug(
         f"Truncate entities from {len_node_datas} to {len(node_datas)} (max tokens:{query_param.max_token_for_local_context})"
@@ -1350,6 +1695,59 @@ async def _get_node_data(
     return entities_context, relations_context, text_units_context
 
 
+def _get_chunk_cache(text_chunks_db: BaseKVStorage) -> OrderedDict[str, dict] | None:
+    if text_chunks_db.global_config.get("chunk_cache_size", 0) <= 0:
+        return None
+    entry = _chunk_caches.get(id(text_chunks_db))
+    if entry is None or entry[0]() is not text_chunks_db:
+        key = id(text_chunks_db)
+        entry = _chunk_caches[key] = (
+            weakref.ref(text_chunks_db, lambda _: _chunk_caches.pop(key, None)),
+            OrderedDict(),
+        )
+    return entry[1]
+
+
+async def _fetch_text_chunks(text_chunks_db: BaseKVStorage, chunk_ids: list[str]) -> dict[str, dict]:
+    """Fetch the chunk records used by a query context, keyed by chunk id
+
+    Only the fields needed by the context are fetched, with one get_fields_by_ids() call per
+    chunk_fetch_batch_size ids. When chunk_cache_size is set, records are served from an LRU
+    cache in front of the storage; chunk ids are content hashes so a cached record never
+    goes stale while the chunk exists.
+    """
+    global_config = text_chunks_db.global_config
+    batch_size = max(1, global_config.get("chunk_fetch_batch_size", 500))
+    cache = _get_chunk_cache(text_chunks_db)
+
+    results: dict[str, dict] = {}
+    missing = []
+    for chunk_id in dict.fromkeys(chunk_ids):
+        data = cache.get(chunk_id) if cache is not None else None
+        if data is None:
+            missing.append(chunk_id)
+        else:
+            cache.move_to_end(chunk_id)
+            results[chunk_id] = data
+
+    batches = await asyncio.gather(
+        *[
+            text_chunks_db.get_fields_by_ids(missing[i : i + batch_size], _QUERY_CHUNK_FIELDS)
+            for i in range(0, len(missing), batch_size)
+        ]
+    )
+    for batch in batches:
+        results.update(batch)
+        if cache is not None:
+            cache.update(batch)
+
+    if cache is not None:
+        cache_size = global_config["chunk_cache_size"]
+        while len(cache) > cache_size:
+            cache.popitem(last=False)
+    return results
+
+
 async def _find_most_related_text_unit_from_entities(
     node_datas: list[dict],
     query_param: QueryParam,
@@ -1395,18 +1793,11 @@ async def _find_most_related_text_unit_from_entities(
                 all_text_units_lookup[c_id] = index
                 tasks.append((c_id, index, this_edges))
 
-    # Process in batches tasks at a time to avoid overwhelming resources
-    batch_size = 5
-    results = []
-
-    for i in range(0, len(tasks), batch_size):
-        batch_tasks = tasks[i : i + batch_size]
-        batch_results = await asyncio.gather(*[text_chunks_db.get_by_id(c_id) for c_id, _, _ in batch_tasks])
-        results.extend(batch_results)
+    chunks = await _fetch_text_chunks(text_chunks_db, [c_id for c_id, _, _ in tasks])
 
-    for (c_id, index, this_edges), data in zip(tasks, results):
+    for c_id, index, this_edges in tasks:
         all_text_units_lookup[c_id] = {
-            "data": data,
+            "data": chunks.get(c_id),
             "order": index,
             "relation_counts": 0,
         }
@@ -1434,6 +1825,8 @@ async def _find_most_related_text_unit_from_entities(
         key=lambda x: x["data"]["content"],
         max_token_size=query_param.max_token_for_text_unit,
         tokenizer=tokenizer,
+        token_count=lambda x: x["data"].get("tokens"),
+        timings=query_param.timings,
     )
 
     logger.debug(
@@ -1498,6 +1891,7 @@ async def _find_most_related_edges_from_entities(
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_global_context,
         tokenizer=tokenizer,
+        timings=query_param.timings,
     )
 
     logger.debug(
@@ -1562,6 +1956,7 @@ async def _get_edge_data(
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_global_context,
         tokenizer=tokenizer,
+        timings=query_param.timings,
     )
     use_entities, use_text_units = await asyncio.gather(
         _find_most_related_entities_from_relationships(
@@ -1679,6 +2074,7 @@ async def _find_most_related_entities_from_relationships(
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_local_context,
         tokenizer=tokenizer,
+        timings=query_param.timings,
     )
     logger.debug(
         f"Truncate entities from {len_node_datas} to {len(node_datas)} (max tokens:{query_param.max_token_for_local_context})"
@@ -1698,24 +2094,23 @@ async def _find_related_text_unit_from_relationships(
         for dp in edge_datas
         if dp["source_id"] is not None
     ]
-    all_text_units_lookup = {}
-
-    async def fetch_chunk_data(c_id, index):
-        if c_id not in all_text_units_lookup:
-            chunk_data = await text_chunks_db.get_by_id(c_id)
-            # Only store valid data
-            if chunk_data is not None and "content" in chunk_data:
-                all_text_units_lookup[c_id] = {
-                    "data": chunk_data,
-                    "order": index,
-                }
-
-    tasks = []
+    # A chunk shared by several relations takes the order of the first one
+    chunk_orders = {}
     for index, unit_list in enumerate(text_units):
         for c_id in unit_list:
-            tasks.append(fetch_chunk_data(c_id, index))
+            chunk_orders.setdefault(c_id, index)
+
+    chunks = await _fetch_text_chunks(text_chunks_db, list(chunk_orders))
 
-    await asyncio.gather(*tasks)
+    all_text_units_lookup = {}
+    for c_id, index in chunk_orders.items():
+        chunk_data = chunks.get(c_id)
+        # Only store valid data
+        if chunk_data is not None and "content" in chunk_data:
+            all_text_units_lookup[c_id] = {
+                "data": chunk_data,
+                "order": index,
+            }
 
     if not all_text_units_lookup:
         logger.warning("No valid text chunks found")
@@ -1737,6 +2132,8 @@ async def _find_related_text_unit_from_relationships(
         key=lambda x: x["data"]["content"],
         max_token_size=query_param.max_token_for_text_unit,
         tokenizer=tokenizer,
+        token_count=lambda x: x["data"].get("tokens"),
+        timings=query_param.timings,
     )
 
     logger.debug(
@@ -1769,7 +2166,7 @@ async def naive_query(
         hashing_kv, args_hash, query, query_param.mode, cache_type="query"
     )
     if cached_response is not None:
-        return cached_response
+        return replay_cached_stream(cached_response) if query_param.stream else cached_response
 
     tokenizer: Tokenizer = global_config["tokenizer"]
 
@@ -1828,20 +2225,21 @@ async def naive_query(
         )
 
     if hashing_kv.global_config.get("enable_llm_cache"):
-        # Save to cache
-        await save_to_cache(
-            hashing_kv,
-            CacheData(
-                args_hash=args_hash,
-                content=response,
-                prompt=query,
-                quantized=quantized,
-                min_val=min_val,
-                max_val=max_val,
-                mode=query_param.mode,
-                cache_type="query",
-            ),
+        cache_data = CacheData(
+            args_hash=args_hash,
+            content=response,
+            prompt=query,
+            quantized=quantized,
+            min_val=min_val,
+            max_val=max_val,
+            mode=query_param.mode,
+            cache_type="query",
         )
+        if hasattr(response, "__aiter__"):
+            # Streamed responses are cached once the client has read them to the end
+            response = cache_stream_on_completion(response, hashing_kv, cache_data)
+        else:
+            await save_to_cache(hashing_kv, cache_data)
 
     return response
 
@@ -188,6 +188,13 @@ Format the content-level key words as ("content_keywords"{tuple_delimiter}<high_
 Add them below using the same format:\n
 """.strip()
 
+PROMPTS["entity_extraction_batch_note"] = """The text below consists of {section_count} independent sections, each starting with a [Section N] header.
+Extract entities and relationships for each section separately, and only relate entities that appear in the same section.
+Before the records of each section, output a marker record ("section"{tuple_delimiter}<N>) followed by {record_delimiter}."""
+
+PROMPTS["entity_extraction_batch_section"] = """[Section {index}]
+{text}"""
+
 PROMPTS[
     "entity_if_loop_extraction"
 ] = """
@@ -24,6 +24,14 @@ class KnowledgeGraphEdge(BaseModel):
     properties: dict[str, Any]  # anything else goes here
 
 
+class KnowledgeGraphMeta(BaseModel):
+    """First item of a knowledge graph stream"""
+
+    is_truncated: bool = False
+    # Changes whenever the graph changes in a way that can reorder the stream, None if unknown
+    version: Optional[str] = None
+
+
 class KnowledgeGraph(BaseModel):
     nodes: list[KnowledgeGraphNode] = []
     edges: list[KnowledgeGraphEdge] = []
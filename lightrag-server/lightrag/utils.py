@@ -8,16 +8,24 @@ import logging
 import logging.handlers
 import os
 import re
+import time
 import weakref
 import xml.etree.ElementTree as ET
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from functools import wraps
 from hashlib import md5
-from typing import TYPE_CHECKING, Any, Callable, List, Protocol
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, List, Protocol, Sequence
 
 import numpy as np
 from dotenv import load_dotenv
-from lightrag.constants import DEFAULT_LOG_BACKUP_COUNT, DEFAULT_LOG_FILENAME, DEFAULT_LOG_MAX_BYTES
+from lightrag.constants import (
+    DEFAULT_LOG_BACKUP_COUNT,
+    DEFAULT_LOG_FILENAME,
+    DEFAULT_LOG_MAX_BYTES,
+    DEFAULT_TOKEN_COUNT_CACHE_SIZE,
+)
 from lightrag.prompt import PROMPTS
 
 
@@ -565,6 +573,234 @@ def priority_limit_async_func_call(max_size: int, max_queue_size: int = 1000):
     return final_decro
 
 
+class FairRequestScheduler:
+    """
+    Global admission control for LLM requests issued on behalf of many documents
+
+    Requests are admitted while both the number of in-flight requests and the sum of their
+    estimated token costs stay within budget. Waiting requests are grouped per document and
+    documents are served round-robin, so one large document cannot starve the others.
+    A request whose cost alone exceeds the token budget is admitted when nothing else is in flight.
+
+    Args:
+        max_requests: Maximum number of concurrent requests
+        max_tokens: Maximum sum of estimated tokens in flight, 0 for no token budget
+    """
+
+    def __init__(self, max_requests: int, max_tokens: int = 0):
+        self.max_requests = max(1, max_requests)
+        self.max_tokens = max_tokens
+        self._queues: dict[str, deque[tuple[int, asyncio.Future]]] = {}
+        self._order: deque[str] = deque()
+        self._active_requests = 0
+        self._active_tokens = 0
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _fits(self, cost: int) -> bool:
+        if self._active_requests >= self.max_requests:
+            return False
+        if self.max_tokens <= 0 or self._active_requests == 0:
+            return True
+        return self._active_tokens + cost <= self.max_tokens
+
+    def _dispatch(self) -> None:
+        while self._order:
+            key = self._order[0]
+            queue = self._queues[key]
+            cost, future = queue[0]
+            if future.done():
+                # Cancelled while waiting
+                queue.popleft()
+            elif self._fits(cost):
+                queue.popleft()
+                self._active_requests += 1
+                self._active_tokens += cost
+                future.set_result(None)
+            else:
+                return
+            self._order.popleft()
+            if queue:
+                self._order.append(key)
+            else:
+                del self._queues[key]
+
+    def _release(self, cost: int) -> None:
+        self._active_requests -= 1
+        self._active_tokens -= cost
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, key: str, cost: int = 0):
+        """Wait for admission of one request of the given document key and estimated token cost"""
+        future = asyncio.get_running_loop().create_future()
+        if key not in self._queues:
+            self._queues[key] = deque()
+            self._order.append(key)
+        self._queues[key].append((cost, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted right before cancellation
+                self._release(cost)
+            else:
+                self._dispatch()
+            raise
+        try:
+            yield
+        finally:
+            self._release(cost)
+
+
+class MicroBatcher:
+    """
+    Collect small work items submitted concurrently and process them in batches
+
+    Items are only batched with items submitted with the same process function, so callers
+    passing a function of their own, e.g. one closure per document, never share a batch and
+    one failed batch never fails the items of another caller. A batch is flushed when adding
+    the next item would exceed max_tokens, or max_wait seconds after its first item arrived.
+    The process function must return one result per item in submission order.
+
+    Args:
+        max_tokens: Maximum sum of item token counts per batch
+        max_wait: Maximum seconds an item waits for the batch to fill up
+    """
+
+    def __init__(self, max_tokens: int, max_wait: float = 0.05):
+        self.max_tokens = max_tokens
+        self.max_wait = max_wait
+        # process function -> [items with their futures, token sum, flush timer] of the batch being filled
+        self._batches: dict[Callable[[list[Any]], Any], list] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item: Any, tokens: int, process: Callable[[list[Any]], Any]) -> Any:
+        """Add one item to the current batch of process and wait for its result"""
+        batch = self._batches.get(process)
+        if batch is not None and batch[1] + tokens > self.max_tokens:
+            self._flush(process)
+            batch = None
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if batch is None:
+            batch = self._batches[process] = [[], 0, loop.call_later(self.max_wait, self._flush, process)]
+        batch[0].append((item, future))
+        batch[1] += tokens
+        if batch[1] >= self.max_tokens:
+            self._flush(process)
+        return await future
+
+    def _flush(self, process: Callable[[list[Any]], Any]) -> None:
+        batch = self._batches.pop(process, None)
+        if batch is None:
+            return
+        items, _, timer = batch
+        timer.cancel()
+        task = asyncio.create_task(self._run(items, process))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _run(items: list[tuple[Any, asyncio.Future]], process: Callable[[list[Any]], Any]) -> None:
+        try:
+            results = await process([item for item, _ in items])
+        except asyncio.CancelledError:
+            for _, future in items:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class DebouncedFlusher:
+    """
+    Coalesce the flushes requested after each change of a storage into background flushes
+
+    mark_dirty() never waits. The flush runs in a background task max_wait seconds after the
+    first unflushed change, or as soon as max_pending changes are waiting. Only one flush runs
+    at a time, changes marked meanwhile are picked up by the next one. flush() persists what
+    is pending right away, e.g. before a synchronous API call returns and its event loop
+    stops running the timer. aclose() must be awaited on shutdown.
+
+    Args:
+        flush: Coroutine function persisting the storage
+        name: Storage name used in log messages
+        max_wait: Maximum seconds a change waits before it is flushed
+        max_pending: Number of waiting changes that triggers a flush right away
+    """
+
+    def __init__(self, flush: Callable[[], Any], name: str, max_wait: float = 5.0, max_pending: int = 64):
+        self._flush_func = flush
+        self.name = name
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self._pending = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._task: asyncio.Task | None = None
+
+    def mark_dirty(self) -> None:
+        """Record one change to be flushed"""
+        self._pending += 1
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._task is not None:
+            # The running flush reschedules when it finishes
+            return
+        if self._pending >= self.max_pending:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._start_flush)
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._task is not None or not self._pending:
+            return
+        self._pending = 0
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            await self._flush_func()
+        except Exception as e:
+            logger.error(f"Background flush of {self.name} failed: {e}")
+        finally:
+            self._task = None
+        if self._pending:
+            self._schedule()
+
+    async def flush(self) -> None:
+        """Wait for the running flush and flush the remaining changes"""
+        # A finishing flush may start the next one or set the timer again
+        while self._task is not None:
+            await asyncio.shield(self._task)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            self._pending = 0
+            try:
+                await self._flush_func()
+            except Exception as e:
+                logger.error(f"Flush of {self.name} failed: {e}")
+
+    async def aclose(self) -> None:
+        """Flush the remaining changes on shutdown"""
+        await self.flush()
+
+
 def wrap_embedding_func_with_attrs(**kwargs):
     """Wrap a function with attributes"""
 
@@ -601,6 +837,15 @@ class TokenizerInterface(Protocol):
         ...
 
 
+# tiktoken spreads encode_batch over a thread pool created per call, which only pays off
+# for more than a few strings and with more than one core
+TOKENIZE_BATCH_MIN_SIZE = 8
+_TOKENIZE_IN_BATCH = (os.cpu_count() or 1) > 1
+
+# Items counted per round by truncate_list_by_token_size
+TRUNCATE_COUNT_BLOCK_SIZE = 64
+
+
 class Tokenizer:
     """
     A wrapper around a tokenizer to provide a consistent interface for encoding and decoding.
@@ -616,6 +861,11 @@ class Tokenizer:
         """
         self.model_name: str = model_name
         self.tokenizer: TokenizerInterface = tokenizer
+        # Token counts by md5 digest of the content, in least recently used order
+        self._token_counts: OrderedDict[bytes, int] = OrderedDict()
+        self._token_counts_max = get_env_value("TOKEN_COUNT_CACHE_SIZE", DEFAULT_TOKEN_COUNT_CACHE_SIZE, int)
+        # See _get_token_char_table(), False when the tokenizer does not support it
+        self._token_char_table: tuple[np.ndarray, np.ndarray] | bool | None = None
 
     def encode(self, content: str) -> List[int]:
         """
@@ -641,6 +891,117 @@ class Tokenizer:
         """
         return self.tokenizer.decode(tokens)
 
+    def encode_batch(self, contents: List[str]) -> List[List[int]]:
+        """
+        Encodes several strings, in one call when the underlying tokenizer supports it (tiktoken does).
+
+        Args:
+            contents: The strings to encode.
+
+        Returns:
+            A list with the tokens of each string.
+        """
+        encode_batch = getattr(self.tokenizer, "encode_batch", None)
+        if encode_batch is not None and _TOKENIZE_IN_BATCH and len(contents) >= TOKENIZE_BATCH_MIN_SIZE:
+            return encode_batch(contents)
+        return [self.tokenizer.encode(content) for content in contents]
+
+    def count_tokens(self, contents: List[str]) -> List[int]:
+        """
+        Counts the tokens of several strings, using the token count cache.
+
+        Counts are cached by a hash of the content, so an entity description or a chunk is
+        only tokenized once however many queries retrieve it. The strings missing from the
+        cache are tokenized in a single batch.
+
+        Args:
+            contents: The strings to count the tokens of.
+
+        Returns:
+            A list with the token count of each string.
+        """
+        counts: List[int | None] = []
+        missing: dict[bytes, List[int]] = {}
+        for index, content in enumerate(contents):
+            digest = md5(content.encode("utf-8", "surrogatepass")).digest()
+            count = self._token_counts.get(digest)
+            if count is None:
+                missing.setdefault(digest, []).append(index)
+            else:
+                self._token_counts.move_to_end(digest)
+            counts.append(count)
+
+        if missing:
+            digests = list(missing)
+            encoded = self.encode_batch([contents[missing[digest][0]] for digest in digests])
+            for digest, tokens in zip(digests, encoded):
+                for index in missing[digest]:
+                    counts[index] = len(tokens)
+                if self._token_counts_max > 0:
+                    self._token_counts[digest] = len(tokens)
+            while len(self._token_counts) > self._token_counts_max:
+                self._token_counts.popitem(last=False)
+        return counts
+
+    def encode_with_offsets(self, content: str) -> tuple[List[int], Sequence[int]]:
+        """
+        Encodes a string and reports the character offset at which each token starts.
+
+        Args:
+            content: The string to encode.
+
+        Returns:
+            A tuple (tokens, offsets) where offsets[i] is the index in content where tokens[i] starts.
+            offsets is an integer numpy array for tiktoken encodings.
+
+        Raises:
+            NotImplementedError: If the underlying tokenizer cannot map tokens back to character positions.
+        """
+        char_table = self._get_token_char_table()
+        if char_table is not None:
+            # Same offsets as tiktoken's decode_with_offsets, which loops over the bytes of every token in Python
+            tokens = self.tokenizer.encode(content)
+            if not tokens:
+                return tokens, []
+            char_starts, starts_inside_char = char_table
+            token_ids = np.asarray(tokens, dtype=np.int64)
+            counts = char_starts[token_ids]
+            # A token starting inside a character starts at that character
+            offsets = np.cumsum(counts) - counts - starts_inside_char[token_ids]
+            return tokens, np.maximum(offsets, 0)
+
+        decode_with_offsets = getattr(self.tokenizer, "decode_with_offsets", None)
+        if decode_with_offsets is None:
+            raise NotImplementedError(f"Tokenizer {self.model_name} does not support token offsets")
+        tokens = self.tokenizer.encode(content)
+        _, offsets = decode_with_offsets(tokens)
+        return tokens, offsets
+
+    def _get_token_char_table(self) -> tuple[np.ndarray, np.ndarray] | None:
+        """Per token id, the number of UTF-8 bytes that start a character and whether the first one does not
+
+        Built once from the vocabulary of tokenizers exposing tiktoken's n_vocab and
+        decode_single_token_bytes, None for other tokenizers.
+        """
+        if self._token_char_table is None:
+            n_vocab = getattr(self.tokenizer, "n_vocab", None)
+            decode_single_token_bytes = getattr(self.tokenizer, "decode_single_token_bytes", None)
+            if not isinstance(n_vocab, int) or decode_single_token_bytes is None:
+                self._token_char_table = False
+                return None
+            char_starts = np.zeros(n_vocab, dtype=np.int64)
+            starts_inside_char = np.zeros(n_vocab, dtype=np.int64)
+            for token_id in range(n_vocab):
+                try:
+                    token_bytes = decode_single_token_bytes(token_id)
+                except KeyError:
+                    continue
+                # UTF-8 continuation bytes are 0b10xxxxxx, every other byte starts a character
+                char_starts[token_id] = sum(1 for byte in token_bytes if not 0x80 <= byte < 0xC0)
+                starts_inside_char[token_id] = bool(token_bytes) and 0x80 <= token_bytes[0] < 0xC0
+            self._token_char_table = (char_starts, starts_inside_char)
+        return self._token_char_table or None
+
 
 class TiktokenTokenizer(Tokenizer):
     """
@@ -708,16 +1069,36 @@ def truncate_list_by_token_size(
     key: Callable[[Any], str],
     max_token_size: int,
     tokenizer: Tokenizer,
+    token_count: Callable[[Any], int | None] | None = None,
+    timings: dict[str, float] | None = None,
 ) -> list[int]:
-    """Truncate a list of data by token size"""
+    """Truncate a list of data by token size
+
+    token_count(data) may return the token count stored with an item at ingest time (e.g. the
+    tokens field of a chunk), other items are counted with tokenizer.count_tokens() in blocks,
+    so only the items up to the cut are tokenized. The time spent is added to
+    timings["tokenize"] when timings is given.
+    """
     if max_token_size <= 0:
         return []
-    tokens = 0
-    for i, data in enumerate(list_data):
-        tokens += len(tokenizer.encode(key(data)))
-        if tokens > max_token_size:
-            return list_data[:i]
-    return list_data
+    start = time.perf_counter()
+    try:
+        tokens = 0
+        for block_start in range(0, len(list_data), TRUNCATE_COUNT_BLOCK_SIZE):
+            block = list_data[block_start : block_start + TRUNCATE_COUNT_BLOCK_SIZE]
+            counts = [token_count(data) for data in block] if token_count else [None] * len(block)
+            missing = [i for i, count in enumerate(counts) if count is None]
+            if missing:
+                for i, count in zip(missing, tokenizer.count_tokens([key(block[i]) for i in missing])):
+                    counts[i] = count
+            for i, count in enumerate(counts):
+                tokens += count
+                if tokens > max_token_size:
+                    return list_data[: block_start + i]
+        return list_data
+    finally:
+        if timings is not None:
+            timings["tokenize"] = round(timings.get("tokenize", 0.0) + time.perf_counter() - start, 4)
 
 
 def save_data_to_file(data, file_name):
@@ -816,6 +1197,164 @@ def process_combine_contexts(*context_lists):
     return combined_data
 
 
+class CacheEmbeddingIndex:
+    """In-memory embedding index for the cache entries of one cache mode
+
+    Cached embeddings are dequantized once into a contiguous float32 matrix with
+    precomputed row norms, so a lookup is a single matrix-vector product instead of
+    hex-decoding and comparing every cache entry in Python.
+    """
+
+    def __init__(self):
+        self._matrix: np.ndarray | None = None
+        self._norms: np.ndarray | None = None
+        self._ids: list[str] = []
+        self._cache_types: list[str | None] = []
+        self._positions: dict[str, int] = {}
+        self._seen: set[str] = set()
+
+    @classmethod
+    def from_mode_cache(cls, mode_cache: dict[str, Any]) -> "CacheEmbeddingIndex":
+        index = cls()
+        index.sync(mode_cache)
+        return index
+
+    @property
+    def entry_count(self) -> int:
+        """Number of cache entries seen, including entries without a usable embedding"""
+        return len(self._seen)
+
+    def sync(self, mode_cache: dict[str, Any]) -> None:
+        """Add the entries missing from the index and drop the ones no longer in mode_cache
+
+        Only the differing entries are decoded, so entries written or deleted by another
+        process cost one set comparison and the changed rows, not a rebuild.
+        """
+        if mode_cache.keys() == self._seen:
+            return
+        for cache_id in self._seen - mode_cache.keys():
+            self.remove(cache_id)
+        for cache_id in mode_cache.keys() - self._seen:
+            self.add(cache_id, mode_cache[cache_id])
+
+    @staticmethod
+    def _decode(cache_data: dict[str, Any]) -> np.ndarray | None:
+        if not isinstance(cache_data, dict) or cache_data.get("embedding") is None:
+            return None
+
+        # Ensure min_val and max_val are valid float values
+        embedding_min = cache_data.get("embedding_min")
+        embedding_max = cache_data.get("embedding_max")
+        if embedding_min is None or embedding_max is None or embedding_min >= embedding_max:
+            logger.warning(f"Invalid embedding min/max values: min={embedding_min}, max={embedding_max}")
+            return None
+
+        try:
+            cached_quantized = np.frombuffer(bytes.fromhex(cache_data["embedding"]), dtype=np.uint8).reshape(
+                cache_data["embedding_shape"]
+            )
+            return dequantize_embedding(cached_quantized, embedding_min, embedding_max).ravel()
+        except Exception as e:
+            logger.warning(f"Error processing cached embedding: {str(e)}")
+            return None
+
+    def add(self, cache_id: str, cache_data: dict[str, Any]) -> None:
+        """Add or replace the embedding of a single cache entry"""
+        self._seen.add(cache_id)
+        embedding = self._decode(cache_data)
+        if embedding is None:
+            return
+
+        if self._matrix is None:
+            self._matrix = np.empty((16, embedding.shape[0]), dtype=np.float32)
+            self._norms = np.empty(16, dtype=np.float32)
+        elif embedding.shape[0] != self._matrix.shape[1]:
+            logger.warning(f"Cached embedding dimension mismatch for {cache_id}, skipping")
+            return
+
+        row = self._positions.get(cache_id)
+        if row is None:
+            row = len(self._ids)
+            if row == self._matrix.shape[0]:
+                # Grow geometrically to keep incremental inserts amortized O(1)
+                self._matrix = np.concatenate([self._matrix, np.empty_like(self._matrix)])
+                self._norms = np.concatenate([self._norms, np.empty_like(self._norms)])
+            self._positions[cache_id] = row
+            self._ids.append(cache_id)
+            self._cache_types.append(cache_data.get("cache_type"))
+        else:
+            self._cache_types[row] = cache_data.get("cache_type")
+
+        self._matrix[row] = embedding
+        self._norms[row] = np.linalg.norm(embedding)
+
+    def remove(self, cache_id: str) -> None:
+        """Remove a cache entry, the last row is moved into its place"""
+        self._seen.discard(cache_id)
+        row = self._positions.pop(cache_id, None)
+        if row is None:
+            return
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._norms[row] = self._norms[last]
+            self._ids[row] = moved_id
+            self._cache_types[row] = self._cache_types[last]
+            self._positions[moved_id] = row
+        self._ids.pop()
+        self._cache_types.pop()
+
+    def best_match(self, embedding: np.ndarray, cache_type: str | None = None) -> tuple[str, float] | None:
+        """Return (cache_id, cosine similarity) of the closest entry, or None if nothing matches"""
+        size = len(self._ids)
+        if size == 0:
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        if query.shape[0] != self._matrix.shape[1]:
+            return None
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return None
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            similarities = (self._matrix[:size] @ query) / (self._norms[:size] * query_norm)
+        similarities = np.nan_to_num(similarities, nan=-np.inf)
+        if cache_type:
+            mask = np.fromiter((t == cache_type for t in self._cache_types), dtype=bool, count=size)
+            similarities = np.where(mask, similarities, -np.inf)
+
+        best_row = int(np.argmax(similarities))
+        if not np.isfinite(similarities[best_row]):
+            return None
+        return self._ids[best_row], float(similarities[best_row])
+
+
+# (working_dir, namespace, mode) -> embedding index of that cache mode
+_cache_embedding_indexes: dict[tuple[str, str, str], CacheEmbeddingIndex] = {}
+
+
+def _cache_embedding_index_key(hashing_kv, mode: str) -> tuple[str, str, str]:
+    return (hashing_kv.global_config.get("working_dir", ""), hashing_kv.namespace, mode)
+
+
+def get_cache_embedding_index(hashing_kv, mode: str, mode_cache: dict[str, Any]) -> CacheEmbeddingIndex:
+    """Get the embedding index of a cache mode, building it on first use
+
+    The index is kept up to date by save_to_cache. Entries added or deleted behind its
+    back, e.g. by another process or a cache clear, are synced by key on each lookup.
+    """
+    key = _cache_embedding_index_key(hashing_kv, mode)
+    index = _cache_embedding_indexes.get(key)
+    if index is None:
+        index = CacheEmbeddingIndex.from_mode_cache(mode_cache)
+        _cache_embedding_indexes[key] = index
+    else:
+        index.sync(mode_cache)
+    return index
+
+
 async def get_best_cached_response(
     hashing_kv,
     current_embedding,
@@ -831,50 +1370,18 @@ async def get_best_cached_response(
     if not mode_cache:
         return None
 
-    best_similarity = -1
-    best_response = None
-    best_prompt = None
-    best_cache_id = None
-
-    # Only iterate through cache entries for this mode
-    for cache_id, cache_data in mode_cache.items():
-        # Skip if cache_type doesn't match
-        if cache_type and cache_data.get("cache_type") != cache_type:
-            continue
-
-        # Check if cache data is valid
-        if cache_data["embedding"] is None:
-            continue
-
-        try:
-            # Safely convert cached embedding
-            cached_quantized = np.frombuffer(bytes.fromhex(cache_data["embedding"]), dtype=np.uint8).reshape(
-                cache_data["embedding_shape"]
-            )
-
-            # Ensure min_val and max_val are valid float values
-            embedding_min = cache_data.get("embedding_min")
-            embedding_max = cache_data.get("embedding_max")
-
-            if embedding_min is None or embedding_max is None or embedding_min >= embedding_max:
-                logger.warning(f"Invalid embedding min/max values: min={embedding_min}, max={embedding_max}")
-                continue
-
-            cached_embedding = dequantize_embedding(
-                cached_quantized,
-                embedding_min,
-                embedding_max,
-            )
-        except Exception as e:
-            logger.warning(f"Error processing cached embedding: {str(e)}")
-            continue
+    index = get_cache_embedding_index(hashing_kv, mode, mode_cache)
+    match = index.best_match(current_embedding, cache_type)
+    if match is None:
+        return None
 
-        similarity = cosine_similarity(current_embedding, cached_embedding)
-        if similarity > best_similarity:
-            best_similarity = similarity
-            best_response = cache_data["return"]
-            best_prompt = cache_data["original_prompt"]
-            best_cache_id = cache_id
+    best_cache_id, best_similarity = match
+    if best_cache_id not in mode_cache:
+        # Entry was removed behind the index's back
+        index.remove(best_cache_id)
+        return None
+    best_response = mode_cache[best_cache_id]["return"]
+    best_prompt = mode_cache[best_cache_id]["original_prompt"]
 
     if best_similarity > similarity_threshold:
         # If LLM check is enabled and all required parameters are provided
@@ -1035,7 +1542,7 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
             return
 
     # Update cache with new content
-    mode_cache[cache_data.args_hash] = {
+    entry = {
         "return": cache_data.content,
         "cache_type": cache_data.cache_type,
         "embedding": cache_data.quantized.tobytes().hex() if cache_data.quantized is not None else None,
@@ -1048,7 +1555,46 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
     logger.info(f" == LLM cache == saving {cache_data.mode}: {cache_data.args_hash}")
 
     # Only upsert if there's actual new content
-    await hashing_kv.upsert({cache_data.mode: mode_cache})
+    if exists_func(hashing_kv, "upsert_cache_entries"):
+        await hashing_kv.upsert_cache_entries(cache_data.mode, {cache_data.args_hash: entry})
+    else:
+        mode_cache[cache_data.args_hash] = entry
+        await hashing_kv.upsert({cache_data.mode: mode_cache})
+
+    # Keep an already built embedding index in sync instead of rebuilding it on the next lookup
+    index = _cache_embedding_indexes.get(_cache_embedding_index_key(hashing_kv, cache_data.mode))
+    if index is not None:
+        index.add(cache_data.args_hash, entry)
+
+
+# Number of characters per chunk when a cached response is replayed to a streaming client
+CACHE_REPLAY_CHUNK_SIZE = 64
+
+
+async def replay_cached_stream(content: str, chunk_size: int = CACHE_REPLAY_CHUNK_SIZE) -> AsyncIterator[str]:
+    """Stream a cached response in chunks, so streaming clients get cache hits the same way as a live response"""
+    for start in range(0, len(content), chunk_size):
+        yield content[start : start + chunk_size]
+
+
+async def cache_stream_on_completion(
+    stream: AsyncIterator[str], hashing_kv, cache_data: CacheData
+) -> AsyncIterator[str]:
+    """Pass a streamed LLM response through and save its full text to the cache once it completes
+
+    The chunks are handed on as they arrive. A stream that fails or that the client stops
+    reading is not cached.
+    """
+    parts: list[str] = []
+    async for chunk in stream:
+        parts.append(chunk)
+        yield chunk
+
+    cache_data.content = "".join(parts)
+    try:
+        await save_to_cache(hashing_kv, cache_data)
+    except Exception as e:
+        logger.warning(f"Failed to cache streamed response {cache_data.args_hash}: {e}")
 
 
 def safe_unicode_decode(content):
@@ -0,0 +1,19 @@
+import pytest
+
+from lightrag.kg.shared_storage import finalize_share_data, initialize_share_data
+
+
+def _restart() -> None:
+    finalize_share_data()
+    initialize_share_data(1)
+
+
+@pytest.fixture
+def shared_data():
+    """Single process shared storage data, created fresh for each test
+
+    Yields a function that drops all in-memory namespaces, as a restart of the server would.
+    """
+    initialize_share_data(1)
+    yield _restart
+    finalize_share_data()
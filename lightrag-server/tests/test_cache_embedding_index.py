@@ -0,0 +1,71 @@
+import numpy as np
+
+from lightrag import utils
+from lightrag.utils import CacheEmbeddingIndex, quantize_embedding
+
+
+def cache_entry(embedding, cache_type="query") -> dict:
+    quantized, min_val, max_val = quantize_embedding(np.asarray(embedding, dtype=np.float32))
+    return {
+        "return": "response",
+        "cache_type": cache_type,
+        "embedding": quantized.tobytes().hex(),
+        "embedding_shape": quantized.shape,
+        "embedding_min": min_val,
+        "embedding_max": max_val,
+        "original_prompt": "prompt",
+    }
+
+
+def axis(i: int, dim: int = 4) -> np.ndarray:
+    embedding = np.full(dim, 0.01, dtype=np.float32)
+    embedding[i] = 1.0
+    return embedding
+
+
+def test_sync_picks_up_an_add_and_a_delete_of_another_process():
+    mode_cache = {f"h{i}": cache_entry(axis(i)) for i in range(3)}
+    index = CacheEmbeddingIndex.from_mode_cache(mode_cache)
+
+    # Same number of entries as before, only the keys tell the change apart
+    del mode_cache["h0"]
+    mode_cache["h3"] = cache_entry(axis(3))
+    index.sync(mode_cache)
+
+    assert index.entry_count == 3
+    assert index.best_match(axis(3))[0] == "h3"
+    assert index.best_match(axis(0))[0] != "h0"
+    for i in (1, 2):
+        assert index.best_match(axis(i))[0] == f"h{i}"
+
+
+def test_removed_row_is_replaced_by_the_last_one():
+    mode_cache = {f"h{i}": cache_entry(axis(i), "query" if i % 2 else "extract") for i in range(4)}
+    index = CacheEmbeddingIndex.from_mode_cache(mode_cache)
+
+    index.remove("h1")
+    assert index.best_match(axis(3), "query")[0] == "h3"
+    assert index.best_match(axis(1), "query")[0] == "h3"
+    assert index.best_match(axis(2), "extract")[0] == "h2"
+
+
+def test_lookup_syncs_instead_of_rebuilding(monkeypatch):
+    class HashingKV:
+        namespace = "llm_response_cache"
+        global_config = {"working_dir": "test"}
+
+    monkeypatch.setattr(utils, "_cache_embedding_indexes", {})
+    mode_cache = {f"h{i}": cache_entry(axis(i)) for i in range(3)}
+    index = utils.get_cache_embedding_index(HashingKV(), "mix", mode_cache)
+
+    decoded = []
+    decode = CacheEmbeddingIndex._decode
+
+    def counting_decode(cache_data):
+        decoded.append(cache_data)
+        return decode(cache_data)
+
+    monkeypatch.setattr(CacheEmbeddingIndex, "_decode", staticmethod(counting_decode))
+    mode_cache["h3"] = cache_entry(axis(3))
+    assert utils.get_cache_embedding_index(HashingKV(), "mix", mode_cache) is index
+    assert decoded == [mode_cache["h3"]]
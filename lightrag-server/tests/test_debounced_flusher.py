@@ -0,0 +1,108 @@
+import asyncio
+
+from lightrag.utils import DebouncedFlusher
+
+
+class Storage:
+    """Counts flushes, each taking delay seconds"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.started = 0
+        self.finished = 0
+
+    async def flush(self) -> None:
+        self.started += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("disk full")
+        self.finished += 1
+
+
+def test_changes_are_coalesced_into_one_background_flush():
+    async def run():
+        storage = Storage()
+        flusher = DebouncedFlusher(storage.flush, "kv", max_wait=0.05)
+        for _ in range(10):
+            flusher.mark_dirty()
+        assert storage.started == 0
+        await asyncio.sleep(0.1)
+        assert storage.finished == 1
+
+    asyncio.run(run())
+
+
+def test_max_pending_changes_flush_right_away():
+    async def run():
+        storage = Storage()
+        flusher = DebouncedFlusher(storage.flush, "kv", max_wait=60, max_pending=3)
+        for _ in range(3):
+            flusher.mark_dirty()
+        await asyncio.sleep(0.01)
+        assert storage.finished == 1
+        await flusher.aclose()
+        assert storage.finished == 1
+
+    asyncio.run(run())
+
+
+def test_flush_persists_pending_changes_without_waiting_for_the_timer():
+    async def run():
+        storage = Storage()
+        flusher = DebouncedFlusher(storage.flush, "kv", max_wait=0.05)
+        flusher.mark_dirty()
+        await flusher.flush()
+        assert storage.finished == 1
+
+        # The timer was cancelled, nothing is flushed twice
+        await asyncio.sleep(0.1)
+        assert storage.finished == 1
+
+    asyncio.run(run())
+
+
+def test_changes_made_during_a_flush_are_flushed_by_the_next_one():
+    async def run():
+        storage = Storage(delay=0.05)
+        flusher = DebouncedFlusher(storage.flush, "kv", max_wait=0.01)
+        flusher.mark_dirty()
+        await asyncio.sleep(0.02)
+        assert storage.started == 1
+        flusher.mark_dirty()
+        await asyncio.sleep(0.15)
+        assert storage.started == storage.finished == 2
+
+    asyncio.run(run())
+
+
+def test_flush_waits_for_the_running_flush_and_the_one_it_starts():
+    async def run():
+        storage = Storage(delay=0.05)
+        flusher = DebouncedFlusher(storage.flush, "kv", max_wait=60, max_pending=2)
+        flusher.mark_dirty()
+        flusher.mark_dirty()
+        await asyncio.sleep(0.01)
+        # Enough changes for the running flush to start another one when it ends
+        flusher.mark_dirty()
+        flusher.mark_dirty()
+        await flusher.flush()
+        assert storage.started == storage.finished == 2
+
+    asyncio.run(run())
+
+
+def test_failed_flush_is_logged_and_retried_on_the_next_change():
+    async def run():
+        storage = Storage(fail=True)
+        flusher = DebouncedFlusher(storage.flush, "kv", max_wait=0.01)
+        flusher.mark_dirty()
+        await asyncio.sleep(0.05)
+        assert storage.started == 1
+
+        storage.fail = False
+        flusher.mark_dirty()
+        await flusher.aclose()
+        assert storage.finished == 1
+
+    asyncio.run(run())
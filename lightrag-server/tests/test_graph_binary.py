@@ -0,0 +1,118 @@
+import os
+import sys
+from array import array
+
+import networkx as nx
+import pytest
+
+from lightrag.kg import graph_binary
+from lightrag.kg.graph_binary import decode_graph, encode_graph, read_graph, write_graph
+from lightrag.kg.networkx_impl import SharedGraphPlane
+from lightrag.kg.shared_storage import NamespaceGeneration
+
+
+def sample_graph() -> nx.Graph:
+    graph = nx.Graph()
+    graph.add_node("Alice", entity_type="person", description="Ünïcödé 名字 🚀", weight=1.5, rank=3)
+    graph.add_node("Bob", flag=True, missing=None, negative=-(2**63))
+    graph.add_node("isolated")
+    graph.add_edge("Alice", "Bob", weight=2.0, keywords="knows", source_id="chunk-1<SEP>chunk-2")
+    graph.add_edge("Bob", "Bob", weight=0.5)
+    return graph
+
+
+def assert_same_graph(actual: nx.Graph, expected: nx.Graph) -> None:
+    assert actual.is_directed() == expected.is_directed()
+    assert list(actual.nodes(data=True)) == list(expected.nodes(data=True))
+    assert sorted(map(repr, actual.edges(data=True))) == sorted(map(repr, expected.edges(data=True)))
+
+
+def test_attributes_keep_their_types():
+    decoded = decode_graph(encode_graph(sample_graph()))
+
+    alice, bob = decoded.nodes["Alice"], decoded.nodes["Bob"]
+    assert alice == {"entity_type": "person", "description": "Ünïcödé 名字 🚀", "weight": 1.5, "rank": 3}
+    assert type(alice["rank"]) is int and type(alice["weight"]) is float
+    assert bob == {"flag": True, "missing": None, "negative": -(2**63)}
+    assert bob["flag"] is True
+    assert decoded.edges["Alice", "Bob"] == {"weight": 2.0, "keywords": "knows", "source_id": "chunk-1<SEP>chunk-2"}
+    assert decoded.has_edge("Bob", "Bob") and "isolated" in decoded
+
+
+def test_values_without_a_type_are_stored_as_strings():
+    graph = nx.Graph()
+    graph.add_node("x", huge=2**70, tags=["a", "b"])
+
+    # The same as GraphML does
+    assert decode_graph(encode_graph(graph)).nodes["x"] == {"huge": str(2**70), "tags": "['a', 'b']"}
+
+
+def test_directed_and_empty_graphs():
+    directed = nx.DiGraph([("a", "b"), ("b", "c")])
+    assert_same_graph(decode_graph(encode_graph(directed)), directed)
+    assert_same_graph(decode_graph(encode_graph(nx.Graph())), nx.Graph())
+
+
+def test_lone_surrogates_survive():
+    graph = nx.Graph()
+    graph.add_node("broken \ud800 name", description="\udfff")
+    assert_same_graph(decode_graph(encode_graph(graph)), graph)
+
+
+def test_file_of_the_other_byte_order_is_read(monkeypatch):
+    graph = sample_graph()
+    native = encode_graph(graph)
+    # Write the file as a machine of the other byte order would
+    other_order = "big" if sys.byteorder == "little" else "little"
+    monkeypatch.setattr(graph_binary.sys, "byteorder", other_order)
+    header = graph_binary._HEADER.unpack_from(native, 0)
+    string_count, blob_size, node_count, edge_count, attr_count, int_count, float_count = header[4:]
+    foreign = [graph_binary._HEADER.pack(*header[:2], graph_binary._BYTE_ORDERS[other_order], *header[3:])]
+    position = graph_binary._HEADER.size
+    sections = [("I", string_count), (None, blob_size)]
+    sections += [("I", node_count)] * 2 + [("I", edge_count)] * 3
+    sections += [("I", attr_count), ("B", attr_count), ("q", int_count), ("d", float_count)]
+    for typecode, count in sections:
+        if typecode is None:
+            foreign.append(native[position : position + count])
+            position += count
+            continue
+        values = array(typecode)
+        size = count * values.itemsize
+        values.frombytes(native[position : position + size])
+        values.byteswap()
+        foreign.append(values.tobytes())
+        position += size
+    monkeypatch.undo()
+
+    assert_same_graph(decode_graph(b"".join(foreign)), graph)
+
+
+def test_other_files_are_rejected():
+    with pytest.raises(ValueError):
+        decode_graph(b"<?xml version='1.0'?>" + bytes(100))
+
+
+def test_write_graph_replaces_the_file(tmp_path):
+    file_name = str(tmp_path / "graph_chunk_entity_relation.nxbin")
+    write_graph(nx.Graph([("a", "b")]), file_name)
+    write_graph(sample_graph(), file_name)
+
+    assert_same_graph(read_graph(file_name), sample_graph())
+    assert os.listdir(tmp_path) == ["graph_chunk_entity_relation.nxbin"]
+
+
+def test_graph_replicas_replay_operations_and_snapshots(tmp_path):
+    generation = NamespaceGeneration("graph", [0] * len(NamespaceGeneration.FIELDS), 0)
+    log_file = str(tmp_path / "graph.log")
+    writer = SharedGraphPlane("graph", generation, log_file, sample_graph())
+    reader = SharedGraphPlane("graph", generation, log_file, nx.Graph())
+    writer.reset()
+
+    writer.apply("add_nodes", [("Carol", {"entity_type": "person"})])
+    writer.apply("add_edges", [("Alice", "Carol", {"weight": 1.0})])
+    writer.apply("remove_nodes", ["isolated"])
+    reader.sync()
+
+    assert_same_graph(reader.graph, writer.graph)
+    assert "isolated" not in reader.graph and reader.graph.has_edge("Carol", "Alice")
@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import pytest
+
+from lightrag.base import BaseGraphStorage
+from lightrag.kg.networkx_impl import NetworkXStorage
+from lightrag.types import KnowledgeGraphEdge, KnowledgeGraphMeta, KnowledgeGraphNode
+
+
+async def open_graph(working_dir) -> NetworkXStorage:
+    storage = NetworkXStorage(
+        namespace="chunk_entity_relation", global_config={"working_dir": str(working_dir)}, embedding_func=None
+    )
+    await storage.initialize()
+    # A hub with ten leaves, one of them continued by a short chain
+    await storage.upsert_node("hub", {"entity_id": "hub", "entity_type": "concept"})
+    for i in range(10):
+        await storage.upsert_node(f"leaf-{i}", {"entity_id": f"leaf-{i}", "entity_type": "concept"})
+        await storage.upsert_edge("hub", f"leaf-{i}", {"weight": float(i)})
+    for i in range(3):
+        await storage.upsert_node(f"chain-{i}", {"entity_id": f"chain-{i}"})
+        await storage.upsert_edge(f"chain-{i - 1}" if i else "leaf-0", f"chain-{i}", {"weight": 1.0})
+    return storage
+
+
+async def collect(items) -> list:
+    return [item async for item in items]
+
+
+def test_stream_yields_the_knowledge_graph_item_by_item(tmp_path, shared_data):
+    async def run():
+        storage = await open_graph(tmp_path)
+        for label, max_depth, max_nodes in (("*", 3, 5), ("hub", 2, 100), ("hub", 3, 4)):
+            expected = await storage.get_knowledge_graph(label, max_depth=max_depth, max_nodes=max_nodes)
+            items = await collect(storage.stream_knowledge_graph(label, max_depth, max_nodes))
+
+            assert items[0].is_truncated == expected.is_truncated
+            nodes = [item for item in items[1:] if isinstance(item, KnowledgeGraphNode)]
+            edges = [item for item in items[1:] if isinstance(item, KnowledgeGraphEdge)]
+            # Nodes come first
+            assert items[1:] == nodes + edges
+            assert nodes == expected.nodes and edges == expected.edges
+
+    asyncio.run(run())
+
+
+def test_unknown_label_streams_only_the_meta_item(tmp_path, shared_data):
+    async def run():
+        storage = await open_graph(tmp_path)
+        items = await collect(storage.stream_knowledge_graph("missing"))
+        assert len(items) == 1 and isinstance(items[0], KnowledgeGraphMeta) and not items[0].is_truncated
+
+    asyncio.run(run())
+
+
+def test_pages_joined_by_cursor_give_the_whole_stream(tmp_path, shared_data):
+    pytest.importorskip("fastapi")
+    from lightrag.api.routers.graph_routes import decode_graph_cursor, stream_graph_ndjson
+
+    async def page(storage, cursor, limit):
+        items = storage.stream_knowledge_graph("hub", 3, 100)
+        meta = await items.__anext__()
+        offset = decode_graph_cursor(cursor, "q", meta.version) if cursor else 0
+        chunks = await collect(stream_graph_ndjson(meta, items, "q", offset, limit))
+        return [json.loads(line) for line in "".join(chunks).splitlines()]
+
+    async def run():
+        storage = await open_graph(tmp_path)
+        full = await page(storage, 0, None)
+        assert full[0]["type"] == "meta" and full[-1] == {"type": "end", "count": len(full) - 2, "next_cursor": None}
+
+        items, cursor, pages = [], None, 0
+        while True:
+            lines = await page(storage, cursor, 4)
+            assert lines[0]["type"] == "meta" and lines[-1]["type"] == "end"
+            items.extend(lines[1:-1])
+            pages += 1
+            cursor = lines[-1]["next_cursor"]
+            if cursor is None:
+                break
+
+        assert items == full[1:-1]
+        assert pages == -(-len(items) // 4)
+
+    asyncio.run(run())
+
+
+def test_cursor_of_another_query_or_graph_version_is_rejected():
+    pytest.importorskip("fastapi")
+    from lightrag.api.routers.graph_routes import decode_graph_cursor, encode_graph_cursor
+
+    cursor = encode_graph_cursor("query-a", "7", 10)
+    assert decode_graph_cursor(cursor, "query-a", "7") == 10
+    bad_cursors = [
+        (cursor, "query-b", "7"),
+        (cursor, "query-a", "8"),
+        ("not a cursor", "query-a", "7"),
+        (encode_graph_cursor("query-a", "7", -1), "query-a", "7"),
+    ]
+    for bad_cursor, query_hash, version in bad_cursors:
+        with pytest.raises(ValueError):
+            decode_graph_cursor(bad_cursor, query_hash, version)
+
+
+def test_graph_version_changes_with_the_graph(tmp_path, shared_data):
+    async def run():
+        storage = await open_graph(tmp_path)
+        version = (await collect(storage.stream_knowledge_graph("hub")))[0].version
+        assert (await collect(storage.stream_knowledge_graph("hub")))[0].version == version
+
+        await storage.upsert_node("leaf-10", {"entity_id": "leaf-10"})
+        await storage.upsert_edge("hub", "leaf-10", {"weight": 1.0})
+        assert (await collect(storage.stream_knowledge_graph("hub")))[0].version != version
+
+    asyncio.run(run())
+
+
+def test_default_stream_versions_the_graph_by_its_items(tmp_path, shared_data):
+    async def run():
+        storage = await open_graph(tmp_path)
+        meta = (await collect(BaseGraphStorage.stream_knowledge_graph(storage, "hub")))[0]
+        assert meta.version is not None
+        assert (await collect(BaseGraphStorage.stream_knowledge_graph(storage, "hub")))[0].version == meta.version
+
+        await storage.upsert_node("leaf-10", {"entity_id": "leaf-10"})
+        await storage.upsert_edge("hub", "leaf-10", {"weight": 1.0})
+        assert (await collect(BaseGraphStorage.stream_knowledge_graph(storage, "hub")))[0].version != meta.version
+
+    asyncio.run(run())
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from lightrag.kg import json_kv_impl
+from lightrag.kg.json_kv_impl import JsonKVStorage
+
+
+@pytest.fixture(autouse=True)
+def append_only(monkeypatch):
+    monkeypatch.setattr(json_kv_impl, "APPEND_ONLY", True)
+
+
+async def open_kv(working_dir, namespace="full_docs") -> JsonKVStorage:
+    kv = JsonKVStorage(namespace=namespace, global_config={"working_dir": str(working_dir)}, embedding_func=None)
+    await kv.initialize()
+    return kv
+
+
+def read_wal(kv: JsonKVStorage) -> list[dict]:
+    with open(kv._wal_file, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_changes_after_the_first_snapshot_go_to_the_log(tmp_path, shared_data):
+    async def run():
+        kv = await open_kv(tmp_path)
+        await kv.upsert({"a": {"content": "1"}, "b": {"content": "2"}})
+        await kv.index_done_callback()
+        assert not os.path.exists(kv._wal_file)
+        with open(kv._file_name, encoding="utf-8") as f:
+            snapshot = f.read()
+
+        await kv.upsert({"a": {"content": "changed"}, "c": {"content": "3"}})
+        await kv.delete(["b"])
+        await kv.index_done_callback()
+
+        with open(kv._file_name, encoding="utf-8") as f:
+            assert f.read() == snapshot
+        assert sorted((record["op"], record["k"]) for record in read_wal(kv)) == [
+            ("d", "b"),
+            ("u", "a"),
+            ("u", "c"),
+        ]
+
+        shared_data()
+        reopened = await open_kv(tmp_path)
+        assert await reopened.get_all() == {"a": {"content": "changed"}, "c": {"content": "3"}}
+
+    asyncio.run(run())
+
+
+def test_torn_last_record_is_cut_off(tmp_path, shared_data):
+    async def run():
+        kv = await open_kv(tmp_path)
+        await kv.upsert({"a": {"content": "1"}})
+        await kv.index_done_callback()
+        await kv.upsert({"b": {"content": "2"}})
+        await kv.index_done_callback()
+        with open(kv._wal_file, "a", encoding="utf-8") as f:
+            f.write('{"op": "u", "k": "torn", "v": {"cont')
+        wal_size = os.path.getsize(kv._wal_file)
+
+        shared_data()
+        kv = await open_kv(tmp_path)
+        assert await kv.get_all() == {"a": {"content": "1"}, "b": {"content": "2"}}
+        assert os.path.getsize(kv._wal_file) < wal_size
+
+        # The next record starts on a line of its own and survives the following replay
+        await kv.upsert({"c": {"content": "3"}})
+        await kv.index_done_callback()
+        shared_data()
+        kv = await open_kv(tmp_path)
+        assert set(await kv.get_all()) == {"a", "b", "c"}
+
+    asyncio.run(run())
+
+
+def test_cache_entries_are_logged_one_by_one(tmp_path, shared_data):
+    async def run():
+        kv = await open_kv(tmp_path, "llm_response_cache")
+        await kv.upsert_cache_entries("local", {"h1": {"return": "r1"}})
+        await kv.index_done_callback()
+
+        await kv.upsert_cache_entries("local", {"h2": {"return": "r2"}})
+        await kv.upsert_cache_entries("global", {"h3": {"return": "r3"}})
+        await kv.index_done_callback()
+        assert sorted((record["op"], record["k"], record["h"]) for record in read_wal(kv)) == [
+            ("e", "global", "h3"),
+            ("e", "local", "h2"),
+        ]
+
+        shared_data()
+        kv = await open_kv(tmp_path, "llm_response_cache")
+        assert await kv.get_by_id("local") == {"h1": {"return": "r1"}, "h2": {"return": "r2"}}
+        assert await kv.get_by_id("global") == {"h3": {"return": "r3"}}
+
+    asyncio.run(run())
+
+
+def test_dropped_mode_is_not_resurrected_by_its_pending_entries(tmp_path, shared_data):
+    async def run():
+        kv = await open_kv(tmp_path, "llm_response_cache")
+        await kv.upsert_cache_entries("local", {"h1": {"return": "r1"}})
+        await kv.index_done_callback()
+
+        await kv.upsert_cache_entries("local", {"h2": {"return": "r2"}})
+        await kv.drop_cache_by_modes(["local"])
+        await kv.index_done_callback()
+        assert [(record["op"], record["k"]) for record in read_wal(kv)] == [("d", "local")]
+
+        shared_data()
+        kv = await open_kv(tmp_path, "llm_response_cache")
+        assert await kv.get_all() == {}
+
+    asyncio.run(run())
+
+
+def test_log_is_compacted_into_the_snapshot(tmp_path, shared_data, monkeypatch):
+    monkeypatch.setattr(json_kv_impl, "WAL_COMPACT_MIN_BYTES", 0)
+
+    async def run():
+        kv = await open_kv(tmp_path)
+        await kv.upsert({"a": {"content": "1"}})
+        await kv.index_done_callback()
+        await kv.upsert({f"key-{i}": {"content": "x" * 100} for i in range(20)})
+        await kv.index_done_callback()
+
+        assert not os.path.exists(kv._wal_file)
+        with open(kv._file_name, encoding="utf-8") as f:
+            assert len(json.load(f)) == 21
+
+    asyncio.run(run())
+
+
+def test_changes_of_a_failed_append_are_written_by_the_next_flush(tmp_path, shared_data, monkeypatch):
+    async def run():
+        kv = await open_kv(tmp_path)
+        await kv.upsert({"a": {"content": "1"}})
+        await kv.index_done_callback()
+
+        def disk_full(wal_file, lines):
+            raise OSError(28, "No space left on device")
+
+        append_wal = json_kv_impl._append_wal
+        monkeypatch.setattr(json_kv_impl, "_append_wal", disk_full)
+        await kv.upsert({"b": {"content": "2"}})
+        with pytest.raises(OSError):
+            await kv.index_done_callback()
+
+        monkeypatch.setattr(json_kv_impl, "_append_wal", append_wal)
+        await kv.index_done_callback()
+        shared_data()
+        kv = await open_kv(tmp_path)
+        assert await kv.get_all() == {"a": {"content": "1"}, "b": {"content": "2"}}
+
+    asyncio.run(run())
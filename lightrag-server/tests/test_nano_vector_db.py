@@ -0,0 +1,109 @@
+import base64
+import json
+import os
+
+import numpy as np
+import pytest
+
+from lightrag.kg import nano_vector_db_impl
+from lightrag.kg.nano_vector_db_impl import SegmentedVectorDB
+
+DIM = 4
+
+
+def vector(*values) -> list[float]:
+    return list(values) + [0.0] * (DIM - len(values))
+
+
+def ids(results) -> list[str]:
+    return [result["__id__"] for result in results]
+
+
+@pytest.fixture
+def prefix(tmp_path):
+    return str(tmp_path / "vdb_chunks")
+
+
+def test_saved_rows_survive_a_reload(prefix):
+    db = SegmentedVectorDB(DIM, prefix)
+    db.upsert(
+        [
+            {"__id__": "x", "content": "x", "__vector__": vector(1)},
+            {"__id__": "y", "content": "y", "__vector__": vector(0, 1)},
+            {"__id__": "z", "content": "z", "__vector__": vector(0, 0, 1)},
+        ]
+    )
+    db.save()
+    db.delete(["y"])
+    db.upsert([{"__id__": "x", "content": "x2", "__vector__": vector(0, 0, 0, 1)}])
+    db.save()
+
+    loaded = SegmentedVectorDB(DIM, prefix)
+    assert len(loaded) == 2
+    assert loaded.get(["x", "y", "z"]) == [{"__id__": "x", "content": "x2"}, {"__id__": "z", "content": "z"}]
+    assert ids(loaded.query(np.array(vector(0, 0, 0, 2)), top_k=5)) == ["x", "z"]
+    assert ids(loaded.query(np.array(vector(0, 0, 0, 2)), top_k=5, better_than_threshold=0.5)) == ["x"]
+
+
+def test_reload_applies_only_new_segments(prefix, monkeypatch):
+    writer = SegmentedVectorDB(DIM, prefix)
+    writer.upsert([{"__id__": "x", "__vector__": vector(1)}])
+    writer.save()
+    reader = SegmentedVectorDB(DIM, prefix)
+
+    full_loads = []
+    monkeypatch.setattr(reader, "load", lambda: full_loads.append(True))
+    writer.upsert([{"__id__": "y", "__vector__": vector(0, 1)}])
+    writer.delete(["x"])
+    writer.save()
+    reader.reload()
+
+    assert not full_loads
+    assert [meta["__id__"] for meta in reader.all_data()] == ["y"]
+
+
+def test_segments_are_merged_into_a_new_base(prefix, monkeypatch):
+    monkeypatch.setattr(nano_vector_db_impl, "MAX_SEGMENTS", 2)
+    writer = SegmentedVectorDB(DIM, prefix)
+    reader = SegmentedVectorDB(DIM, prefix)
+    for i in range(3):
+        writer.upsert([{"__id__": f"id-{i}", "__vector__": vector(1, i)}])
+        writer.save()
+
+    with open(f"{prefix}.manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert manifest["generation"] == 1 and manifest["segments"] == []
+    assert not [name for name in os.listdir(os.path.dirname(prefix)) if ".g0." in name]
+
+    reader.reload()
+    assert sorted(meta["__id__"] for meta in reader.all_data()) == ["id-0", "id-1", "id-2"]
+    assert np.allclose(reader.matrix(), writer.matrix())
+
+
+def test_legacy_json_file_is_imported_and_replaced(prefix):
+    matrix = np.array([vector(3), vector(0, 2)], dtype=np.float32)
+    with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "embedding_dim": DIM,
+                "data": [{"__id__": "x"}, {"__id__": "y"}],
+                "matrix": base64.b64encode(matrix.tobytes()).decode(),
+            },
+            f,
+        )
+
+    db = SegmentedVectorDB(DIM, prefix)
+    assert ids(db.query(np.array(vector(0, 1)), top_k=1)) == ["y"]
+    db.save()
+
+    assert not os.path.exists(f"{prefix}.json")
+    assert len(SegmentedVectorDB(DIM, prefix)) == 2
+
+
+def test_mismatched_embedding_dim_is_rejected(prefix):
+    db = SegmentedVectorDB(DIM, prefix)
+    db.upsert([{"__id__": "x", "__vector__": vector(1)}])
+    db.save()
+
+    with pytest.raises(ValueError):
+        SegmentedVectorDB(DIM + 1, prefix)
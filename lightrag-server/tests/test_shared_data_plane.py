@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from lightrag.kg import shared_data_plane
+from lightrag.kg.shared_data_plane import SharedKVPlane
+from lightrag.kg.shared_storage import NamespaceGeneration
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two replicas of one namespace sharing counters and a change log, as two workers would"""
+    generation = NamespaceGeneration("full_docs", [0] * len(NamespaceGeneration.FIELDS), 0)
+    log_file = str(tmp_path / "full_docs.log")
+    writer = SharedKVPlane("full_docs", generation, log_file, {})
+    reader = SharedKVPlane("full_docs", generation, log_file, {})
+    writer.reset()
+    return writer, reader
+
+
+def write(plane: SharedKVPlane, upserts=None, deletes=(), entries=None) -> None:
+    """Apply a change to the replica and publish it, the way the storages do"""
+    plane.sync()
+    plane.data.update(upserts or {})
+    for key in deletes:
+        plane.data.pop(key, None)
+    for key, values in (entries or {}).items():
+        plane.data.setdefault(key, {}).update(values)
+    plane.commit(upserts=upserts, deletes=deletes, entries=entries)
+
+
+def test_reader_replays_upserts_deletes_and_entries(workers):
+    writer, reader = workers
+    write(writer, upserts={"a": {"v": 1}, "b": {"v": 2}})
+    write(writer, deletes=["b"])
+    write(writer, entries={"local": {"h1": "r1"}})
+    write(writer, entries={"local": {"h2": "r2"}})
+
+    assert not reader.is_current()
+    reader.sync()
+    assert reader.is_current()
+    assert reader.data == {"a": {"v": 1}, "local": {"h1": "r1", "h2": "r2"}}
+    assert reader.data == writer.data
+
+
+def test_writes_of_both_workers_interleave(workers):
+    writer, reader = workers
+    write(writer, upserts={"a": 1})
+    write(reader, upserts={"b": 2})
+    write(writer, deletes=["a"])
+
+    reader.sync()
+    writer.sync()
+    assert reader.data == writer.data == {"b": 2}
+
+
+def test_entry_frames_do_not_grow_with_the_record(workers):
+    writer, _ = workers
+    write(writer, entries={"local": {f"h{i}": "x" * 100 for i in range(1000)}})
+
+    offset = writer._offset
+    write(writer, entries={"local": {"new": "x" * 100}})
+    assert writer._offset - offset < 500
+
+
+def test_reader_rebuilds_from_a_compacted_log(workers, monkeypatch):
+    monkeypatch.setattr(shared_data_plane, "COMPACT_MIN_BYTES", 0)
+    writer, reader = workers
+    write(writer, upserts={"a": 1})
+    reader.sync()
+    epoch = writer._generation.log_epoch
+
+    for i in range(20):
+        write(writer, upserts={f"key-{i}": "x" * 50})
+    write(writer, deletes=["a"])
+    assert writer._generation.log_epoch > epoch
+    assert os.path.getsize(writer._log_file) == writer._generation.log_offset
+
+    reader.sync()
+    assert reader.data == writer.data
+    assert "a" not in reader.data and len(reader.data) == 20
+
+
+def test_single_process_replica_has_no_log():
+    generation = NamespaceGeneration("full_docs", [0] * len(NamespaceGeneration.FIELDS), 0)
+    data = {}
+    plane = SharedKVPlane("full_docs", generation, None, data)
+    data["a"] = 1
+    plane.commit(upserts={"a": 1})
+
+    assert plane.is_current()
+    assert plane.version == generation.generation == 1